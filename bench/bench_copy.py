@@ -0,0 +1,95 @@
+"""Compare the parallel copy engine with shutil.copytree.
+
+    python bench/bench_copy.py                      # synthetic ZaloData-like tree
+    python bench/bench_copy.py --source "%APPDATA%\\ZaloData"
+    python bench/bench_copy.py --target D:\\tmp      # copy to another volume
+
+Prints files/s and MB/s for both paths.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.copier import TreeCopier, LARGE_FILE_SIZE, SMALL_WORKERS, LARGE_WORKERS  # noqa: E402
+
+
+def make_tree(root, small_files, large_files, large_mb):
+    """Create many small files in nested folders plus a few large ones"""
+    rnd = random.Random(0)
+    for i in range(small_files):
+        d = os.path.join(root, f"chat{i % 50:02d}", f"thumb{i % 7}")
+        os.makedirs(d, exist_ok=True)
+        with open(os.path.join(d, f"img{i}.jpg"), "wb") as f:
+            f.write(os.urandom(rnd.randint(2, 64) * 1024))
+    d = os.path.join(root, "media")
+    os.makedirs(d, exist_ok=True)
+    for i in range(large_files):
+        with open(os.path.join(d, f"video{i}.mp4"), "wb") as f:
+            for _ in range(large_mb):
+                f.write(os.urandom(1024 * 1024))
+
+
+def tree_stats(root):
+    files = 0
+    size = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            files += 1
+            size += os.path.getsize(os.path.join(dirpath, name))
+    return files, size
+
+
+def run(label, fn, src, dst, files, size):
+    shutil.rmtree(dst, ignore_errors=True)
+    start = time.perf_counter()
+    fn(src, dst)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {elapsed:8.2f} s  {files / elapsed:10.0f} files/s  "
+          f"{size / elapsed / (1024 * 1024):8.1f} MB/s")
+    shutil.rmtree(dst, ignore_errors=True)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", help="existing folder to copy (default: synthetic tree)")
+    parser.add_argument("--target", help="folder to copy into (default: temp dir)")
+    parser.add_argument("--small-files", type=int, default=20000)
+    parser.add_argument("--large-files", type=int, default=4)
+    parser.add_argument("--large-mb", type=int, default=64)
+    parser.add_argument("--small-workers", type=int, default=SMALL_WORKERS)
+    parser.add_argument("--large-workers", type=int, default=LARGE_WORKERS)
+    parser.add_argument("--large-size-mb", type=int, default=LARGE_FILE_SIZE // (1024 * 1024))
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="zalomove-bench-")
+    try:
+        src = args.source
+        if not src:
+            src = os.path.join(work, "src")
+            print("Generating synthetic tree...")
+            make_tree(src, args.small_files, args.large_files, args.large_mb)
+        dst = os.path.join(args.target or work, "zalomove-bench-dst")
+
+        files, size = tree_stats(src)
+        print(f"{files} files, {size / (1024 * 1024):.1f} MB")
+
+        copier = TreeCopier(small_workers=args.small_workers,
+                            large_workers=args.large_workers,
+                            large_file_size=args.large_size_mb * 1024 * 1024)
+        base = run("shutil", shutil.copytree, src, dst, files, size)
+        fast = run("parallel", copier.copy, src, dst, files, size)
+        print(f"speedup    {base / fast:8.2f}x")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
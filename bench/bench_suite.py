@@ -0,0 +1,196 @@
+"""Benchmark the size scan, backup, restore, move and backup deletion on a synthetic ZaloData tree.
+
+    python bench/bench_suite.py                             # default tree, print results
+    python bench/bench_suite.py --save bench/baseline.json  # record a baseline
+    python bench/bench_suite.py --baseline bench/baseline.json --threshold 0.2
+    python bench/bench_suite.py --scale 0.2 --repeat 1      # quick run
+
+The tree looks like ZaloData: thousands of small thumbnails and chat
+images nested by conversation and month, a few large sqlite databases
+and videos. Everything runs in a temp dir. The fake link backend makes
+every rename behave like a move to another drive, so the move runs the
+real copy, delete and link path on any OS. Backups go to a backup store
+in the temp dir; file contents are unique, so its deduplication doesn't
+flatter the numbers. With --baseline the run fails (exit 1) if any
+files/s or MB/s figure drops by more than --threshold.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import fs  # noqa: E402
+from core.backupstore import BackupStore  # noqa: E402
+from core.mover import MoveJob, run_moves  # noqa: E402
+from core.purge import stage_snapshots, purge  # noqa: E402
+from core.zalo import get_folder_size  # noqa: E402
+
+
+BENCHES = ("size", "backup", "restore", "delete_backup", "move")
+
+
+def make_zalo_tree(root, scale=1.0, seed=0):
+    """ZaloData-shaped tree; returns (files, bytes)"""
+    rnd = random.Random(seed)
+    block = rnd.randbytes(1024 * 1024)
+    files = 0
+    size = 0
+
+    def write(path, nbytes):
+        nonlocal files, size
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            left = nbytes
+            while left:
+                n = min(left, len(block))
+                # Mỗi MB một "muối" khác nhau → không khối nào trùng nhau
+                f.write(rnd.randbytes(min(n, 16)))
+                f.write(block[16:n])
+                left -= n
+        files += 1
+        size += nbytes
+
+    conversations = max(1, int(60 * scale))
+    for c in range(conversations):
+        conv = os.path.join(root, "Data", f"conv_{rnd.getrandbits(40):010x}")
+        for m in range(rnd.randint(3, 12)):
+            month = f"2024-{m + 1:02d}"
+            # Thumbnail rất nhỏ, lồng sâu theo cuộc trò chuyện / tháng / ngày
+            for i in range(rnd.randint(20, 120)):
+                day = f"{rnd.randint(1, 28):02d}"
+                write(os.path.join(conv, "thumb", month, day, f"t{i}.jpg"), rnd.randint(2, 24) * 1024)
+            for i in range(rnd.randint(2, 10)):
+                write(os.path.join(conv, "image", month, f"img{i}.jpg"), rnd.randint(40, 300) * 1024)
+            if rnd.random() < 0.08:
+                write(os.path.join(conv, "file", month, f"doc{m}.pdf"), rnd.randint(1, 6) * 1024 * 1024)
+        if rnd.random() < 0.1:
+            write(os.path.join(conv, "video", f"v{c}.mp4"), rnd.randint(24, 48) * 1024 * 1024)
+
+    for i in range(max(1, int(3 * scale))):
+        db = os.path.join(root, "Database", f"acc_{i}")
+        write(os.path.join(db, "msg.db"), rnd.randint(32, 96) * 1024 * 1024)
+        write(os.path.join(db, "msg.db-wal"), rnd.randint(1, 8) * 1024 * 1024)
+        write(os.path.join(db, "contact.db"), rnd.randint(1, 4) * 1024 * 1024)
+    return files, size
+
+
+def measure(fn, files, size):
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    return {"seconds": round(seconds, 3), "files_per_s": round(files / seconds, 1),
+            "mb_per_s": round(size / seconds / (1024 * 1024), 2)}
+
+
+def run_once(work, scale, seed):
+    """One pass over every benchmark on a freshly generated tree"""
+    src = os.path.join(work, "home", "ZaloData")
+    dst = os.path.join(work, "D", "ZaloMove", "ZaloData")
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    files, size = make_zalo_tree(src, scale, seed)
+    results = {}
+
+    store = BackupStore(os.path.join(work, "store"))
+    results["size"] = measure(lambda: get_folder_size(src), files, size)
+    snapshot = []
+    results["backup"] = measure(lambda: snapshot.append(store.backup(src, "ZaloData")), files, size)
+    results["backup"]["stored_mb"] = round(store.find(snapshot[0])["stored"] / (1024 * 1024), 1)
+    results["restore"] = measure(lambda: store.restore(snapshot[0], src + ".restored"), files, size)
+    shutil.rmtree(src + ".restored")
+    # Như nút "Xóa bản sao lưu": bỏ snapshot rồi xóa các khối không còn dùng
+    results["delete_backup"] = measure(
+        lambda: purge(stage_snapshots(store, store.snapshots())[0], threading.Event()), files, size)
+
+    def move():
+        result = run_moves([MoveJob("ZaloData", src, dst, backup=False)], threading.Event())
+        if result["errors"] or result["moved"] != ["ZaloData"]:
+            raise RuntimeError(f"move failed: {result['errors']}")
+    results["move"] = measure(move, files, size)
+
+    if not fs.backend().is_link(src):
+        raise RuntimeError("move did not leave a link behind")
+    return files, size, results
+
+
+def compare(results, baseline, threshold):
+    """Regression messages for every files/s or MB/s below (1 - threshold) x baseline"""
+    problems = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if current is None:
+            continue
+        for key in ("files_per_s", "mb_per_s"):
+            if base.get(key) and current[key] < base[key] * (1 - threshold):
+                problems.append(f"{name} {key}: {current[key]} < {base[key]} "
+                                f"(-{(1 - current[key] / base[key]) * 100:.0f}%)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="tree size factor (1.0 ≈ 36k files, 1.2 GB)")
+    parser.add_argument("--repeat", type=int, default=3, help="passes; the best one counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work", help="temp folder to run in (default: system temp)")
+    parser.add_argument("--baseline", help="JSON from --save to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown against the baseline (0.2 = 20%%)")
+    parser.add_argument("--save", help="write the results as a baseline JSON")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="zalomove-suite-", dir=args.work)
+    # Journal, links.json, trace... của lần chạy thử nằm trong thư mục tạm
+    os.environ["LOCALAPPDATA"] = os.path.join(work, "state")
+    fs.use_backend(fs.FakeBackend(cross_device=True))
+    best = {}
+    try:
+        for i in range(args.repeat):
+            run_dir = os.path.join(work, f"run{i}")
+            files, size, results = run_once(run_dir, args.scale, args.seed)
+            shutil.rmtree(run_dir, ignore_errors=True)
+            for name, r in results.items():
+                if name not in best or r["seconds"] < best[name]["seconds"]:
+                    best[name] = r
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    report = {"files": files, "bytes": size, "scale": args.scale, "results": best}
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{files} files, {size / (1024 * 1024):.1f} MB, best of {args.repeat}")
+        for name in BENCHES:
+            r = best[name]
+            line = (f"{name:<14} {r['seconds']:8.2f} s  {r['files_per_s']:10.0f} files/s  "
+                    f"{r['mb_per_s']:8.1f} MB/s")
+            if "stored_mb" in r:
+                line += f"  (stored {r['stored_mb']:.1f} MB)"
+            print(line)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("scale") != args.scale:
+            print(f"warning: baseline was recorded at --scale {baseline.get('scale')}", file=sys.stderr)
+        problems = compare(best, baseline["results"], args.threshold)
+        for p in problems:
+            print(f"REGRESSION {p}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,542 @@
+"""Command-line interface: everything the window does, without Qt.
+
+    python app.py --sizes [--prune] [--breakdown [N]] [--json]
+    python app.py --move ZaloData ZaloPC --dest D:\\ --yes [--json]
+    python app.py --move all --dest D:\\ --dry-run
+    python app.py --move ZaloData --dest D:\\ --background 10 --yes
+    python app.py --move all --dest D:\\ --all-users --yes --json
+    python app.py --resync --yes
+    python app.py --delete-backups --yes
+    python app.py --restore-backup [NAME] [--dest D:\\restore]
+    python app.py --recover list | forward | back
+    python app.py --verify [quick | full] [--all-users]
+
+Exit codes are the EXIT_* constants below.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import traceback
+
+from core import journal as jn
+from core.backupstore import (BackupStore, DEFAULT_LEVEL, default_store, format_snapshot,
+                              restore_snapshot)
+from core.copier import MoveCancelled
+from core.mover import prepare_jobs, run_moves, recover_moves, can_roll_forward
+from core.planner import plan_moves, format_plan, plan_to_dict
+from core.procs import release_folders, move_roots
+from core.profiles import find_profiles
+from core.progress import format_size
+from core.purge import stage_backups, stage_snapshots, pending_purges, purge
+from core.rules import load_rules, scan_prunable
+from core.scanner import TOP_N
+from core.scheduler import run_batch
+from core.sync import linked_destination
+from core.throttle import DEFAULT_RATE_MB, Throttle
+from core.trace import Profiler, event
+from core.verify import verify_folders
+from core.zalo import (FOLDERS, MOVE_DIR, movable, is_junction, find_backups)
+
+
+EXIT_OK = 0            # xong, không có lỗi
+EXIT_FAILED = 1        # có thư mục bị lỗi (xem "errors")
+EXIT_USAGE = 2         # sai tham số (argparse)
+EXIT_REFUSED = 3       # kế hoạch không thực hiện được (thiếu chỗ trống...)
+EXIT_ABORTED = 4       # cần xác nhận nhưng không có --yes
+EXIT_PENDING = 5       # còn lần di chuyển chưa hoàn tất, cần --recover trước
+EXIT_CANCELLED = 130   # Ctrl+C
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="app.py",
+        description="ZaloMove: di chuyển thư mục Zalo sang ổ khác và tạo liên kết (junction). "
+                    "Không có tham số → mở cửa sổ.")
+    command = parser.add_mutually_exclusive_group(required=True)
+    command.add_argument("--move", nargs="+", metavar="FOLDER", choices=list(FOLDERS) + ["all"],
+                         help=f"thư mục cần di chuyển: {', '.join(FOLDERS)} hoặc all")
+    command.add_argument("--sizes", action="store_true",
+                         help="liệt kê dung lượng, trạng thái liên kết, backup và lần di chuyển dở")
+    command.add_argument("--resync", action="store_true",
+                         help="đồng bộ và liên kết lại các thư mục Zalo đã tạo lại sau khi cập nhật")
+    command.add_argument("--delete-backups", action="store_true",
+                         help="xóa các bản sao lưu (kho nén và thư mục .old của bản cũ)")
+    command.add_argument("--restore-backup", nargs="?", const="", metavar="NAME",
+                         help="không có NAME: liệt kê bản sao lưu; có NAME: khôi phục vào "
+                              "<thư mục gốc>.old (hoặc vào --dest)")
+    command.add_argument("--recover", choices=["list", "forward", "back"],
+                         help="lần di chuyển bị gián đoạn: liệt kê, hoàn tất hoặc hoàn tác")
+    command.add_argument("--verify", nargs="?", const="quick", choices=["quick", "full"],
+                         help="kiểm tra các thư mục đã di chuyển theo manifest: quick (kích thước, "
+                              "mtime — mặc định) hoặc full (đọc lại và so checksum)")
+    parser.add_argument("--dest", help="thư mục đích (ZaloMove sẽ nằm trong đó); "
+                                       "bỏ trống = nơi đã di chuyển lần trước")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="chỉ in kế hoạch di chuyển, không thay đổi gì")
+    parser.add_argument("--yes", "-y", action="store_true", help="không hỏi xác nhận")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="ghi đè thư mục đích nếu đã tồn tại; khi đồng bộ: cho phép xóa tệp ở đích "
+                             "không còn ở thư mục Zalo mới (được sao lưu trước)")
+    parser.add_argument("--no-backup", action="store_true", help="không sao lưu trước khi di chuyển")
+    parser.add_argument("--backup-level", type=int, default=DEFAULT_LEVEL, metavar="N",
+                        help=f"mức nén bản sao lưu: zstd 1-19 (mặc định {DEFAULT_LEVEL}), "
+                             f"zlib tối đa 9 khi không có gói zstandard")
+    parser.add_argument("--no-verify", action="store_true", help="không kiểm tra checksum khi copy")
+    parser.add_argument("--prune", action="store_true",
+                        help="bỏ qua cache, log và bộ cài cũ theo rules.json (với --sizes: chỉ báo dung lượng)")
+    parser.add_argument("--background", nargs="?", type=float, const=DEFAULT_RATE_MB, metavar="MBPS",
+                        help=f"chạy nền: giới hạn tốc độ copy (mặc định {DEFAULT_RATE_MB} MB/s), "
+                             f"ưu tiên CPU/IO thấp, tự giảm tốc khi ổ đĩa đang bận")
+    parser.add_argument("--breakdown", nargs="?", type=int, const=TOP_N, metavar="N",
+                        help=f"với --sizes: N thư mục con và loại tệp lớn nhất của mỗi thư mục "
+                             f"(mặc định {TOP_N}); quét lại toàn bộ, không dùng index")
+    parser.add_argument("--all-users", action="store_true",
+                        help="mọi profile trên máy có thư mục Zalo (cần quyền admin); "
+                             "đích: <dest>\\ZaloMove\\<user>\\<thư mục>")
+    parser.add_argument("--hash", action="store_true",
+                        help="khi đồng bộ, so sánh cả CRC32 của tệp có cùng kích thước và mtime")
+    parser.add_argument("--json", action="store_true", help="in kết quả dạng JSON ra stdout")
+    parser.add_argument("--profile", nargs="?", const="", metavar="PATH",
+                        help="chạy dưới cProfile, ghi PATH.prof và PATH.txt "
+                             "(mặc định trong thư mục logs cạnh trace.jsonl)")
+    return parser
+
+
+class Console:
+    """Progress and messages go to stderr so stdout stays clean for --json"""
+
+    def __init__(self, as_json):
+        self.as_json = as_json
+        self.live = sys.stderr.isatty()
+        self._width = 0
+
+    def status(self, text):
+        if not self.live:
+            return
+        line = text[:119]
+        sys.stderr.write("\r" + line.ljust(self._width))
+        sys.stderr.flush()
+        self._width = len(line)
+
+    def progress(self, done, total):
+        pass    # dòng trạng thái đã có phần trăm / ETA
+
+    def clear(self):
+        if self.live and self._width:
+            sys.stderr.write("\r" + " " * self._width + "\r")
+            sys.stderr.flush()
+            self._width = 0
+
+    def info(self, text):
+        self.clear()
+        print(text, file=sys.stderr if self.as_json else sys.stdout)
+
+    def confirm(self, question, yes):
+        """True if --yes was given or the user answers y on an interactive terminal"""
+        if yes:
+            return True
+        if self.as_json or not sys.stdin.isatty():
+            return False
+        self.clear()
+        return input(f"{question} [y/N] ").strip().lower() in ("y", "yes", "c", "có")
+
+
+def run_task(console, fn, *args, **kwargs):
+    """Run fn like a GUI worker does; Ctrl+C asks it to stop instead of killing it mid-file"""
+    cancel = threading.Event()
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = fn(*args, cancel=cancel, progress=console.progress,
+                                   status=console.status, **kwargs)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, name="task")
+    thread.start()
+    while thread.is_alive():
+        try:
+            thread.join(0.2)
+        except KeyboardInterrupt:
+            cancel.set()
+            console.info("Đang hủy...")
+    console.clear()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+def cmd_sizes(args, console):
+    from core.scanner import scan_folders, format_breakdown, breakdown_to_dict
+    from core.sizeindex import open_size_index
+
+    if args.all_users:
+        tables = [(p.user, p.folders) for p in find_profiles(movable_only=False)]
+    else:
+        tables = [(None, FOLDERS)]
+    roots = {f"{user}/{name}" if user else name: path
+             for user, table in tables for name, path in table.items()}
+    # Chi tiết dung lượng cần liệt kê mọi thư mục → cùng một lượt quét, không dùng index
+    trees = {} if args.breakdown else None
+    sizes = run_task(console, scan_folders, roots,
+                     index=None if trees is not None else open_size_index(), trees=trees)
+    folders = []
+    for user, table in tables:
+        for name, path in table.items():
+            key = f"{user}/{name}" if user else name
+            size, files = sizes.get(key, (0, 0))
+            folders.append({"name": key, "path": path, "exists": os.path.exists(path),
+                            "linked": is_junction(path), "bytes": size, "files": files})
+            folders[-1]["relink"] = (folders[-1]["exists"] and not folders[-1]["linked"]
+                                     and linked_destination(key) is not None)
+    if args.prune:
+        movable_folders = {f["name"]: f["path"] for f in folders if f["exists"] and not f["linked"]}
+        prunable = run_task(console, scan_prunable, movable_folders, load_rules())
+        for f in folders:
+            f["prunable_bytes"], f["prunable_files"] = prunable.get(f["name"], (0, 0))
+    backups = [{"name": name, "path": path} for name, path in find_backups()]
+    snapshots = default_store().snapshots()
+    pending = [{"name": s["name"], "src": s["src"], "dst": s["dst"],
+                "can_finish": can_roll_forward(s)} for s in jn.pending_journals()]
+
+    if not args.json:
+        width = max(len(f["name"]) for f in folders) + 1
+        for f in folders:
+            if not f["exists"]:
+                state = "Not Found"
+            elif f["linked"]:
+                state = "đã di chuyển"
+            else:
+                state = f"{format_size(f['bytes'])}, {f['files']} tệp"
+                if f["relink"]:
+                    state += ", cần --resync"
+                if f.get("prunable_files"):
+                    state += f" (bỏ được {format_size(f['prunable_bytes'])})"
+            console.info(f"{f['name']:<{width}} {state:<44} {f['path']}")
+        for b in backups:
+            console.info(f"Backup      {b['path']}")
+        for snapshot in snapshots:
+            console.info(f"Backup      {format_snapshot(snapshot)}")
+        for p in pending:
+            console.info(f"Chưa xong   {p['name']}: {p['src']} → {p['dst']}")
+        if trees:
+            console.info(format_breakdown(trees, args.breakdown))
+    data = {"folders": folders, "backups": backups, "snapshots": snapshots, "pending": pending}
+    if trees is not None:
+        data["breakdown"] = breakdown_to_dict(trees, args.breakdown)
+    return EXIT_OK, data
+
+
+def _move_groups(args, names):
+    """[(owner, {folder: path}, new_base)] to move: this profile, or every profile with --all-users"""
+    if args.all_users:
+        if not args.dest:
+            return None
+        return [(p.user, {n: p.folders[n] for n in names if movable(n, p.folders)},
+                 os.path.join(args.dest, MOVE_DIR, p.user))
+                for p in find_profiles()]
+
+    selected = {name: FOLDERS[name] for name in names if movable(name)}
+    if args.dest:
+        new_base = os.path.join(args.dest, MOVE_DIR)
+    else:
+        # Không có --dest → dùng nơi đã di chuyển lần trước (nếu mọi thư mục cùng một nơi)
+        bases = {os.path.dirname(linked_destination(name) or "") for name in selected}
+        if selected and (len(bases) != 1 or "" in bases):
+            return None
+        new_base = bases.pop() if bases else ""
+    return [(None, selected, new_base)]
+
+
+def profile_report(groups, jobs, result):
+    """{user: {"moved", "errors", "not_run"}} for --all-users"""
+    report = {owner: {"moved": [], "errors": [], "not_run": []} for owner, _, _ in groups}
+    for job in jobs:
+        entry = report[job.owner]
+        folder = job.name.split("/", 1)[1]
+        outcome = result["results"].get(job.name)
+        if outcome is None:
+            entry["not_run"].append(folder)
+            continue
+        if job.name in outcome["moved"]:
+            entry["moved"].append(folder)
+        entry["errors"] += outcome["errors"]
+    return report
+
+
+def cmd_move(args, console):
+    names = list(FOLDERS) if "all" in args.move else list(dict.fromkeys(args.move))
+    groups = _move_groups(args, names)
+    if groups is None:
+        console.info("Cần --dest khi di chuyển.")
+        return EXIT_USAGE, {}
+    groups = [group for group in groups if group[1]]
+    if not groups:
+        console.info("Không có thư mục nào cần di chuyển.")
+        return EXIT_OK, {"moved": [], "errors": []}
+
+    declined = []
+
+    def ask(kind, path):
+        if kind in ("sync", "resume"):
+            # Đồng bộ / chạy tiếp chỉ copy phần còn thiếu; xóa tệp ở đích khi đồng bộ cần --overwrite
+            return True
+        if not args.overwrite:
+            declined.append(f"{path} đã tồn tại, dùng --overwrite để ghi đè")
+        return args.overwrite
+
+    rules = load_rules() if args.prune else None
+    # Một Throttle chung → giới hạn là tổng tốc độ, kể cả khi nhiều profile chạy song song
+    throttle = Throttle(args.background * 1024 * 1024) if args.background else None
+    store = BackupStore(level=args.backup_level) if not args.no_backup else None
+    jobs = []
+    errors = []
+    for owner, selected, new_base in groups:
+        group_jobs, group_errors = prepare_jobs(selected, new_base, ask, backup=not args.no_backup,
+                                                verify=not args.no_verify, rules=rules,
+                                                compare_hash=args.hash, owner=owner,
+                                                throttle=throttle, store=store,
+                                                allow_deletes=args.overwrite)
+        jobs += group_jobs
+        errors += group_errors
+    errors += declined
+    data = {"dest": os.path.dirname(groups[0][2]) if args.all_users else groups[0][2],
+            "moved": [], "errors": errors}
+    if not jobs:
+        for e in errors:
+            console.info(e)
+        pending = [jn.find_journal(f"{owner}/{name}" if owner else name)
+                   for owner, selected, _ in groups for name in selected]
+        if any(state is not None and can_roll_forward(state) for state in pending):
+            return EXIT_PENDING, data
+        return EXIT_FAILED, data
+
+    plan = run_task(console, plan_moves, jobs)
+    data["plan"] = plan_to_dict(plan)
+    if not args.json:
+        console.info(format_plan(plan))
+    if args.dry_run:
+        return (EXIT_OK if plan.ok else EXIT_REFUSED), data
+    if not plan.ok:
+        return EXIT_REFUSED, data
+    if not console.confirm("Bắt đầu di chuyển?", args.yes):
+        console.info("Chưa di chuyển: cần xác nhận (dùng --yes khi chạy không tương tác).")
+        return EXIT_ABORTED, data
+
+    # Đóng đúng các tiến trình đang giữ tệp trong thư mục sắp di chuyển (mọi user), chờ nhả handle
+    data["processes"] = run_task(console, release_folders, move_roots(jobs))
+    stopped = data["processes"]["closed"] + data["processes"]["killed"]
+    if stopped:
+        console.info(f"Đã đóng {len(stopped)} tiến trình để di chuyển.")
+    if data["processes"]["locked"]:
+        data["errors"] += [f"Tệp vẫn đang bị giữ: {locker}" for locker in data["processes"]["locked"]]
+        for e in data["errors"]:
+            console.info(e)
+        return EXIT_FAILED, data
+
+    for _, _, new_base in groups:
+        os.makedirs(new_base, exist_ok=True)
+    # Nhiều profile → chạy song song theo ổ đĩa vật lý
+    result = run_task(console, run_batch if args.all_users else run_moves, jobs)
+    data["moved"] = result["moved"]
+    data["errors"] += result["errors"]
+    data["cancelled"] = result["cancelled"]
+    data["saved"] = {"bytes": result["saved"][0], "files": result["saved"][1]}
+
+    for e in data["errors"]:
+        console.info(e)
+    if args.all_users:
+        data["profiles"] = profile_report(groups, jobs, result)
+        for user, entry in data["profiles"].items():
+            line = f"{user}: đã di chuyển {', '.join(entry['moved']) or 'không có'}"
+            if entry["errors"]:
+                line += f", {len(entry['errors'])} lỗi"
+            if entry["not_run"]:
+                line += f", chưa chạy {', '.join(entry['not_run'])}"
+            console.info(line)
+    elif result["moved"]:
+        console.info(f"Đã di chuyển: {', '.join(result['moved'])}")
+    if result["saved"][1]:
+        console.info(f"Đã bỏ qua {format_size(result['saved'][0])} ({result['saved'][1]} tệp) "
+                     f"cache/log có thể tạo lại.")
+    if result["cancelled"]:
+        if jn.pending_journals():
+            console.info("Phần đã copy được giữ lại: chạy lại lệnh để tiếp tục, hoặc --recover back để hoàn tác.")
+        return EXIT_CANCELLED, data
+    return (EXIT_FAILED if data["errors"] else EXIT_OK), data
+
+
+def cmd_resync(args, console):
+    args.move = [name for name in FOLDERS if movable(name) and linked_destination(name)]
+    if not args.move:
+        console.info("Không có thư mục nào cần liên kết lại.")
+        return EXIT_OK, {"moved": [], "errors": []}
+    return cmd_move(args, console)
+
+
+def cmd_delete_backups(args, console):
+    backups = find_backups()
+    store = default_store()
+    snapshots = store.snapshots()
+    leftovers = pending_purges()
+    data = {"deleted": [], "freed": 0, "errors": []}
+    if not backups and not snapshots and not leftovers:
+        console.info("Không tìm thấy bản sao lưu nào để xóa.")
+        return EXIT_OK, data
+    if backups or snapshots:
+        for _, path in backups:
+            console.info(path)
+        for snapshot in snapshots:
+            console.info(format_snapshot(snapshot))
+        if not console.confirm("Xóa các bản sao lưu trên?", args.yes):
+            return EXIT_ABORTED, data
+
+    # Đổi tên / bỏ snapshot trước (tức thì), rồi xóa luôn cả phần còn sót từ lần trước
+    data["errors"] = stage_backups(backups)[1] + stage_snapshots(store, snapshots)[1]
+    result = run_task(console, purge, pending_purges())
+    data["deleted"] = result["purged"]
+    data["freed"] = result["freed"]
+    data["errors"] += result["errors"]
+    for e in data["errors"]:
+        console.info(e)
+    if data["deleted"]:
+        console.info(f"Đã xóa backup: {', '.join(data['deleted'])} "
+                     f"(giải phóng {format_size(data['freed'])})")
+    if result["cancelled"]:
+        console.info("Đã dừng xóa; chạy lại --delete-backups để xóa tiếp.")
+        return EXIT_CANCELLED, data
+    return (EXIT_FAILED if data["errors"] else EXIT_OK), data
+
+
+def cmd_restore_backup(args, console):
+    store = default_store()
+    snapshots = store.snapshots()
+    data = {"snapshots": snapshots, "errors": []}
+    if not args.restore_backup:
+        for snapshot in snapshots:
+            console.info(f"{snapshot['id']}  {format_snapshot(snapshot)}")
+        if not snapshots:
+            console.info("Chưa có bản sao lưu nào.")
+        return EXIT_OK, data
+
+    snapshot = next((s for s in reversed(snapshots)
+                     if args.restore_backup in (s["name"], s["id"])), None)
+    if snapshot is None:
+        console.info(f"Không tìm thấy bản sao lưu {args.restore_backup}.")
+        return EXIT_USAGE, data
+    target = (os.path.join(args.dest, os.path.basename(snapshot["source"])) if args.dest
+              else f"{snapshot['source']}.old")
+    data["restored"] = target
+    if os.path.lexists(target):
+        data["errors"].append(f"{target} đã tồn tại, hãy xóa hoặc chọn --dest khác")
+        console.info(data["errors"][0])
+        return EXIT_FAILED, data
+    console.info(f"{format_snapshot(snapshot)} → {target}")
+    run_task(console, restore_snapshot, store, snapshot["id"], target)
+    console.info(f"Đã khôi phục vào {target}")
+    return EXIT_OK, data
+
+
+def cmd_verify(args, console):
+    if args.all_users:
+        tables = [(p.user, p.folders) for p in find_profiles(movable_only=False)]
+    else:
+        tables = [(None, FOLDERS)]
+    # Chỉ các thư mục đã di chuyển (là liên kết) → kiểm tra bản ở đích
+    folders = {}
+    for user, table in tables:
+        for name, path in table.items():
+            key = f"{user}/{name}" if user else name
+            if is_junction(path):
+                folders[key] = linked_destination(key) or os.path.realpath(path)
+    if not folders:
+        console.info("Không có thư mục nào đã di chuyển để kiểm tra.")
+        return EXIT_OK, {"verified": [], "bad": {}, "unchecked": [], "errors": []}
+
+    result = run_task(console, verify_folders, folders, full=args.verify == "full")
+    data = {"verified": [name for name in folders
+                         if name not in result["bad"] and name not in result["unchecked"]],
+            "bad": result["bad"], "unchecked": result["unchecked"],
+            "errors": [f"{name}: {len(bad)} tệp thiếu hoặc khác bản đã copy"
+                       for name, bad in result["bad"].items()]}
+    if not args.json:
+        for name in data["verified"]:
+            console.info(f"{name}: OK ({folders[name]})")
+        for name in data["unchecked"]:
+            console.info(f"{name}: không có manifest, bỏ qua ({folders[name]})")
+        for name, bad in data["bad"].items():
+            console.info(f"{name}: {len(bad)} tệp thiếu hoặc khác bản đã copy ({folders[name]})")
+            for rel in bad[:20]:
+                console.info(f"    {rel}")
+            if len(bad) > 20:
+                console.info(f"    ... và {len(bad) - 20} tệp khác")
+    return (EXIT_FAILED if data["bad"] else EXIT_OK), data
+
+
+def cmd_recover(args, console):
+    states = jn.pending_journals()
+    data = {"pending": [{"name": s["name"], "src": s["src"], "dst": s["dst"],
+                         "can_finish": can_roll_forward(s)} for s in states],
+            "errors": []}
+    if args.recover == "list" or not states:
+        for p in data["pending"]:
+            how = "hoàn tất hoặc hoàn tác" if p["can_finish"] else "chỉ hoàn tác"
+            console.info(f"{p['name']}: {p['src']} → {p['dst']} ({how})")
+        if not states:
+            console.info("Không có lần di chuyển nào chưa hoàn tất.")
+        return (EXIT_PENDING if states else EXIT_OK), data
+
+    actions = []
+    for state in states:
+        if args.recover == "forward" and not can_roll_forward(state):
+            data["errors"].append(f"{state['name']}: dữ liệu ở đích chưa đầy đủ, chỉ có thể hoàn tác")
+            continue
+        actions.append((args.recover, state))
+    data["errors"] += run_task(console, recover_moves, actions)
+    still_pending = {s["name"] for s in jn.pending_journals()}
+    data["recovered"] = [state["name"] for _, state in actions if state["name"] not in still_pending]
+    for e in data["errors"]:
+        console.info(e)
+    return (EXIT_FAILED if data["errors"] else EXIT_OK), data
+
+
+COMMANDS = [("move", cmd_move), ("resync", cmd_resync), ("sizes", cmd_sizes),
+            ("delete_backups", cmd_delete_backups), ("restore_backup", cmd_restore_backup),
+            ("recover", cmd_recover), ("verify", cmd_verify)]
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.breakdown is not None and not args.sizes:
+        parser.error("--breakdown chỉ dùng cùng --sizes")
+    if args.background is not None and args.background <= 0:
+        parser.error("--background cần tốc độ lớn hơn 0 MB/s")
+    console = Console(args.json)
+    command, handler = next((name, fn) for name, fn in COMMANDS if getattr(args, name) not in (None, False))
+    event("start", front="cli", command=command, argv=argv if argv is not None else sys.argv[1:])
+
+    profiler = Profiler() if args.profile is not None else None
+    if profiler:
+        profiler.start()
+    try:
+        code, data = handler(args, console)
+    except MoveCancelled:
+        code, data = EXIT_CANCELLED, {"cancelled": True}
+    except Exception as e:
+        code, data = EXIT_FAILED, {"errors": [f"Lỗi: {e}"]}
+        console.info(f"Lỗi: {e}")
+        event("error", front="cli", command=command, error=str(e), traceback=traceback.format_exc())
+    if profiler:
+        data["profile"] = profiler.stop(args.profile or None)
+        console.info(f"cProfile: {data['profile']}")
+    event("exit", front="cli", command=command, exit_code=code)
+
+    if args.json:
+        json.dump({"command": command, "exit_code": code, **data}, sys.stdout,
+                  ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    return code
@@ -0,0 +1,568 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+import zlib
+
+try:
+    import zstandard
+except ImportError:     # không bắt buộc: thiếu thì nén bằng zlib
+    zstandard = None
+
+from core.copier import MoveCancelled, check_cancel, _Lane, _shutdown_lanes
+from core.progress import ProgressTracker, format_size
+from core.state import state_dir
+from core.trace import phase
+
+
+CHUNK_SIZE = 1024 * 1024            # tệp được cắt thành khối 1 MB, mỗi khối chỉ lưu một lần
+DEFAULT_LEVEL = 3                   # mức nén zstd (zlib tối đa 9)
+STORE_WORKERS = min(8, os.cpu_count() or 4)   # luồng hash + nén; zstd, zlib và blake2b đều nhả GIL
+LARGE_WORKERS = 2                   # tệp lớn: đọc tuần tự, các khối được nén song song
+SMALL_BATCH_FILES = 64
+MIN_SAVING = 0.03                   # nén được ít hơn 3% → lưu nguyên khối
+PROBE_BYTES = 64 * 1024             # thử nén nhanh 64 KB đầu khối trước khi nén cả khối
+LOCK_POLL = 0.2                     # giây giữa 2 lần thử lại khi kho đang được dọn
+# Định dạng đã nén sẵn → lưu nguyên, không tốn CPU nén lại
+COMPRESSED_TYPES = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".mp4", ".mov", ".mkv", ".webm",
+                    ".mp3", ".m4a", ".aac", ".ogg", ".zip", ".7z", ".rar", ".gz", ".xz", ".zst",
+                    ".cab", ".msi", ".nupkg"}
+
+CHUNKS = "chunks"
+SNAPSHOTS = "snapshots"
+PARTIAL = ".partial"
+GC_LOCK = "gc.lock"                 # giữ trong lúc liệt kê + xóa khối rác; bản sao lưu chờ khóa này
+GC_STAMP = "gc.stamp"               # đổi sau mỗi lần dọn → danh sách khối đã biết phải đọc lại
+# Byte đầu của mỗi khối cho biết cách giải nén
+RAW, ZLIB, ZSTD = b"R", b"D", b"Z"
+
+
+def new_snapshot_id():
+    return time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]
+
+
+def _hash(data):
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def _lock_file(f):
+    """Non-blocking exclusive OS lock on an open file; False if another handle holds it.
+
+    The OS drops the lock when the holder exits, so a crash never leaves it held."""
+    try:
+        f.seek(0)
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock_file(f):
+    try:
+        f.seek(0)
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    except OSError:
+        pass
+
+
+def _write_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class BackupStore:
+    """Compressed, deduplicated backups of whole folders (instead of <folder>.old copies).
+
+    Files are cut into CHUNK_SIZE chunks stored under their BLAKE2b hash, so
+    a chunk already in the store (an earlier run, another profile, the same
+    installer twice) is never written again. New chunks are compressed with
+    zstd when the zstandard package is installed, zlib otherwise, on a pool
+    of worker threads; chunks that don't shrink are stored as they are.
+
+    A snapshot is a header (snapshots/<id>.json) plus its file list
+    (<id>.tree). The header is written last, so only complete backups are
+    listed. Chunks no snapshot refers to any more are listed by garbage()
+    and deleted by the purge worker, under lock_gc(). A running backup
+    holds a locked .partial marker, which keeps collection off the store;
+    a backup that starts while a collection runs waits for it, then
+    re-reads which chunks still exist."""
+
+    def __init__(self, root=None, level=DEFAULT_LEVEL, workers=STORE_WORKERS):
+        self.root = root or state_dir("backups")
+        self.level = level
+        self.workers = workers
+        self._local = threading.local()
+        self._known = None
+        self._known_stamp = None
+        self._known_lock = threading.Lock()
+        os.makedirs(os.path.join(self.root, CHUNKS), exist_ok=True)
+        os.makedirs(os.path.join(self.root, SNAPSHOTS), exist_ok=True)
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.root, CHUNKS, digest[:2], digest)
+
+    def _snapshot_path(self, snapshot_id, ext=".json"):
+        return os.path.join(self.root, SNAPSHOTS, snapshot_id + ext)
+
+    def _gc_stamp(self):
+        try:
+            with open(os.path.join(self.root, GC_STAMP), encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _load_known(self):
+        """Hashes of every chunk in the store, read again only after a garbage collection"""
+        stamp = self._gc_stamp()
+        with self._known_lock:
+            if self._known is not None and self._known_stamp == stamp:
+                return
+            self._known_stamp = stamp
+            known = set()
+            with os.scandir(os.path.join(self.root, CHUNKS)) as it:
+                for sub in it:
+                    if sub.is_dir(follow_symlinks=False):
+                        known.update(name for name in os.listdir(sub.path) if not name.endswith(".tmp"))
+            self._known = known
+
+    def _encode(self, data, compress):
+        if compress and len(data) > PROBE_BYTES:
+            # Dữ liệu ngẫu nhiên / đã mã hóa: bỏ qua sớm, không tốn CPU nén cả 1 MB
+            sample = data[:PROBE_BYTES]
+            compress = len(zlib.compress(sample, 1)) <= len(sample) * (1 - MIN_SAVING)
+        if compress:
+            if zstandard is not None:
+                compressor = getattr(self._local, "zstd", None)
+                if compressor is None:
+                    compressor = self._local.zstd = zstandard.ZstdCompressor(level=self.level)
+                blob = ZSTD + compressor.compress(data)
+            else:
+                blob = ZLIB + zlib.compress(data, min(self.level, 9))
+            if len(blob) <= len(data) * (1 - MIN_SAVING):
+                return blob
+        return RAW + bytes(data)
+
+    def _put(self, digest, data, compress, verify):
+        """Store one chunk unless the store already has it; returns the bytes written"""
+        with self._known_lock:
+            if digest in self._known:
+                return 0
+            self._known.add(digest)
+        path = self._chunk_path(digest)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            blob = self._encode(data, compress)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(blob)
+            if verify and self._read_chunk(digest, tmp) is None:
+                raise OSError(f"Khối sao lưu đọc lại không khớp: {digest}")
+            os.replace(tmp, path)
+        except BaseException:
+            with self._known_lock:
+                self._known.discard(digest)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        return len(blob)
+
+    def _read_chunk(self, digest, path=None):
+        """The chunk's data, or None if it doesn't match its hash"""
+        with open(path or self._chunk_path(digest), "rb") as f:
+            blob = f.read()
+        kind, body = blob[:1], memoryview(blob)[1:]
+        if kind == RAW:
+            data = body
+        elif kind == ZLIB:
+            data = zlib.decompress(body)
+        elif kind == ZSTD:
+            if zstandard is None:
+                raise OSError("Bản sao lưu được nén bằng zstd, cần cài gói zstandard để đọc")
+            data = zstandard.ZstdDecompressor().decompress(body)
+        else:
+            return None
+        return data if _hash(data) == digest else None
+
+    def backup(self, src, name, cancel=None, on_file=None, include=None, on_bytes=None,
+               verify=False, throttle=None, span=None, snapshot_id=None):
+        """Store the folder src as a new snapshot of name; returns the snapshot id.
+
+        Callbacks work as in copy_tree: include(path, stat) can leave a file
+        out, on_file(path, stat, None) follows each stored file and on_bytes(n)
+        the data read. With verify every new chunk is read back and checked.
+        Earlier snapshots of name are dropped once this one is complete.
+        Raises shutil.Error with every file that could not be stored."""
+        snapshot_id = snapshot_id or new_snapshot_id()
+        # Dấu .partial được khóa suốt lần sao lưu: đang khóa = đang chạy, không khóa được = đã chết
+        marker = self._snapshot_path(snapshot_id, PARTIAL)
+        marker_file = open(marker, "w", encoding="utf-8")
+        marker_file.write(src)
+        marker_file.flush()
+        _lock_file(marker_file)
+        try:
+            # Dấu đã ghi trước → lần dọn nào bắt đầu sau đó sẽ thấy và bỏ qua kho này
+            self._wait_gc(cancel)
+            self._load_known()
+        except BaseException:
+            _unlock_file(marker_file)
+            marker_file.close()
+            os.remove(marker)
+            raise
+
+        files = []
+        dirs = []
+        stored = [0]
+        errors = []
+        lock = threading.Lock()
+
+        def failed(path, why):
+            with lock:
+                errors.append((path, snapshot_id, str(why)))
+
+        def put(path, digest, data, compress):
+            if cancel is not None and cancel.is_set():
+                return
+            try:
+                n = self._put(digest, data, compress, verify)
+            except OSError as why:
+                failed(path, why)
+                return
+            with lock:
+                stored[0] += n
+
+        def read_chunks(path, compress, direct):
+            """Hash the file chunk by chunk; direct=True stores inline, else on the chunk lane"""
+            digests = []
+            with open(path, "rb") as f:
+                while True:
+                    check_cancel(cancel)
+                    data = f.read(CHUNK_SIZE)
+                    if not data:
+                        break
+                    digest = _hash(data)
+                    digests.append(digest)
+                    if direct:
+                        put(path, digest, data, compress)
+                    else:
+                        chunk_lane.submit(put, path, digest, data, compress)
+                    if throttle is not None:
+                        throttle.consume(len(data), cancel)
+                    if on_bytes is not None:
+                        on_bytes(len(data))
+            return digests
+
+        def store_files(batch, direct):
+            for path, rel, st in batch:
+                if cancel is not None and cancel.is_set():
+                    return
+                start = time.perf_counter()
+                compress = os.path.splitext(path)[1].lower() not in COMPRESSED_TYPES
+                try:
+                    digests = read_chunks(path, compress, direct)
+                    if span is not None:
+                        span.file(path, st.st_size, time.perf_counter() - start)
+                    if on_file is not None:
+                        on_file(path, st, None)
+                except MoveCancelled:
+                    return
+                except OSError as why:
+                    failed(path, why)
+                    continue
+                with lock:
+                    files.append([rel, st.st_size, st.st_mtime_ns, st.st_mode & 0o777, digests])
+
+        small = _Lane(self.workers, "store-small")
+        large = _Lane(LARGE_WORKERS, "store-large")
+        chunk_lane = _Lane(self.workers, "store-chunk")
+        try:
+            try:
+                stack = [(src, "")]
+                batch = []
+                while stack:
+                    check_cancel(cancel)
+                    path, rel = stack.pop()
+                    try:
+                        st = os.stat(path)
+                        with os.scandir(path) as it:
+                            entries = list(it)
+                    except OSError as why:
+                        failed(path, why)
+                        continue
+                    dirs.append([rel, st.st_mtime_ns, st.st_mode & 0o777])
+                    for entry in entries:
+                        child = f"{rel}/{entry.name}" if rel else entry.name
+                        try:
+                            if entry.is_dir():
+                                stack.append((entry.path, child))
+                                continue
+                            st = entry.stat()
+                        except OSError as why:
+                            failed(entry.path, why)
+                            continue
+                        if include is not None and not include(entry.path, st):
+                            continue
+                        if st.st_size > CHUNK_SIZE:
+                            large.submit(store_files, [(entry.path, child, st)], False)
+                            continue
+                        batch.append((entry.path, child, st))
+                        if len(batch) >= SMALL_BATCH_FILES:
+                            small.submit(store_files, batch, True)
+                            batch = []
+                if batch:
+                    small.submit(store_files, batch, True)
+            finally:
+                # Làn khối chờ sau cùng: các tệp lớn còn đang đẩy khối vào nó
+                _shutdown_lanes(small, large, chunk_lane)
+            check_cancel(cancel)
+            if errors:
+                if span is not None:
+                    span.error(len(errors))
+                raise shutil.Error(errors)
+
+            header = {"id": snapshot_id, "name": name, "source": src, "time": time.time(),
+                      "files": len(files), "bytes": sum(f[1] for f in files), "stored": stored[0],
+                      "codec": "zstd" if zstandard is not None else "zlib"}
+            tree = json.dumps({"dirs": dirs, "files": files}, ensure_ascii=False).encode("utf-8")
+            _write_atomic(self._snapshot_path(snapshot_id, ".tree"), zlib.compress(tree))
+            _write_atomic(self._snapshot_path(snapshot_id), json.dumps(header, ensure_ascii=False).encode("utf-8"))
+            if span is not None:
+                span.set(stored=stored[0])
+        finally:
+            _unlock_file(marker_file)
+            marker_file.close()
+            os.remove(marker)
+
+        for old in self.snapshots(name):
+            if old["id"] != snapshot_id:
+                self.drop(old["id"])
+        return snapshot_id
+
+    def snapshots(self, name=None):
+        """Headers of the complete snapshots (of name), oldest first"""
+        headers = []
+        folder = os.path.join(self.root, SNAPSHOTS)
+        for entry in os.listdir(folder):
+            if not entry.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(folder, entry), encoding="utf-8") as f:
+                    header = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if name is None or header["name"] == name:
+                headers.append(header)
+        return sorted(headers, key=lambda h: h["time"])
+
+    def find(self, snapshot_id):
+        """The header of one snapshot, or None"""
+        try:
+            with open(self._snapshot_path(snapshot_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _tree(self, snapshot_id):
+        with open(self._snapshot_path(snapshot_id, ".tree"), "rb") as f:
+            return json.loads(zlib.decompress(f.read()))
+
+    def drop(self, snapshot_id):
+        """Forget a snapshot (instant); its chunks go with the next garbage collection"""
+        os.remove(self._snapshot_path(snapshot_id))
+        try:
+            os.remove(self._snapshot_path(snapshot_id, ".tree"))
+        except FileNotFoundError:
+            pass
+
+    def busy(self):
+        """True while a backup into this store is running (its .partial marker is locked).
+
+        A marker nobody holds is left by a crashed backup and is removed."""
+        folder = os.path.join(self.root, SNAPSHOTS)
+        with os.scandir(folder) as it:
+            markers = [entry.path for entry in it if entry.name.endswith(PARTIAL)]
+        for path in markers:
+            try:
+                f = open(path, "r+", encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            except OSError:
+                return True     # Windows: đang bị tiến trình khác mở, xóa không được
+            with f:
+                if not _lock_file(f):
+                    return True
+                _unlock_file(f)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                return True
+        return False
+
+    def lock_gc(self):
+        """Take the collection lock without waiting; returns a handle for unlock_gc, or None if held.
+
+        Hold it from garbage() until the chunks are deleted, and check busy()
+        only once it is taken: a backup writes its marker before waiting on
+        this lock, so one of the two always sees the other."""
+        f = open(os.path.join(self.root, GC_LOCK), "a+", encoding="utf-8")
+        if _lock_file(f):
+            return f
+        f.close()
+        return None
+
+    def unlock_gc(self, handle):
+        """Release lock_gc(); backups re-read the chunk list since some may be gone"""
+        try:
+            _write_atomic(os.path.join(self.root, GC_STAMP), uuid.uuid4().hex.encode("ascii"))
+        finally:
+            _unlock_file(handle)
+            handle.close()
+
+    def _wait_gc(self, cancel=None):
+        """Block while a collection holds the store (raises MoveCancelled)"""
+        while True:
+            handle = self.lock_gc()
+            if handle is not None:
+                _unlock_file(handle)
+                handle.close()
+                return
+            if cancel is not None:
+                if cancel.wait(LOCK_POLL):
+                    raise MoveCancelled()
+            else:
+                time.sleep(LOCK_POLL)
+
+    def garbage(self, cancel=None):
+        """[(path, size)] of chunk files no snapshot refers to (plus leftovers of interrupted writes).
+
+        Call only under lock_gc() and when not busy(): a running backup's
+        chunks aren't referenced yet."""
+        referenced = set()
+        for header in self.snapshots():
+            check_cancel(cancel)
+            try:
+                tree = self._tree(header["id"])
+            except (OSError, ValueError, zlib.error):
+                continue
+            for entry in tree["files"]:
+                referenced.update(entry[4])
+        found = []
+        with os.scandir(os.path.join(self.root, CHUNKS)) as it:
+            subs = [sub.path for sub in it if sub.is_dir(follow_symlinks=False)]
+        for sub in subs:
+            check_cancel(cancel)
+            with os.scandir(sub) as it:
+                for entry in it:
+                    if entry.name not in referenced:
+                        try:
+                            found.append((entry.path, entry.stat(follow_symlinks=False).st_size))
+                        except OSError:
+                            continue
+        return found
+
+    def restore(self, snapshot_id, dest, cancel=None, on_file=None, on_bytes=None):
+        """Write a snapshot back out as the folder dest, streaming one chunk at a time.
+
+        Every chunk is checked against its hash. Timestamps and permission bits
+        are restored, directories last. Raises shutil.Error listing failed files."""
+        tree = self._tree(snapshot_id)
+        errors = []
+        lock = threading.Lock()
+
+        def target(rel):
+            return os.path.join(dest, *rel.split("/")) if rel else dest
+
+        for rel, _, _ in tree["dirs"]:
+            os.makedirs(target(rel), exist_ok=True)
+
+        def restore_files(batch):
+            for rel, size, mtime_ns, mode, digests in batch:
+                if cancel is not None and cancel.is_set():
+                    return
+                path = target(rel)
+                try:
+                    with open(path, "wb") as f:
+                        for digest in digests:
+                            check_cancel(cancel)
+                            data = self._read_chunk(digest)
+                            if data is None:
+                                raise OSError(f"Khối sao lưu bị hỏng: {digest}")
+                            f.write(data)
+                            if on_bytes is not None:
+                                on_bytes(len(data))
+                    os.utime(path, ns=(mtime_ns, mtime_ns))
+                    os.chmod(path, mode)
+                    if on_file is not None:
+                        on_file(path, size)
+                except MoveCancelled:
+                    return
+                except OSError as why:
+                    with lock:
+                        errors.append((rel, path, str(why)))
+
+        lane = _Lane(self.workers, "restore")
+        try:
+            files = tree["files"]
+            for i in range(0, len(files), SMALL_BATCH_FILES):
+                check_cancel(cancel)
+                lane.submit(restore_files, files[i:i + SMALL_BATCH_FILES])
+        finally:
+            lane.shutdown()
+        check_cancel(cancel)
+
+        for rel, mtime_ns, mode in reversed(tree["dirs"]):
+            try:
+                os.utime(target(rel), ns=(mtime_ns, mtime_ns))
+                os.chmod(target(rel), mode)
+            except OSError as why:
+                errors.append((rel, target(rel), str(why)))
+        if errors:
+            raise shutil.Error(errors)
+
+
+def default_store():
+    """The store in %LOCALAPPDATA%\\ZaloMover\\backups"""
+    return BackupStore()
+
+
+def format_snapshot(header):
+    """One line for a snapshot: name, size, what it added to the store and when"""
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(header["time"]))
+    return (f"{header['name']}: {format_size(header['bytes'])}, {header['files']} tệp, "
+            f"ghi thêm {format_size(header['stored'])} ({header['codec']}, {when})")
+
+
+def restore_snapshot(store, snapshot_id, dest, cancel=None, progress=None, status=None):
+    """Worker task: restore a snapshot into dest with byte progress; a cancelled restore is removed"""
+    header = store.find(snapshot_id)
+    tracker = ProgressTracker(header["bytes"], header["files"], progress, status)
+    tracker.set_phase(f"Đang khôi phục {header['name']}")
+    try:
+        with phase("restore", job=header["name"], snapshot=snapshot_id) as span:
+            store.restore(snapshot_id, dest, cancel, lambda path, size: tracker.add_files(),
+                          tracker.add_bytes)
+            span.count(header["bytes"], header["files"])
+    except MoveCancelled:
+        shutil.rmtree(dest, ignore_errors=True)
+        raise
+    return dest
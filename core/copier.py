@@ -0,0 +1,266 @@
+import os
+import shutil
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from core.verify import file_crc32
+
+
+# Tuning cho 2 làn copy: nhiều tệp nhỏ (ảnh, thumbnail, sqlite) và ít tệp lớn (video, installer)
+LARGE_FILE_SIZE = 8 * 1024 * 1024     # tệp >= 8 MB đi làn lớn
+SMALL_WORKERS = min(16, (os.cpu_count() or 4) * 2)
+LARGE_WORKERS = 2
+LARGE_BUFFER = 4 * 1024 * 1024        # buffer đọc/ghi của làn lớn
+QUEUE_PER_WORKER = 4                  # số tác vụ chờ tối đa cho mỗi worker
+SMALL_BATCH_FILES = 64                # gom tệp nhỏ thành lô để giảm overhead mỗi tác vụ
+SMALL_BATCH_BYTES = 4 * 1024 * 1024
+VERIFY_RETRIES = 2                    # số lần copy lại khi checksum ở đích không khớp
+BACKGROUND_WORKERS = (2, 1)           # chạy nền: (làn nhỏ, làn lớn), ít I/O chờ cùng lúc hơn
+
+
+class MoveCancelled(Exception):
+    """Raised when the user cancels a running move"""
+
+
+def check_cancel(cancel):
+    """Raise MoveCancelled if the cancel event has been set"""
+    if cancel is not None and cancel.is_set():
+        raise MoveCancelled()
+
+
+class _Lane:
+    """A thread pool with a bounded queue so enumeration can't run far ahead of the copies.
+
+    Tasks report per-file errors themselves; anything else a task lets
+    escape is kept and re-raised by shutdown(), never dropped."""
+
+    def __init__(self, workers, name):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self.slots = threading.BoundedSemaphore(workers * QUEUE_PER_WORKER)
+        self.failure = None
+
+    def submit(self, fn, *args):
+        self.slots.acquire()
+        future = self.pool.submit(fn, *args)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        self.slots.release()
+        if future.cancelled() or self.failure is not None:
+            return
+        failure = future.exception()
+        if failure is not None and not isinstance(failure, MoveCancelled):
+            self.failure = failure
+
+    def shutdown(self):
+        """Wait for every task, then raise the first exception one of them let escape"""
+        _shutdown_lanes(self)
+
+
+def _shutdown_lanes(*lanes):
+    """Wait for every lane (even when one failed), then raise the first escaped exception"""
+    for lane in lanes:
+        lane.pool.shutdown(wait=True)
+    for lane in lanes:
+        if lane.failure is not None:
+            raise lane.failure
+
+
+class TreeCopier:
+    """Copy a folder tree with a bounded worker pool.
+
+    The calling thread enumerates directories while the small-file and
+    large-file lanes copy; directory timestamps are applied last.
+
+    With verify=True every file is hashed (CRC32) from the bytes already in
+    memory while it is copied, the destination is read back and compared,
+    and a mismatching file is copied again.
+
+    With a Throttle every written chunk is paid for in tokens, which caps
+    the combined throughput of both lanes. With a trace Phase each file's
+    copy time is reported to it, so the slowest files end up in the trace."""
+
+    def __init__(self, small_workers=SMALL_WORKERS, large_workers=LARGE_WORKERS,
+                 large_file_size=LARGE_FILE_SIZE, buffer_size=LARGE_BUFFER,
+                 batch_files=SMALL_BATCH_FILES, batch_bytes=SMALL_BATCH_BYTES,
+                 verify=False, throttle=None, span=None):
+        self.small_workers = small_workers
+        self.large_workers = large_workers
+        self.large_file_size = large_file_size
+        self.buffer_size = buffer_size
+        self.batch_files = batch_files
+        self.batch_bytes = batch_bytes
+        self.verify = verify
+        self.throttle = throttle
+        self.span = span
+        self._buffers = threading.local()
+
+    def copy(self, src, dst, cancel=None, on_file=None, dirs_exist_ok=False, include=None,
+             on_bytes=None):
+        """Copy src to dst like shutil.copytree; raises shutil.Error with every failed file.
+
+        on_file(path, stat, digest) is called after each copied file (digest is
+        None unless verifying) and on_bytes(n) as data is written (per chunk for
+        large files); include(path, stat) can return False to leave a file out
+        (e.g. already copied when resuming)."""
+        errors = []
+        errors_lock = threading.Lock()
+        dirs = []
+
+        def copy_large(s, d, st):
+            if cancel is not None and cancel.is_set():
+                return
+            start = time.perf_counter()
+            try:
+                if self.verify:
+                    digest = self._copy_verified(s, d, cancel, on_bytes)
+                else:
+                    digest = self._copy_chunked(s, d, cancel, on_bytes)
+                if self.span is not None:
+                    self.span.file(s, st.st_size, time.perf_counter() - start)
+                # Tệp chỉ tính là đã copy khi manifest ghi được → lỗi ở đây cũng là lỗi của tệp
+                if on_file is not None:
+                    on_file(s, st, digest)
+            except MoveCancelled:
+                return
+            except OSError as why:
+                with errors_lock:
+                    errors.append((s, d, str(why)))
+
+        def copy_small(batch):
+            for s, d, st in batch:
+                if cancel is not None and cancel.is_set():
+                    return
+                digest = None
+                start = time.perf_counter()
+                try:
+                    if self.verify:
+                        digest = self._copy_verified(s, d, cancel, on_bytes)
+                    else:
+                        shutil.copy2(s, d)
+                        if self.throttle is not None:
+                            self.throttle.consume(st.st_size, cancel)
+                        if on_bytes is not None:
+                            on_bytes(st.st_size)
+                    if self.span is not None:
+                        self.span.file(s, st.st_size, time.perf_counter() - start)
+                    if on_file is not None:
+                        on_file(s, st, digest)
+                except MoveCancelled:
+                    return
+                except OSError as why:
+                    with errors_lock:
+                        errors.append((s, d, str(why)))
+
+        small = _Lane(self.small_workers, "copy-small")
+        large = _Lane(self.large_workers, "copy-large")
+        try:
+            os.makedirs(dst, exist_ok=dirs_exist_ok)
+            stack = [(src, dst)]
+            batch = []
+            batch_size = 0
+            while stack:
+                check_cancel(cancel)
+                s_dir, d_dir = stack.pop()
+                dirs.append((s_dir, d_dir))
+                try:
+                    with os.scandir(s_dir) as it:
+                        entries = list(it)
+                except OSError as why:
+                    with errors_lock:
+                        errors.append((s_dir, d_dir, str(why)))
+                    continue
+
+                for entry in entries:
+                    d = os.path.join(d_dir, entry.name)
+                    try:
+                        if entry.is_dir():
+                            os.makedirs(d, exist_ok=dirs_exist_ok)
+                            stack.append((entry.path, d))
+                            continue
+                        st = entry.stat()
+                    except OSError as why:
+                        with errors_lock:
+                            errors.append((entry.path, d, str(why)))
+                        continue
+                    if include is not None and not include(entry.path, st):
+                        continue
+                    if st.st_size >= self.large_file_size:
+                        large.submit(copy_large, entry.path, d, st)
+                        continue
+                    batch.append((entry.path, d, st))
+                    batch_size += st.st_size
+                    if len(batch) >= self.batch_files or batch_size >= self.batch_bytes:
+                        small.submit(copy_small, batch)
+                        batch = []
+                        batch_size = 0
+            if batch:
+                small.submit(copy_small, batch)
+        finally:
+            _shutdown_lanes(small, large)
+
+        check_cancel(cancel)
+
+        # Ghi file vào thư mục làm đổi mtime → áp timestamp thư mục sau cùng, từ dưới lên
+        for s_dir, d_dir in reversed(dirs):
+            try:
+                shutil.copystat(s_dir, d_dir)
+            except OSError as why:
+                errors.append((s_dir, d_dir, str(why)))
+
+        if errors:
+            if self.span is not None:
+                self.span.error(len(errors))
+            raise shutil.Error(errors)
+
+    def _buffer(self):
+        """Per-thread copy buffer, reused for every file the worker copies"""
+        buf = getattr(self._buffers, "buf", None)
+        if buf is None:
+            buf = self._buffers.buf = bytearray(self.buffer_size)
+        return buf
+
+    def _copy_chunked(self, src, dst, cancel, on_bytes=None, digest=False):
+        """Chunked copy with a cancel check between chunks; returns the CRC32 if digest"""
+        buf = self._buffer()
+        view = memoryview(buf)
+        crc = 0
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            while True:
+                check_cancel(cancel)
+                n = fsrc.readinto(buf)
+                if not n:
+                    break
+                chunk = view[:n]
+                if digest:
+                    crc = zlib.crc32(chunk, crc)
+                fdst.write(chunk)
+                if self.throttle is not None:
+                    self.throttle.consume(n, cancel)
+                if on_bytes is not None:
+                    on_bytes(n)
+        shutil.copystat(src, dst)
+        return crc if digest else None
+
+    def _copy_verified(self, src, dst, cancel, on_bytes=None):
+        """Copy, read the destination back and compare checksums; copy again on mismatch"""
+        for attempt in range(VERIFY_RETRIES + 1):
+            # Chỉ tính tiến độ ở lần copy đầu
+            crc = self._copy_chunked(src, dst, cancel, on_bytes if attempt == 0 else None, True)
+            if file_crc32(dst, self._buffer()) == crc:
+                return crc
+        raise OSError(f"Dữ liệu ở đích không khớp sau {VERIFY_RETRIES + 1} lần copy: {dst}")
+
+
+def copy_tree(src, dst, cancel=None, on_file=None, copier=None, dirs_exist_ok=False, include=None,
+              on_bytes=None, verify=False, throttle=None, span=None):
+    """Copy a folder with the parallel engine (default tuning unless a copier is given).
+
+    With a Throttle (background mode) fewer workers are used, so the disk
+    queue stays short for whatever the user is doing meanwhile."""
+    if copier is None:
+        workers = BACKGROUND_WORKERS if throttle is not None else (SMALL_WORKERS, LARGE_WORKERS)
+        copier = TreeCopier(*workers, verify=verify, throttle=throttle, span=span)
+    copier.copy(src, dst, cancel, on_file, dirs_exist_ok, include, on_bytes)
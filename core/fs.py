@@ -0,0 +1,133 @@
+import errno
+import os
+import stat
+import subprocess
+
+
+FAKE_LINK_MARKER = ".zalomover-link"    # tệp đánh dấu "liên kết" của FakeBackend
+LINK_REPARSE_TAGS = (0xA0000003, 0xA000000C)   # IO_REPARSE_TAG_MOUNT_POINT (junction), _SYMLINK
+
+
+class LinkBackend:
+    """How folders are linked and renamed: junctions on Windows, symlinks elsewhere.
+
+    The move, size and delete code only goes through backend() for links and
+    for the same-volume rename, so it runs (and can be measured) on any OS."""
+
+    name = "base"
+
+    def link(self, old_path, new_path):
+        """Make old_path point to the folder at new_path"""
+        raise NotImplementedError
+
+    def is_link(self, path):
+        """True if path is a link (without following it)"""
+        raise NotImplementedError
+
+    def unlink(self, path):
+        """Remove the link at path without touching its target"""
+        raise NotImplementedError
+
+    def rename(self, src, dst):
+        """Rename on one volume; raises OSError (EXDEV / ERROR_NOT_SAME_DEVICE) across volumes"""
+        os.rename(src, dst)
+
+
+class JunctionBackend(LinkBackend):
+    """NTFS junctions: no admin rights or developer mode needed, unlike symlinks"""
+
+    name = "junction"
+
+    def link(self, old_path, new_path):
+        try:
+            import _winapi
+            _winapi.CreateJunction(os.path.abspath(new_path), old_path)
+        except (ImportError, AttributeError):
+            subprocess.run(f'mklink /J "{old_path}" "{new_path}"', shell=True, check=True)
+
+    def is_link(self, path):
+        # Chỉ junction/symlink, không tính reparse point khác (vd. thư mục OneDrive)
+        try:
+            tag = os.lstat(path).st_reparse_tag
+        except (OSError, AttributeError):
+            return False
+        return tag in LINK_REPARSE_TAGS
+
+    def unlink(self, path):
+        os.rmdir(path)
+
+
+class SymlinkBackend(LinkBackend):
+    """Directory symlinks (Linux, macOS)"""
+
+    name = "symlink"
+
+    def link(self, old_path, new_path):
+        os.symlink(new_path, old_path, target_is_directory=True)
+
+    def is_link(self, path):
+        return os.path.islink(path)
+
+    def unlink(self, path):
+        os.unlink(path)
+
+
+class FakeBackend(LinkBackend):
+    """Links as plain folders holding a marker file, for benchmarks and tests in a temp dir.
+
+    With cross_device=True every rename fails like a move to another drive,
+    so moves take the copy-then-delete path even inside one temp dir."""
+
+    name = "fake"
+
+    def __init__(self, cross_device=False):
+        self.cross_device = cross_device
+
+    def link(self, old_path, new_path):
+        os.makedirs(old_path)
+        with open(os.path.join(old_path, FAKE_LINK_MARKER), "w", encoding="utf-8") as f:
+            f.write(new_path)
+
+    def is_link(self, path):
+        try:
+            return stat.S_ISREG(os.lstat(os.path.join(path, FAKE_LINK_MARKER)).st_mode)
+        except OSError:
+            return False
+
+    def unlink(self, path):
+        os.remove(os.path.join(path, FAKE_LINK_MARKER))
+        os.rmdir(path)
+
+    def target(self, path):
+        with open(os.path.join(path, FAKE_LINK_MARKER), encoding="utf-8") as f:
+            return f.read()
+
+    def rename(self, src, dst):
+        if self.cross_device:
+            raise OSError(errno.EXDEV, os.strerror(errno.EXDEV), src, None, dst)
+        os.rename(src, dst)
+
+
+BACKENDS = {"junction": JunctionBackend, "symlink": SymlinkBackend, "fake": FakeBackend}
+
+_backend = None
+
+
+def default_backend():
+    """ZALOMOVER_LINKS=junction|symlink|fake, otherwise junctions on Windows and symlinks elsewhere"""
+    name = os.environ.get("ZALOMOVER_LINKS") or ("junction" if os.name == "nt" else "symlink")
+    return BACKENDS.get(name, SymlinkBackend)()
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        _backend = default_backend()
+    return _backend
+
+
+def use_backend(new_backend):
+    """Switch every link and rename to new_backend (None: back to the default); returns the old one"""
+    global _backend
+    old, _backend = _backend, new_backend
+    return old
@@ -0,0 +1,117 @@
+import os
+import json
+import threading
+import time
+
+from core.state import state_dir
+
+
+# Các mốc của một lần di chuyển, theo thứ tự
+BACKED_UP = "backed_up"              # bản sao lưu (snapshot "backup" trong kho nén) đã ghi xong
+RENAMED = "renamed"                  # cùng ổ đĩa: đã rename sang đích
+COPIED = "copied"                    # khác ổ đĩa: đã copy đủ sang đích
+REMOVING_SOURCE = "removing_source"  # bắt đầu xóa nguồn, từ đây dữ liệu chuẩn nằm ở đích
+SOURCE_REMOVED = "source_removed"
+LINKED = "linked"
+
+
+def journal_dir():
+    return state_dir("journals")
+
+
+def journal_path(name):
+    # Di chuyển nhiều profile: tên dạng "<user>/<folder>"
+    return os.path.join(journal_dir(), f"{name.replace('/', '.')}.journal")
+
+
+class MoveJournal:
+    """Append-only JSON-lines journal of one folder move.
+
+    Every record is fsynced before returning. Per-file progress lives in the
+    checkpoint manifest next to the destination (see core.manifest)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    @classmethod
+    def begin(cls, name, src, dst, backup_id=None, manifest=None):
+        """Start a new journal for a move, replacing any earlier one for the same folder"""
+        path = journal_path(name)
+        if os.path.exists(path):
+            os.remove(path)
+        journal = cls(path)
+        journal._write({"op": "begin", "name": name, "src": src, "dst": dst,
+                        "backup": backup_id, "manifest": manifest, "time": time.time()})
+        return journal
+
+    def phase(self, name):
+        """Record that the move reached a phase; durable before returning"""
+        self._write({"op": "phase", "phase": name, "time": time.time()})
+
+    def commit(self):
+        """The move finished: the journal is no longer needed"""
+        self.close()
+        os.remove(self.path)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def _write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+
+def load_journal(path):
+    """Read a journal back; a torn last line (crash mid-write) is ignored"""
+    state = {"path": path, "phases": set()}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            op = record.get("op")
+            if op == "begin":
+                state.update(name=record["name"], src=record["src"],
+                             dst=record["dst"], backup=record.get("backup"),
+                             manifest=record.get("manifest"), time=record.get("time"))
+            elif op == "phase":
+                state["phases"].add(record["phase"])
+    if "name" not in state:
+        return None
+    return state
+
+
+def pending_journals():
+    """Journals left behind by moves that never finished (crash, power loss, kill)"""
+    result = []
+    for entry in sorted(os.listdir(journal_dir())):
+        if not entry.endswith(".journal"):
+            continue
+        path = os.path.join(journal_dir(), entry)
+        state = load_journal(path)
+        if state is None:
+            # Chưa kịp ghi bản ghi begin → không có gì để khôi phục
+            os.remove(path)
+            continue
+        result.append(state)
+    return result
+
+
+def discard_journal(state):
+    if os.path.exists(state["path"]):
+        os.remove(state["path"])
+
+
+def find_journal(name):
+    """The unfinished journal for one folder, or None"""
+    path = journal_path(name)
+    if not os.path.exists(path):
+        return None
+    return load_journal(path)
@@ -0,0 +1,114 @@
+import os
+import json
+import threading
+import time
+
+
+# Trạng thái của một tệp trong manifest
+COPIED = "copied"        # đã copy, chưa kiểm tra
+VERIFIED = "verified"    # đã copy và checksum ở đích khớp với nguồn
+RENAMED = "renamed"      # cùng ổ đĩa: chỉ rename, không copy
+
+FLUSH_EVERY = 500        # số bản ghi tối đa giữ trong bộ nhớ
+FLUSH_INTERVAL = 1.0     # giây
+MTIME_TOLERANCE_NS = 2 * 10**9   # FAT/exFAT chỉ lưu mtime tới 2 giây
+
+
+def manifest_path(new_path):
+    """<ZaloMove>/.zalomove/<name>.manifest, next to (not inside) the moved folder"""
+    base, name = os.path.split(os.path.normpath(new_path))
+    return os.path.join(base, ".zalomove", f"{name}.manifest")
+
+
+def has_manifest(new_path):
+    return os.path.exists(manifest_path(new_path))
+
+
+def load_manifest(path):
+    """Return {rel: record} for every completed file; later records win"""
+    files = {}
+    if not os.path.exists(path):
+        return files
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break    # dòng cuối bị cắt dở khi crash
+            if "rel" in record:
+                files[record["rel"]] = record
+    return files
+
+
+def file_matches(record, st, dst_path):
+    """True if a manifest record still describes the source file and its copy at dst_path"""
+    if record.get("size") != st.st_size or record.get("mtime_ns") != st.st_mtime_ns:
+        return False
+    try:
+        dst = os.stat(dst_path)
+    except OSError:
+        return False
+    return (dst.st_size == st.st_size
+            and abs(dst.st_mtime_ns - st.st_mtime_ns) <= MTIME_TOLERANCE_NS)
+
+
+class CheckpointManifest:
+    """Per-file checkpoint of a move (path, size, mtime, state), written as JSON lines.
+
+    A rerun loads it with resume=True and skips files that are already
+    at the destination with the same size and mtime."""
+
+    def __init__(self, new_path, src, resume=False):
+        self.path = manifest_path(new_path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.src = src
+        self.completed = load_manifest(self.path) if resume else {}
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        if not resume:
+            self._pending.append(json.dumps({"src": src, "dst": new_path, "time": time.time()},
+                                            ensure_ascii=False))
+            self.flush()
+
+    def is_done(self, path, st, dst_path):
+        """True if path was copied by an earlier run and is unchanged on both sides"""
+        record = self.completed.get(os.path.relpath(path, self.src))
+        return record is not None and file_matches(record, st, dst_path)
+
+    def add(self, path, st, digest=None, state=None):
+        """Record a finished file (thread-safe, buffered); a digest marks it verified"""
+        record = {"rel": os.path.relpath(path, self.src), "size": st.st_size,
+                  "mtime_ns": st.st_mtime_ns}
+        if digest is not None:
+            record["crc32"] = digest
+        record["state"] = state or (VERIFIED if digest is not None else COPIED)
+        with self._lock:
+            self._pending.append(json.dumps(record, ensure_ascii=False))
+            if (len(self._pending) >= FLUSH_EVERY
+                    or time.monotonic() - self._last_flush >= FLUSH_INTERVAL):
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._flush_locked()
+                self._file.close()
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _flush_locked(self):
+        if self._pending:
+            self._file.write("\n".join(self._pending) + "\n")
+            self._pending = []
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
@@ -0,0 +1,522 @@
+import os
+import errno
+import shutil
+
+from core import journal as jn
+from core.backupstore import default_store, new_snapshot_id
+from core import fs
+from core.copier import MoveCancelled, check_cancel, copy_tree
+from core.manifest import CheckpointManifest, RENAMED, has_manifest
+from core.progress import ProgressTracker
+from core.rules import scan_with_rules
+from core.scanner import scan_tree
+from core.sync import (SYNC_BACKUP_SUFFIX, compare_trees, deleted_filter, sync_tree, record_link,
+                       linked_destination)
+from core.throttle import low_priority
+from core.trace import phase
+
+
+class MoveJob:
+    """One folder to move: where it is, where it goes and what to clean first"""
+
+    def __init__(self, name, old_path, new_path, backup=True,
+                 replace_new=False, resume=False, backup_id=None, backup_done=False,
+                 verify=False, rules=None, sync=False, compare_hash=False, owner=None, throttle=None,
+                 store=None, allow_deletes=False):
+        self.name = name
+        # Chạy cho nhiều profile: tên user sở hữu thư mục (name = "<owner>/<folder>")
+        self.owner = owner
+        self.old_path = old_path
+        self.new_path = new_path
+        self.backup = backup
+        # Bản sao lưu nén + khử trùng lặp (core/backupstore.py) thay cho thư mục <folder>.old
+        self.store = (store or default_store()) if backup else None
+        self.backup_id = backup_id
+        self.replace_new = replace_new
+        # Tiếp tục lần di chuyển bị gián đoạn: giữ dữ liệu ở đích, bỏ qua tệp đã copy
+        self.resume = resume
+        self.backup_done = backup_done
+        # Kiểm tra checksum từng tệp ngay khi copy, copy lại tệp hỏng trước khi tạo liên kết
+        self.verify = verify
+        # FolderRules: cache/log có thể tạo lại → không sao lưu, không copy sang đích
+        self.rules = rules
+        # Zalo tạo lại thư mục sau khi cập nhật → chỉ đồng bộ phần khác với bản ở đích rồi liên kết lại
+        self.sync = sync
+        self.compare_hash = compare_hash
+        # Đồng bộ được phép xóa tệp ở đích (đã xác nhận: --overwrite / hộp thoại kế hoạch)
+        self.allow_deletes = allow_deletes
+        # Throttle: chạy nền, giới hạn MB/s (dùng chung cho mọi job của một lần chạy)
+        self.throttle = throttle
+        self.diff = None
+        # (bytes, files) — planner điền sẵn để khỏi quét lại
+        self.size = None
+
+
+def prepare_jobs(folders, new_base, ask, backup=True, verify=False, rules=None, compare_hash=False,
+                 owner=None, throttle=None, store=None, allow_deletes=False):
+    """Turn {name: old_path} into MoveJobs under new_base.
+
+    ask(kind, path) decides the cases that need the user: "sync" a
+    folder Zalo recreated with the earlier copy at path, "resume" an
+    interrupted copy, or "replace_new" an existing destination. Declining
+    a replace skips the folder. Backups go to store (the default
+    BackupStore if None); a sync backs up the files it deletes from the
+    earlier copy, and the planner refuses those deletes unless
+    allow_deletes. With a RuleSet, regenerable files are left out of
+    the backup and the copy. With an owner (another user's profile) jobs
+    are named "<owner>/<folder>". With a Throttle every copy runs in
+    background mode at a capped rate. Returns (jobs, error strings)."""
+    jobs = []
+    errors = []
+    if backup and store is None:
+        store = default_store()
+    for folder, old_path in folders.items():
+        new_path = os.path.join(new_base, folder)
+        name = f"{owner}/{folder}" if owner else folder
+
+        # Lần trước đã chuyển xong dữ liệu nhưng chưa tạo liên kết → phải khôi phục trước
+        pending = jn.find_journal(name)
+        if pending is not None and can_roll_forward(pending):
+            errors.append(f"{name}: lần di chuyển trước chưa hoàn tất, hãy hoàn tất hoặc hoàn tác trước")
+            continue
+
+        # Đích là bản đã di chuyển xong trước đây (không còn journal) → đồng bộ thay vì copy lại
+        if (os.path.isdir(new_path) and os.path.isdir(old_path) and not is_link(old_path)
+                and pending is None and is_previous_move(name, new_path)):
+            if ask("sync", new_path):
+                jobs.append(MoveJob(name, old_path, new_path, backup=backup, verify=verify,
+                                    sync=True, compare_hash=compare_hash, owner=owner,
+                                    throttle=throttle, store=store, allow_deletes=allow_deletes))
+                continue
+
+        # Bản copy dở của lần trước → hỏi có chạy tiếp không
+        resume = os.path.exists(new_path) and has_manifest(new_path) and ask("resume", new_path)
+
+        # Nếu folder đã tồn tại trong zalo_move → hỏi có overwrite không
+        replace_new = False
+        if os.path.exists(new_path) and not resume:
+            if not ask("replace_new", new_path):
+                continue
+            replace_new = True
+
+        if not os.path.exists(old_path):
+            errors.append(f"{name} không tìm thấy tại {old_path}")
+            continue
+
+        # Đã sao lưu xong ở lần chạy dở trước → dùng lại bản sao lưu đó
+        backup_done = (resume and pending is not None and jn.BACKED_UP in pending["phases"]
+                       and pending.get("backup") is not None)
+
+        jobs.append(MoveJob(name, old_path, new_path, backup=backup, replace_new=replace_new,
+                            resume=resume, backup_id=pending["backup"] if backup_done else None,
+                            backup_done=backup_done, verify=verify,
+                            rules=rules.for_folder(folder, old_path) if rules else None,
+                            owner=owner, throttle=throttle, store=store))
+    return jobs, errors
+
+
+def _is_cross_device(error):
+    # Windows: ERROR_NOT_SAME_DEVICE (17), POSIX: EXDEV
+    return getattr(error, "winerror", None) == 17 or error.errno == errno.EXDEV
+
+
+def move_tree(src, dst, cancel=None, on_file=None):
+    """Move a folder: rename on the same volume, copy then delete across volumes.
+
+    Returns True if the data had to be copied."""
+    try:
+        fs.backend().rename(src, dst)
+        return False
+    except OSError as e:
+        if not _is_cross_device(e):
+            raise
+
+    try:
+        copy_tree(src, dst, cancel, on_file)
+    except BaseException:
+        # Bản copy dở dang → xóa, nguồn vẫn còn nguyên
+        shutil.rmtree(dst, ignore_errors=True)
+        raise
+    shutil.rmtree(src)
+    return True
+
+
+def link_folder(old_path, new_path):
+    """Create a junction (symlink off Windows) old_path → new_path"""
+    fs.backend().link(old_path, new_path)
+
+
+def is_link(path):
+    """True if path is a junction or symlink (without following it)"""
+    return fs.backend().is_link(path)
+
+
+def unlink_folder(path):
+    """Remove a junction/symlink without touching its target"""
+    fs.backend().unlink(path)
+
+
+def is_previous_move(name, new_path):
+    """True if new_path holds a finished earlier move of name"""
+    linked = linked_destination(name)
+    if linked is not None:
+        return os.path.normcase(os.path.abspath(linked)) == os.path.normcase(os.path.abspath(new_path))
+    # Chuyển bằng bản cũ chưa ghi links.json: manifest còn mà journal đã xong
+    return has_manifest(new_path)
+
+
+def _copy_size(job, cancel=None):
+    """(bytes, files) that moving job copies: everything except what job.rules leaves out"""
+    if job.sync:
+        if job.diff is None:
+            job.diff = compare_trees(job.old_path, job.new_path, cancel, job.compare_hash)
+        return job.diff.copy_bytes, job.diff.copy_files
+    if job.rules is None:
+        return scan_tree(job.old_path, cancel)
+    size, files, pruned, pruned_files = scan_with_rules(job.old_path, job.rules, cancel)
+    return size - pruned, files - pruned_files
+
+
+def _rules_filter(job, saved):
+    """include() for copy_tree that leaves out files matched by job.rules, counting them in saved"""
+    def include(path, st):
+        if job.rules is not None and job.rules.matches(path, st):
+            saved[0] += st.st_size
+            saved[1] += 1
+            return False
+        return True
+    return include
+
+
+def _move_journaled(job, journal, manifest, cancel, tracker, saved):
+    """Move job.old_path to job.new_path, recording phases in the journal and files in the manifest"""
+    with phase("move", job=job.name, resume=job.resume, verify=job.verify) as span:
+        if not job.resume:
+            try:
+                fs.backend().rename(job.old_path, job.new_path)
+            except OSError as e:
+                if not _is_cross_device(e):
+                    raise
+            else:
+                span.set(renamed=True)
+                span.count(*(job.size or (0, 0)))
+                journal.phase(jn.RENAMED)
+                if job.verify:
+                    _record_renamed(job, manifest)
+                return False
+
+        pruned = _rules_filter(job, saved)
+
+        def include(path, st):
+            if not pruned(path, st):
+                return False
+            if manifest.is_done(path, st, os.path.join(job.new_path, os.path.relpath(path, job.old_path))):
+                tracker.skip(st.st_size, 1)    # đã copy ở lần trước → chỉ tính vào tiến độ
+                return False
+            return True
+
+        def on_copied(path, st, digest):
+            manifest.add(path, st, digest)
+            tracker.add_files()
+
+        # Lỗi giữa chừng (ổ đĩa, tệp bị khóa...) → giữ bản copy dở và manifest để chạy tiếp
+        try:
+            copy_tree(job.old_path, job.new_path, cancel, on_copied,
+                      dirs_exist_ok=job.resume, include=include, on_bytes=tracker.add_bytes,
+                      verify=job.verify, throttle=job.throttle, span=span)
+        finally:
+            manifest.close()
+    journal.phase(jn.COPIED)
+
+    journal.phase(jn.REMOVING_SOURCE)
+    with phase("delete", job=job.name, what="source"):
+        shutil.rmtree(job.old_path)
+    journal.phase(jn.SOURCE_REMOVED)
+    return True
+
+
+def _sync_journaled(job, cancel, tracker):
+    """Bring the earlier copy at job.new_path in line with the folder Zalo recreated, then drop the source.
+
+    With job.backup the files about to be deleted from the earlier copy are
+    first stored as the snapshot "<name>.sync". The journal only starts once
+    the destination matches the source. Until then nothing is journaled,
+    because rolling back drops the destination and that copy may hold the
+    only version of data the source lacks.
+
+    The diff is taken again here, after Zalo was closed: files written since
+    the plan are copied too, and a sync whose deletes grew since the user
+    confirmed them is refused."""
+    planned = job.diff
+    job.diff = compare_trees(job.old_path, job.new_path, cancel, job.compare_hash)
+    if job.diff.delete_files and not job.allow_deletes:
+        raise RuntimeError(f"Đồng bộ sẽ xóa {job.diff.delete_files} tệp ở {job.new_path}, chưa được xác nhận")
+    if planned is not None:
+        # Thư mục bị xóa cả khối lúc lập kế hoạch có thể được liệt kê từng tệp lúc này → vẫn tính là đã xác nhận
+        confirmed = deleted_filter(planned)
+        if (job.diff.delete_files > planned.delete_files
+                or not all(confirmed(path, None) for path in job.diff.delete)):
+            raise RuntimeError(f"Số tệp sẽ bị xóa ở {job.new_path} đã tăng từ {planned.delete_files} lên "
+                               f"{job.diff.delete_files} kể từ lúc lập kế hoạch, hãy chạy lại")
+    if job.backup and job.diff.delete_files:
+        tracker.set_phase(f"Đang sao lưu tệp sẽ bị xóa khỏi {job.name}")
+        with phase("backup", job=job.name, what="sync_deletes", verify=job.verify) as span:
+            job.backup_id = job.store.backup(job.new_path, job.name + SYNC_BACKUP_SUFFIX, cancel,
+                                             lambda path, st, digest: tracker.add_files(),
+                                             include=deleted_filter(job.diff), on_bytes=tracker.add_bytes,
+                                             verify=job.verify, throttle=job.throttle, span=span)
+    tracker.set_phase(f"Đang đồng bộ {job.name}")
+    manifest = CheckpointManifest(job.new_path, job.old_path)
+
+    def on_copied(path, st, digest):
+        manifest.add(path, st, digest)
+        tracker.add_files()
+
+    try:
+        with phase("sync", job=job.name, deletes=len(job.diff.delete)) as span:
+            sync_tree(job.old_path, job.new_path, job.diff, cancel, on_copied, tracker.add_bytes,
+                      job.verify, job.throttle, span)
+        for path, st in job.diff.same:
+            manifest.add(path, st)
+    finally:
+        manifest.close()
+
+    journal = jn.MoveJournal.begin(job.name, job.old_path, job.new_path, None, manifest.path)
+    journal.phase(jn.COPIED)
+    journal.phase(jn.REMOVING_SOURCE)
+    with phase("delete", job=job.name, what="source"):
+        shutil.rmtree(job.old_path)
+    journal.phase(jn.SOURCE_REMOVED)
+    return journal
+
+
+def _record_renamed(job, manifest):
+    """Same-volume rename copies nothing: record sizes/mtimes so a quick verify still works"""
+    stack = [job.new_path]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    path = os.path.join(job.old_path, os.path.relpath(entry.path, job.new_path))
+                    manifest.add(path, entry.stat(follow_symlinks=False), state=RENAMED)
+
+
+def run_moves(jobs, cancel=None, progress=None, status=None):
+    """Run backup, move and link for each job (sync jobs: update the earlier copy, then link).
+
+    Progress is counted in bytes over every phase: progress(done, total) drives
+    the bar and status(text) carries the phase, MB/s, files/s and ETA.
+    Every move is journaled so an interrupted one can be rolled back or forward.
+    Throttled (background) jobs also run at low CPU and I/O priority.
+    Returns a dict with the moved folder names, error strings, a cancelled flag
+    and the [bytes, files] that rules kept out of the backup and the copy."""
+    with phase("moves", jobs=[job.name for job in jobs],
+               background=any(job.throttle is not None for job in jobs)) as span:
+        with low_priority(span.fields["background"]):
+            result = _run_moves(jobs, cancel, progress, status)
+        span.set(moved=result["moved"], cancelled=result["cancelled"], messages=result["errors"])
+        span.error(len(result["errors"]))
+    return result
+
+
+def _run_moves(jobs, cancel, progress, status):
+    result = {"moved": [], "errors": [], "cancelled": False, "saved": [0, 0]}
+
+    if status:
+        status("Đang tính dung lượng...")
+    sizes = {}
+    total_bytes = 0
+    total_files = 0
+    for job in jobs:
+        try:
+            sizes[job.name] = job.size or _copy_size(job, cancel)
+        except MoveCancelled:
+            result["cancelled"] = True
+            return result
+        if job.sync:
+            # Đồng bộ chỉ sao lưu các tệp sắp bị xóa ở đích
+            backup_size = ((job.diff.delete_bytes, job.diff.delete_files) if job.backup and job.diff
+                           else (0, 0))
+        else:
+            backup_size = sizes[job.name] if job.backup else (0, 0)
+        total_bytes += sizes[job.name][0] + backup_size[0]
+        total_files += sizes[job.name][1] + backup_size[1]
+
+    tracker = ProgressTracker(total_bytes, total_files, progress, status)
+    for job in jobs:
+        if job.throttle is not None:
+            # Chỉ đo độ trễ trên các ổ đĩa mà lần di chuyển này dùng
+            job.throttle.watch(job.old_path, job.new_path, job.store.root if job.backup else None)
+
+    def on_backup_file(path, st, digest):
+        tracker.add_files()
+
+    for job in jobs:
+        journal = None
+        manifest = None
+        # Sao lưu và copy bỏ qua cùng các tệp → mỗi tệp chỉ tính một lần
+        backup_saved = [0, 0]
+        move_saved = [0, 0]
+        try:
+            check_cancel(cancel)
+
+            if job.replace_new:
+                shutil.rmtree(job.new_path, ignore_errors=True)
+
+            if job.sync:
+                # Zalo tạo lại thư mục → chỉ đồng bộ phần khác, sao lưu những gì sắp bị xóa ở đích
+                journal = _sync_journaled(job, cancel, tracker)
+            else:
+                if job.backup and job.backup_id is None:
+                    job.backup_id = new_snapshot_id()
+                manifest = CheckpointManifest(job.new_path, job.old_path, resume=job.resume)
+                journal = jn.MoveJournal.begin(job.name, job.old_path, job.new_path,
+                                               job.backup_id, manifest.path)
+
+                # Sao lưu trước khi di chuyển vào kho nén (khối trùng với bản cũ không ghi lại)
+                if job.backup and job.backup_done:
+                    # Đã sao lưu xong ở lần chạy trước
+                    tracker.skip(*sizes[job.name])
+                    journal.phase(jn.BACKED_UP)
+                elif job.backup:
+                    tracker.set_phase(f"Đang sao lưu {job.name}")
+                    # Hủy giữa chừng → chưa có snapshot, các khối đã ghi được dọn khi xóa backup
+                    with phase("backup", job=job.name, verify=job.verify) as span:
+                        job.store.backup(job.old_path, job.name, cancel, on_backup_file,
+                                         include=_rules_filter(job, backup_saved),
+                                         on_bytes=tracker.add_bytes, verify=job.verify,
+                                         throttle=job.throttle, span=span, snapshot_id=job.backup_id)
+                    journal.phase(jn.BACKED_UP)
+
+                tracker.set_phase(f"Đang di chuyển {job.name}")
+                copied = _move_journaled(job, journal, manifest, cancel, tracker, move_saved)
+                manifest.close()
+                if not copied:
+                    # Rename cùng ổ đĩa → xong ngay
+                    tracker.skip(*sizes[job.name])
+
+            tracker.set_phase(f"Đang tạo liên kết {job.name}")
+            with phase("link", job=job.name):
+                link_folder(job.old_path, job.new_path)
+            journal.phase(jn.LINKED)
+
+            journal.commit()
+            result["moved"].append(job.name)
+            try:
+                record_link(job.name, job.new_path)
+            except OSError as e:
+                # Đã di chuyển xong; chỉ mất gợi ý liên kết lại khi Zalo tạo lại thư mục
+                result["errors"].append(f"{job.name}: đã di chuyển nhưng không ghi được links.json: {e}")
+            saved = max(backup_saved, move_saved, key=lambda s: s[1])
+            result["saved"][0] += saved[0]
+            result["saved"][1] += saved[1]
+
+        except MoveCancelled:
+            # Hủy (kể cả đóng cửa sổ / Ctrl+C) giữa lúc copy → giữ bản copy dở, manifest và journal
+            # như khi gặp lỗi: lần sau chạy tiếp từ chỗ đã dừng hoặc hoàn tác
+            if manifest is not None and (job.resume or os.path.exists(job.new_path)):
+                manifest.close()
+                journal.close()
+            else:
+                # Chưa có gì ở đích (hủy lúc sao lưu) → nguồn còn nguyên, không cần journal nữa
+                if manifest is not None:
+                    manifest.discard()
+                if journal is not None:
+                    journal.commit()
+            result["cancelled"] = True
+            break
+        except Exception as e:
+            # Giữ journal và manifest lại để khôi phục / chạy tiếp sau
+            if manifest is not None:
+                manifest.close()
+            if journal is not None:
+                journal.close()
+            result["errors"].append(f"Lỗi khi xử lý {job.name}: {e}")
+
+    return result
+
+
+def data_at_destination(state):
+    """True if the journaled move already has all data at the destination"""
+    phases = state["phases"]
+    if phases & {jn.RENAMED, jn.COPIED}:
+        return True
+    # Crash ngay sau rename, trước khi kịp ghi journal
+    return not os.path.lexists(state["src"]) and os.path.isdir(state["dst"])
+
+
+def can_roll_forward(state):
+    return data_at_destination(state)
+
+
+def roll_back(state, cancel=None):
+    """Undo an interrupted move: data ends up back at the source, no junction.
+
+    If the data left the source but the destination is gone too (drive
+    unplugged or failed), the backup taken before the move is restored."""
+    src, dst, phases = state["src"], state["dst"], state["phases"]
+
+    if is_link(src):
+        unlink_folder(src)
+
+    if jn.REMOVING_SOURCE in phases or not os.path.lexists(src):
+        # Dữ liệu chuẩn đang ở đích → chuyển ngược về
+        if os.path.exists(src):
+            shutil.rmtree(src)
+        backup = state.get("backup")
+        if not os.path.isdir(dst) and backup and jn.BACKED_UP in phases:
+            store = default_store()
+            if store.find(backup) is None:
+                raise RuntimeError(f"Không còn dữ liệu ở {dst} và không tìm thấy bản sao lưu {backup}")
+            try:
+                store.restore(backup, src, cancel)
+            except BaseException:
+                shutil.rmtree(src, ignore_errors=True)
+                raise
+        else:
+            move_tree(dst, src)
+    elif os.path.exists(dst):
+        # Nguồn còn nguyên → bỏ bản copy ở đích
+        shutil.rmtree(dst)
+
+    manifest = state.get("manifest")
+    if manifest and os.path.exists(manifest):
+        os.remove(manifest)
+
+    jn.discard_journal(state)
+
+
+def roll_forward(state):
+    """Finish an interrupted move whose data is already complete at the destination"""
+    src, dst = state["src"], state["dst"]
+    if not can_roll_forward(state):
+        raise RuntimeError(f"Dữ liệu tại {dst} chưa đầy đủ, chỉ có thể hoàn tác")
+
+    if os.path.lexists(src) and not is_link(src):
+        shutil.rmtree(src)
+    if not is_link(src):
+        link_folder(src, dst)
+
+    jn.discard_journal(state)
+    record_link(state["name"], dst)
+
+
+def recover_moves(actions, cancel=None, progress=None, status=None):
+    """Apply ("forward" | "back", journal state) recovery actions; returns error strings"""
+    errors = []
+    for i, (action, state) in enumerate(actions, start=1):
+        if status:
+            status(f"Đang khôi phục {state['name']}...")
+        try:
+            with phase("recover", job=state["name"], action=action):
+                if action == "forward":
+                    roll_forward(state)
+                else:
+                    roll_back(state, cancel)
+        except Exception as e:
+            errors.append(f"Lỗi khi khôi phục {state['name']}: {e}")
+        if progress:
+            progress(i, len(actions))
+    return errors
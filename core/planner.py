@@ -0,0 +1,267 @@
+import os
+import shutil
+import tempfile
+import time
+
+from core.manifest import has_manifest
+from core.progress import format_size, format_eta
+from core.rules import scan_with_rules
+from core.scanner import scan_tree
+from core.sync import compare_trees
+from core.trace import phase
+
+
+SPACE_MARGIN = 256 * 1024 * 1024      # chừa lại trên mỗi ổ đĩa sau khi di chuyển
+PROBE_BYTES = 32 * 1024 * 1024        # tệp thử để đo tốc độ ghi tuần tự
+PROBE_SMALL_FILES = 100               # số tệp nhỏ để đo chi phí mỗi tệp
+PROBE_SMALL_SIZE = 16 * 1024
+
+
+def existing_parent(path):
+    """Nearest folder that exists, for paths that will only be created by the move"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def volume_of(path):
+    """(device id, label) of the volume holding path"""
+    path = existing_parent(path)
+    label = os.path.splitdrive(path)[0]
+    if not label:
+        # Không có ký tự ổ đĩa (POSIX) → dùng điểm mount
+        label = path
+        while not os.path.ismount(label):
+            label = os.path.dirname(label)
+    return os.stat(path).st_dev, label
+
+
+def probe_write_speed(folder):
+    """Measure (bytes/s, seconds per small file) by writing and deleting temp files in folder"""
+    folder = existing_parent(folder)
+    work = tempfile.mkdtemp(prefix=".zalomove-probe-", dir=folder)
+    try:
+        chunk = os.urandom(1024 * 1024)
+        start = time.perf_counter()
+        with open(os.path.join(work, "large"), "wb") as f:
+            for _ in range(PROBE_BYTES // len(chunk)):
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        bytes_per_s = PROBE_BYTES / max(time.perf_counter() - start, 1e-6)
+
+        small = chunk[:PROBE_SMALL_SIZE]
+        start = time.perf_counter()
+        for i in range(PROBE_SMALL_FILES):
+            with open(os.path.join(work, f"s{i}"), "wb") as f:
+                f.write(small)
+        per_file = (time.perf_counter() - start) / PROBE_SMALL_FILES - PROBE_SMALL_SIZE / bytes_per_s
+        return bytes_per_s, max(per_file, 0.0)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+class FolderPlan:
+    """What moving one folder will cost"""
+
+    def __init__(self, job, size, files, same_volume, already_copied=0, pruned=0, pruned_files=0):
+        self.job = job
+        self.size = size
+        self.files = files
+        self.same_volume = same_volume
+        self.already_copied = already_copied
+        # Phần quy tắc bỏ qua (cache, log...) — không sao lưu, không copy
+        self.pruned = pruned
+        self.pruned_files = pruned_files
+
+
+class MovePlan:
+    """Per-folder sizes, space needed per volume and an estimated duration"""
+
+    def __init__(self):
+        self.folders = []
+        self.volumes = {}       # dev → {"label", "need", "free", "speed", "per_file"}
+        self.problems = []
+        self.seconds = 0.0
+        self.rate_limit = None  # byte/s khi chạy nền
+
+    @property
+    def ok(self):
+        return not self.problems
+
+    @property
+    def sync_deletes(self):
+        """Files the sync jobs will delete from earlier copies (the dialog asks with No as default)"""
+        return sum(f.job.diff.delete_files for f in self.folders if f.job.sync)
+
+
+def plan_moves(jobs, cancel=None, progress=None, status=None, probe=True):
+    """Work out a MovePlan for the jobs without touching any data.
+
+    Each job also gets job.size = (bytes, files) so run_moves needn't scan again."""
+    plan = MovePlan()
+    throttle = next((job.throttle for job in jobs if job.throttle is not None), None)
+    if throttle is not None:
+        plan.rate_limit = throttle.max_rate
+
+    def volume(path):
+        dev, label = volume_of(path)
+        if dev not in plan.volumes:
+            plan.volumes[dev] = {"label": label, "path": existing_parent(path), "need": 0,
+                                 "free": shutil.disk_usage(existing_parent(path)).free,
+                                 "speed": None, "per_file": 0.0, "bytes": 0, "files": 0}
+        return plan.volumes[dev]
+
+    for i, job in enumerate(jobs, start=1):
+        if status:
+            status(f"Đang tính dung lượng {job.name}...")
+        with phase("scan", job=job.name, sync=job.sync, rules=job.rules is not None) as span:
+            if job.sync:
+                # Chỉ copy phần khác với bản đã di chuyển trước đây
+                job.diff = compare_trees(job.old_path, job.new_path, cancel, job.compare_hash)
+                size, files, pruned, pruned_files = job.diff.copy_bytes, job.diff.copy_files, 0, 0
+            elif job.rules is not None:
+                size, files, pruned, pruned_files = scan_with_rules(job.old_path, job.rules, cancel)
+            else:
+                (size, files), pruned, pruned_files = scan_tree(job.old_path, cancel), 0, 0
+            span.count(size, files)
+            span.set(pruned=pruned, pruned_files=pruned_files)
+        job.size = (size - pruned, files - pruned_files)
+
+        src_vol = volume(job.old_path)
+        dst_vol = volume(job.new_path)
+        same_volume = src_vol is dst_vol and not job.resume and not job.sync
+
+        already = 0
+        if job.resume and has_manifest(job.new_path):
+            already = scan_tree(job.new_path, cancel)[0]
+        folder = FolderPlan(job, size, files, same_volume, already, pruned, pruned_files)
+        plan.folders.append(folder)
+        copy_size, copy_files = job.size
+
+        # Kho sao lưu nằm trong %LOCALAPPDATA% → dự trù cả khi không nén / khử trùng lặp được gì
+        backup_size, backup_files = copy_size, copy_files
+        if job.sync:
+            # Đồng bộ chỉ sao lưu các tệp sắp bị xóa ở đích
+            backup_size, backup_files = job.diff.delete_bytes, job.diff.delete_files
+        if job.backup and not job.backup_done and backup_files:
+            store_vol = volume(job.store.root)
+            store_vol["need"] += backup_size
+            store_vol["bytes"] += backup_size
+            store_vol["files"] += backup_files
+        if job.sync and job.diff.delete_files:
+            if job.diff.loses_most and not job.backup:
+                plan.problems.append(
+                    f"{job.name}: đồng bộ sẽ xóa {job.diff.delete_files} trên "
+                    f"{job.diff.delete_files + job.diff.kept_files} tệp ở {job.new_path} "
+                    f"(thư mục Zalo vừa tạo gần như trống), không làm khi không có sao lưu")
+            elif not job.allow_deletes:
+                plan.problems.append(
+                    f"{job.name}: đồng bộ sẽ xóa {job.diff.delete_files} tệp "
+                    f"({format_size(job.diff.delete_bytes)}) ở {job.new_path}, cần xác nhận (--overwrite)")
+        # Khác ổ đĩa → copy sang đích rồi mới xóa nguồn
+        if not same_volume:
+            remaining = max(copy_size - already, 0)
+            dst_vol["need"] += remaining
+            dst_vol["bytes"] += remaining
+            dst_vol["files"] += copy_files
+
+        if progress:
+            progress(i, len(jobs))
+
+    for vol in plan.volumes.values():
+        if vol["need"] and vol["need"] + SPACE_MARGIN > vol["free"]:
+            plan.problems.append(
+                f"Ổ {vol['label']} không đủ chỗ: cần {format_size(vol['need'] + SPACE_MARGIN)}, "
+                f"còn trống {format_size(vol['free'])}")
+        if probe and vol["bytes"]:
+            if status:
+                status(f"Đang đo tốc độ ghi ổ {vol['label']}...")
+            try:
+                vol["speed"], vol["per_file"] = probe_write_speed(vol["path"])
+            except OSError:
+                vol["speed"] = None
+        if plan.rate_limit and vol["bytes"]:
+            # Chạy nền → không nhanh hơn giới hạn (còn chậm hơn nữa nếu máy bận)
+            vol["speed"] = min(vol["speed"] or plan.rate_limit, plan.rate_limit)
+        if vol["speed"]:
+            plan.seconds += vol["bytes"] / vol["speed"] + vol["files"] * vol["per_file"]
+
+    return plan
+
+
+def format_plan(plan):
+    """Human-readable plan for the confirmation dialog and --dry-run"""
+    lines = []
+    for folder in plan.folders:
+        job = folder.job
+        how = "cùng ổ đĩa, chỉ đổi tên" if folder.same_volume else "khác ổ đĩa, copy rồi xóa nguồn"
+        if job.sync:
+            how = "đồng bộ lại với bản đã di chuyển"
+            if job.diff.delete_files:
+                how += (f", xóa {job.diff.delete_files} tệp ({format_size(job.diff.delete_bytes)}) "
+                        f"không còn ở thư mục mới")
+        if folder.already_copied:
+            how += f", đã có sẵn {format_size(folder.already_copied)} ở đích"
+        line = f"• {job.name}: {format_size(folder.size)}, {folder.files} tệp ({how})"
+        backing_up = job.backup and not job.backup_done
+        if backing_up and job.sync:
+            if job.diff.delete_files:
+                line += ", sao lưu nén các tệp sẽ xóa"
+        elif backing_up:
+            line += ", có sao lưu nén"
+        lines.append(line)
+        if job.sync and job.diff.loses_most:
+            lines.append(f"    ⚠ sẽ xóa phần lớn dữ liệu đã di chuyển "
+                         f"({job.diff.delete_files}/{job.diff.delete_files + job.diff.kept_files} tệp)")
+        if folder.pruned_files and (not folder.same_volume or backing_up):
+            lines.append(f"    bỏ qua {format_size(folder.pruned)}, {folder.pruned_files} tệp cache/log có thể tạo lại")
+        lines.append(f"    {job.old_path} → {job.new_path}")
+
+    lines.append("")
+    for vol in plan.volumes.values():
+        if not vol["need"]:
+            continue
+        line = f"Ổ {vol['label']}: cần {format_size(vol['need'])}, còn trống {format_size(vol['free'])}"
+        if vol["speed"]:
+            line += f", ghi ~{format_size(vol['speed'])}/s"
+        lines.append(line)
+
+    if plan.rate_limit:
+        lines.append(f"Chạy nền: tối đa {format_size(plan.rate_limit)}/s, ưu tiên thấp, "
+                     f"tự giảm tốc khi máy đang bận")
+    if any(vol["speed"] for vol in plan.volumes.values()):
+        lines.append(f"Thời gian ước tính: khoảng {format_eta(plan.seconds)}")
+    elif not any(vol["need"] for vol in plan.volumes.values()):
+        lines.append("Thời gian ước tính: vài giây")
+
+    if plan.problems:
+        lines.append("")
+        lines.extend(f"⚠ {p}" for p in plan.problems)
+    return "\n".join(lines)
+
+
+def plan_to_dict(plan):
+    """JSON-friendly form of a MovePlan for the command line's --json output"""
+    return {
+        "ok": plan.ok,
+        "seconds": round(plan.seconds, 1),
+        "rate_limit": plan.rate_limit,
+        "folders": [{"name": f.job.name, "src": f.job.old_path, "dst": f.job.new_path,
+                     "bytes": f.size, "files": f.files, "same_volume": f.same_volume,
+                     "already_copied": f.already_copied,
+                     "pruned_bytes": f.pruned, "pruned_files": f.pruned_files,
+                     "backup": bool(f.job.backup and not f.job.backup_done),
+                     "sync": f.job.sync,
+                     "sync_deletes": f.job.diff.delete_files if f.job.sync else 0,
+                     "sync_delete_bytes": f.job.diff.delete_bytes if f.job.sync else 0}
+                    for f in plan.folders],
+        "volumes": [{"volume": v["label"], "need": v["need"], "free": v["free"],
+                     "bytes_per_s": v["speed"]}
+                    for v in plan.volumes.values() if v["need"]],
+        "problems": list(plan.problems),
+    }
@@ -0,0 +1,189 @@
+import os
+import time
+from collections import namedtuple
+
+from core.copier import check_cancel
+from core.trace import phase
+
+
+ZALO_PREFIX = "zalo"        # Zalo.exe, ZaloCall.exe... (chỉ dùng khi không đọc được tệp đang mở)
+SNAPSHOT_TTL = 2.0          # giây dùng lại kết quả quét tiến trình lần trước
+GRACE_TIMEOUT = 5.0         # giây chờ tiến trình tự thoát sau khi yêu cầu đóng
+KILL_TIMEOUT = 3.0          # giây chờ sau khi kill
+RELEASE_TIMEOUT = 10.0      # giây chờ Windows nhả hết handle trong thư mục
+POLL_INTERVAL = 0.2
+
+# Tiến trình giữ thư mục: path là tệp đang mở (hoặc exe) nằm trong thư mục sắp di chuyển
+Locker = namedtuple("Locker", "proc name path")
+
+_cache = {"at": 0.0, "roots": None, "lockers": []}
+
+
+def describe(locker):
+    return f"{locker.name} ({locker.proc.pid}): {locker.path}"
+
+
+def _root_prefixes(roots):
+    """Normalized 'root + sep' prefixes, both as given and with links resolved"""
+    prefixes = set()
+    for root in roots:
+        for path in (os.path.abspath(root), os.path.realpath(root)):
+            prefixes.add(os.path.join(os.path.normcase(path), ""))
+    return tuple(prefixes)
+
+
+def _under(path, prefixes):
+    return bool(path) and os.path.join(os.path.normcase(path), "").startswith(prefixes)
+
+
+def _protected_pids(psutil):
+    """This process and the ones that started it (terminal, launcher): never closed"""
+    pids = {os.getpid()}
+    try:
+        pids.update(p.pid for p in psutil.Process().parents())
+    except psutil.Error:
+        pass
+    return pids
+
+
+def _scan(roots):
+    """One process_iter pass: every process with its exe or an open file under roots"""
+    import psutil    # chỉ cần khi di chuyển, không làm chậm các lệnh khác
+    prefixes = _root_prefixes(roots)
+    skip = _protected_pids(psutil)
+    lockers = []
+    for proc in psutil.process_iter(["name", "exe"]):
+        if proc.pid in skip:
+            continue
+        name = proc.info["name"] or "?"
+        try:
+            if _under(proc.info["exe"], prefixes):
+                lockers.append(Locker(proc, name, proc.info["exe"]))
+                continue
+            held = next((f.path for f in proc.open_files() if _under(f.path, prefixes)), None)
+        except psutil.AccessDenied:
+            # Tiến trình của user khác khi không có quyền admin: chỉ còn nhận ra theo tên
+            if name.lower().startswith(ZALO_PREFIX):
+                lockers.append(Locker(proc, name, "?"))
+            continue
+        except psutil.NoSuchProcess:
+            continue
+        if held is not None:
+            lockers.append(Locker(proc, name, held))
+    return lockers
+
+
+def find_lockers(roots, max_age=SNAPSHOT_TTL):
+    """Processes holding files under roots (Zalo, its helpers, an open explorer preview...).
+
+    Reading every process's open files is the slow part, so the result of the
+    last scan of the same roots is reused for max_age seconds, keeping only
+    the processes still alive (is_running also catches a reused PID)."""
+    key = _root_prefixes(roots)
+    now = time.monotonic()
+    if _cache["roots"] == key and now - _cache["at"] < max_age:
+        _cache["lockers"] = [locker for locker in _cache["lockers"] if locker.proc.is_running()]
+    else:
+        _cache.update(at=now, roots=key, lockers=_scan(roots))
+    return list(_cache["lockers"])
+
+
+def _post_close(pids):
+    """Ask the windows of pids to close (WM_CLOSE), like clicking X; False if not on Windows"""
+    try:
+        import ctypes
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+    except (ImportError, AttributeError):
+        return False
+    WM_CLOSE = 0x0010
+
+    @ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+    def on_window(hwnd, _):
+        pid = wintypes.DWORD()
+        user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+        if pid.value in pids:
+            user32.PostMessageW(hwnd, WM_CLOSE, 0, 0)
+        return True
+
+    user32.EnumWindows(on_window, 0)
+    return True
+
+
+def _wait_gone(psutil, procs, timeout, cancel):
+    """wait_procs in short slices so cancel stays responsive; returns the processes still alive"""
+    deadline = time.monotonic() + timeout
+    alive = list(procs)
+    while alive:
+        check_cancel(cancel)
+        _, alive = psutil.wait_procs(alive, timeout=min(POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+        if time.monotonic() >= deadline:
+            break
+    return alive
+
+
+def release_folders(roots, cancel=None, progress=None, status=None,
+                    grace=GRACE_TIMEOUT, timeout=RELEASE_TIMEOUT):
+    """Close exactly the processes holding files under roots and wait until the handles are gone.
+
+    Each one is first asked to close (WM_CLOSE on Windows, SIGTERM elsewhere)
+    and given grace seconds to save and exit; only the ones still alive are
+    killed. The folders are then rescanned until no process holds a file in
+    them, so the copy never starts against a locked database.
+    Returns {"closed": [...], "killed": [...], "locked": [...]} where locked
+    lists what still held a file after timeout (or couldn't be stopped)."""
+    import psutil
+    result = {"closed": [], "killed": [], "locked": []}
+    with phase("kill", roots=len(roots)) as span:
+        lockers = find_lockers(roots)
+        if lockers:
+            if status:
+                status(f"Đang đóng {', '.join(sorted({l.name for l in lockers}))}...")
+            names = {l.proc.pid: describe(l) for l in lockers}
+            procs = [l.proc for l in lockers]
+            if not _post_close(set(names)):
+                for proc in procs:
+                    try:
+                        proc.terminate()
+                    except psutil.NoSuchProcess:
+                        pass
+                    except psutil.AccessDenied:
+                        span.error()
+            alive = _wait_gone(psutil, procs, grace, cancel)
+            for proc in alive:
+                try:
+                    proc.kill()
+                except psutil.NoSuchProcess:
+                    pass
+                except psutil.AccessDenied:
+                    span.error()
+            survivors = _wait_gone(psutil, alive, KILL_TIMEOUT, cancel) if alive else []
+            result["closed"] = [names[p.pid] for p in procs if p not in alive]
+            result["killed"] = [names[p.pid] for p in alive if p not in survivors]
+
+            # Tiến trình đã thoát nhưng handle có thể chưa nhả ngay (antivirus, indexer...)
+            if status:
+                status("Đang chờ giải phóng tệp...")
+            deadline = time.monotonic() + timeout
+            while True:
+                lockers = find_lockers(roots, max_age=0)
+                if not lockers or time.monotonic() >= deadline:
+                    break
+                if cancel is not None:
+                    if cancel.wait(POLL_INTERVAL):
+                        check_cancel(cancel)
+                else:
+                    time.sleep(POLL_INTERVAL)
+        result["locked"] = [describe(l) for l in lockers]
+        span.set(closed=len(result["closed"]), killed=len(result["killed"]), locked=len(lockers))
+    return result
+
+
+def move_roots(jobs):
+    """Folders a move touches: each source, and the destination when it already exists (resync, resume)"""
+    roots = []
+    for job in jobs:
+        roots.append(job.old_path)
+        if os.path.isdir(job.new_path):
+            roots.append(job.new_path)
+    return roots
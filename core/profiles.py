@@ -0,0 +1,75 @@
+import os
+
+from core.zalo import HOME, zalo_folders, movable
+
+
+# Thư mục trong C:\Users không phải của người dùng thật
+SKIP_PROFILES = {"public", "default", "default user", "all users", "defaultapppool", "wdagutilityaccount"}
+PROFILE_LIST_KEY = r"SOFTWARE\Microsoft\Windows NT\CurrentVersion\ProfileList"
+
+
+class Profile:
+    """One user profile and its Zalo folders"""
+
+    def __init__(self, user, home):
+        self.user = user
+        self.home = home
+        self.folders = zalo_folders(home)
+
+    def movable_folders(self):
+        """{name: path} of the Zalo folders that exist and are not linked yet"""
+        return {name: path for name, path in self.folders.items() if movable(name, self.folders)}
+
+
+def _registry_homes():
+    """Profile folders of real accounts (S-1-5-21-…) from the registry; [] if unavailable"""
+    try:
+        import winreg
+    except ImportError:
+        return []
+    homes = []
+    try:
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, PROFILE_LIST_KEY) as key:
+            for i in range(winreg.QueryInfoKey(key)[0]):
+                sid = winreg.EnumKey(key, i)
+                if not sid.startswith("S-1-5-21-"):
+                    continue
+                try:
+                    with winreg.OpenKey(key, sid) as sub:
+                        path = winreg.QueryValueEx(sub, "ProfileImagePath")[0]
+                except OSError:
+                    continue
+                homes.append(os.path.expandvars(path))
+    except OSError:
+        return []
+    return homes
+
+
+def _sibling_homes():
+    """Every folder next to the current profile (C:\\Users\\*)"""
+    base = os.path.dirname(HOME)
+    try:
+        entries = os.scandir(base)
+    except OSError:
+        return [HOME]
+    with entries:
+        return sorted(entry.path for entry in entries
+                      if entry.is_dir(follow_symlinks=False) and entry.name.lower() not in SKIP_PROFILES)
+
+
+def find_profiles(homes=None, movable_only=True):
+    """Profiles on this machine that have a Zalo folder left to move (or any Zalo folder)"""
+    homes = homes or _registry_homes() or _sibling_homes()
+    profiles = []
+    seen = set()
+    for home in homes:
+        key = os.path.normcase(os.path.abspath(home))
+        if key in seen or not os.path.isdir(home):
+            continue
+        seen.add(key)
+        profile = Profile(os.path.basename(os.path.normpath(home)), home)
+        if movable_only and profile.movable_folders():
+            profiles.append(profile)
+        elif not movable_only and any(os.path.lexists(p) for p in profile.folders.values()):
+            profiles.append(profile)
+    return profiles
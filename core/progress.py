@@ -0,0 +1,120 @@
+import threading
+import time
+
+
+REPORT_INTERVAL = 0.25    # giây giữa 2 lần báo tiến độ
+RATE_SMOOTHING = 0.3      # hệ số EMA cho tốc độ (0..1, lớn = phản ứng nhanh)
+BAR_SCALE = 1000          # progress bar của Qt là int32 → báo theo phần nghìn
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "đang ước tính"
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds} giây"
+    if seconds < 3600:
+        return f"{seconds // 60} phút {seconds % 60} giây"
+    return f"{seconds // 3600} giờ {seconds % 3600 // 60} phút"
+
+
+class ProgressTracker:
+    """Byte and file counter shared by the copy workers.
+
+    add_bytes/add_files are cheap and thread-safe; progress(done, total) and
+    status(text) are called at most every REPORT_INTERVAL seconds, so reporting
+    never slows the copy down no matter how many small files there are."""
+
+    def __init__(self, total_bytes, total_files, progress=None, status=None,
+                 interval=REPORT_INTERVAL):
+        self.total_bytes = total_bytes
+        self.total_files = total_files
+        self.progress = progress
+        self.status = status
+        self.interval = interval
+        self.phase = ""
+        self.done_bytes = 0
+        self.done_files = 0
+        self.bytes_per_s = None
+        self.files_per_s = None
+        self._lock = threading.Lock()
+        self._last_report = 0.0
+        # Mẫu cho tốc độ: chỉ tính byte thực sự copy, không tính phần bỏ qua / rename
+        self._moved_bytes = 0
+        self._moved_files = 0
+        self._sample = (time.monotonic(), 0, 0)
+
+    def set_phase(self, text):
+        """Start a new phase and report it right away"""
+        with self._lock:
+            self.phase = text
+        self.report(force=True)
+
+    def add_bytes(self, nbytes):
+        with self._lock:
+            self.done_bytes += nbytes
+            self._moved_bytes += nbytes
+        self.report()
+
+    def add_files(self, files=1):
+        with self._lock:
+            self.done_files += files
+            self._moved_files += files
+        self.report()
+
+    def skip(self, nbytes, files):
+        """Count work that needed no copying (already done, or a same-volume rename)"""
+        with self._lock:
+            self.done_bytes += nbytes
+            self.done_files += files
+        self.report()
+
+    def eta(self):
+        if not self.bytes_per_s:
+            return None
+        return max(self.total_bytes - self.done_bytes, 0) / self.bytes_per_s
+
+    def report(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_report < self.interval:
+                return
+            self._last_report = now
+            self._update_rates(now)
+            done = self.done_bytes
+            text = self._format()
+        if self.progress:
+            self.progress(int(BAR_SCALE * done / self.total_bytes) if self.total_bytes else 0,
+                          BAR_SCALE)
+        if self.status:
+            self.status(text)
+
+    def _update_rates(self, now):
+        t0, b0, f0 = self._sample
+        elapsed = now - t0
+        if elapsed < self.interval:
+            return
+        bps = (self._moved_bytes - b0) / elapsed
+        fps = (self._moved_files - f0) / elapsed
+        if self.bytes_per_s is None:
+            self.bytes_per_s, self.files_per_s = bps, fps
+        else:
+            a = RATE_SMOOTHING
+            self.bytes_per_s = a * bps + (1 - a) * self.bytes_per_s
+            self.files_per_s = a * fps + (1 - a) * self.files_per_s
+        self._sample = (now, self._moved_bytes, self._moved_files)
+
+    def _format(self):
+        parts = [f"{self.phase}: {format_size(self.done_bytes)} / {format_size(self.total_bytes)}"]
+        if self.bytes_per_s is not None:
+            parts.append(f"{format_size(self.bytes_per_s)}/s")
+            parts.append(f"{self.files_per_s:.0f} tệp/s")
+        parts.append(f"còn {format_eta(self.eta())}")
+        return " · ".join(parts)
@@ -0,0 +1,299 @@
+import json
+import os
+import stat
+import threading
+import time
+import uuid
+
+from core.backupstore import BackupStore
+from core.copier import MoveCancelled, check_cancel, _Lane
+from core.progress import ProgressTracker
+from core.scanner import scan_tree
+from core.state import state_dir
+from core.trace import phase
+
+
+PURGE_AREA = ".zalomover-purge"     # nằm cạnh bản backup → rename luôn cùng ổ đĩa
+PURGE_WORKERS = min(8, (os.cpu_count() or 4) * 2)
+PURGE_BATCH = 256                   # số tệp mỗi tác vụ xóa
+
+
+def purge_list_dir():
+    """%LOCALAPPDATA%\\ZaloMover\\purge: one JSON record per folder waiting to be deleted"""
+    return state_dir("purge")
+
+
+def _write_record(record):
+    path = os.path.join(purge_list_dir(), f"{record['id']}.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _drop_record(record):
+    try:
+        os.remove(os.path.join(purge_list_dir(), f"{record['id']}.json"))
+    except FileNotFoundError:
+        pass
+    if record.get("store"):
+        return
+    # Khu vực purge trống → bỏ luôn cho gọn
+    try:
+        os.rmdir(os.path.dirname(record["path"]))
+    except OSError:
+        pass
+
+
+def stage_backups(backups):
+    """Rename each (name, path) into the purge area next to it; instant, nothing is deleted yet.
+
+    The record is written before the rename, so a crash in between leaves
+    either the backup where it was or a record the next purge picks up.
+    Returns (records, error strings)."""
+    records = []
+    errors = []
+    for name, path in backups:
+        area = os.path.join(os.path.dirname(path), PURGE_AREA)
+        record = {"id": uuid.uuid4().hex, "name": name, "original": path,
+                  "path": os.path.join(area, f"{os.path.basename(path)}-{int(time.time())}"),
+                  "time": time.time(), "freed": 0}
+        try:
+            os.makedirs(area, exist_ok=True)
+            _write_record(record)
+            os.rename(path, record["path"])
+        except OSError as e:
+            _drop_record(record)
+            errors.append(f"Lỗi khi xóa backup {name}: {e}")
+            continue
+        records.append(record)
+    return records, errors
+
+
+def stage_snapshots(store, snapshots):
+    """Drop compressed backups from store (instant) and queue its unused chunks for deletion.
+
+    The record points at the whole store: the purge works out which chunks
+    no remaining snapshot uses, so it also picks up where an interrupted one
+    stopped. Returns (records, error strings) like stage_backups."""
+    names = []
+    errors = []
+    for snapshot in snapshots:
+        try:
+            store.drop(snapshot["id"])
+        except OSError as e:
+            errors.append(f"Lỗi khi xóa backup {snapshot['name']}: {e}")
+            continue
+        names.append(snapshot["name"])
+    if not names:
+        return [], errors
+    record = {"id": uuid.uuid4().hex, "name": ", ".join(names), "original": store.root,
+              "path": store.root, "store": True, "time": time.time(), "freed": 0}
+    _write_record(record)
+    return [record], errors
+
+
+def pending_purges():
+    """Records of folders still waiting in a purge area (e.g. the app closed mid-purge)"""
+    records = []
+    folder = purge_list_dir()
+    for entry in sorted(os.listdir(folder)):
+        if not entry.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(folder, entry), encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            os.remove(os.path.join(folder, entry))
+            continue
+        if os.path.lexists(record["path"]):
+            records.append(record)
+        else:
+            _drop_record(record)
+    return records
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except PermissionError:
+        # Windows không xóa được tệp read-only → bỏ thuộc tính rồi thử lại
+        os.chmod(path, stat.S_IWRITE)
+        os.unlink(path)
+
+
+def _unlink_batch(batch, cancel, on_freed, errors, errors_lock):
+    freed = 0
+    for path, size in batch:
+        if cancel is not None and cancel.is_set():
+            break
+        try:
+            _unlink(path)
+            freed += size
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            with errors_lock:
+                errors.append(f"{path}: {e}")
+    on_freed(freed, len(batch))
+
+
+def _purge_files(files, cancel, on_freed, errors, errors_lock):
+    """Delete [(path, size)] on a bounded pool (unused chunks of the backup store)"""
+    lane = _Lane(PURGE_WORKERS, "purge")
+    try:
+        for i in range(0, len(files), PURGE_BATCH):
+            check_cancel(cancel)
+            lane.submit(_unlink_batch, files[i:i + PURGE_BATCH], cancel, on_freed, errors, errors_lock)
+    finally:
+        lane.shutdown()
+    check_cancel(cancel)
+
+
+def _purge_tree(root, cancel, on_freed, errors, errors_lock):
+    """Delete everything under root: files on a bounded pool, then directories bottom-up"""
+    lane = _Lane(PURGE_WORKERS, "purge")
+    dirs = [root]
+
+    def unlink_batch(batch):
+        _unlink_batch(batch, cancel, on_freed, errors, errors_lock)
+
+    try:
+        i = 0
+        while i < len(dirs):
+            check_cancel(cancel)
+            batch = []
+            try:
+                with os.scandir(dirs[i]) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                dirs.append(entry.path)
+                                continue
+                            size = entry.stat(follow_symlinks=False).st_size
+                        except OSError:
+                            size = 0
+                        batch.append((entry.path, size))
+                        if len(batch) >= PURGE_BATCH:
+                            lane.submit(unlink_batch, batch)
+                            batch = []
+            except OSError as e:
+                with errors_lock:
+                    errors.append(f"{dirs[i]}: {e}")
+            if batch:
+                lane.submit(unlink_batch, batch)
+            i += 1
+    finally:
+        lane.shutdown()
+    check_cancel(cancel)
+
+    # Thư mục con được thêm sau thư mục cha → xóa ngược lại
+    for path in reversed(dirs):
+        try:
+            os.rmdir(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            with errors_lock:
+                errors.append(f"{path}: {e}")
+
+
+def purge(records, cancel=None, progress=None, status=None):
+    """Delete staged folders in the background and account for the bytes freed.
+
+    A cancelled or failed folder keeps its record, so pending_purges() and
+    the next purge() carry on where this one stopped.
+    Returns a dict with the purged names, freed bytes, errors and a cancelled flag."""
+    result = {"purged": [], "freed": 0, "errors": [], "cancelled": False}
+    if not records:
+        return result
+
+    if status:
+        status("Đang tính dung lượng backup...")
+    garbage = {}
+    # Khóa dọn kho giữ từ lúc liệt kê khối rác đến khi xóa xong → bản sao lưu mới chờ, không dùng lại khối sắp xóa
+    gc_locks = []
+
+    def size_of(record):
+        if not record.get("store"):
+            return scan_tree(record["path"], cancel)
+        store = BackupStore(record["path"])
+        if any(r.get("store") and r["path"] == record["path"] and r["id"] in garbage for r in records):
+            # Cùng kho với bản ghi trước → một lần dọn là đủ cho cả hai
+            garbage[record["id"]] = []
+        else:
+            handle = store.lock_gc()
+            if handle is None or store.busy():
+                # Đang có bản sao lưu ghi vào kho (hoặc nơi khác đang dọn) → để lần sau
+                if handle is not None:
+                    store.unlock_gc(handle)
+                garbage[record["id"]] = None
+            else:
+                gc_locks.append((store, handle))
+                garbage[record["id"]] = store.garbage(cancel)
+        files = garbage[record["id"]] or []
+        return sum(size for _, size in files), len(files)
+
+    try:
+        try:
+            sizes = [size_of(record) for record in records]
+        except MoveCancelled:
+            result["cancelled"] = True
+            return result
+        _purge_records(records, sizes, garbage, result, cancel, progress, status)
+    finally:
+        for store, handle in gc_locks:
+            store.unlock_gc(handle)
+    return result
+
+
+def _purge_records(records, sizes, garbage, result, cancel, progress, status):
+    """Delete each staged folder, or the listed garbage chunks of a store record, filling in result"""
+    tracker = ProgressTracker(sum(s[0] for s in sizes), sum(s[1] for s in sizes), progress, status)
+    lock = threading.Lock()
+
+    for record in records:
+        freed = [0]
+        errors = []
+
+        span = phase("delete", job=record["name"], what="backup")
+
+        def on_freed(nbytes, files):
+            with lock:
+                freed[0] += nbytes
+            span.count(nbytes, files)
+            tracker.add_bytes(nbytes)
+            tracker.add_files(files)
+
+        tracker.set_phase(f"Đang xóa backup {record['name']}")
+        try:
+            with span:
+                if not record.get("store"):
+                    _purge_tree(record["path"], cancel, on_freed, errors, lock)
+                elif garbage[record["id"]] is None:
+                    errors.append("đang có bản sao lưu chạy, sẽ dọn sau")
+                else:
+                    _purge_files(garbage[record["id"]], cancel, on_freed, errors, lock)
+                span.error(len(errors))
+        except MoveCancelled:
+            result["cancelled"] = True
+        finally:
+            record["freed"] += freed[0]
+            result["freed"] += freed[0]
+
+        if record.get("store"):
+            done = not result["cancelled"] and not errors
+        else:
+            done = not os.path.lexists(record["path"])
+        if done:
+            _drop_record(record)
+            result["purged"].append(record["name"])
+        else:
+            _write_record(record)
+            if errors:
+                result["errors"].append(f"Lỗi khi xóa backup {record['name']}: {errors[0]}"
+                                        + (f" (+{len(errors) - 1} lỗi khác)" if len(errors) > 1 else ""))
+        if result["cancelled"]:
+            break
@@ -0,0 +1,156 @@
+import json
+import os
+import re
+import time
+
+from core.copier import check_cancel
+from core.state import state_dir
+
+
+# Dữ liệu Zalo tự tạo lại được: cache của Electron, log, crash dump, bộ cài cũ của updater.
+# Mỗi quy tắc: folder (tên trong FOLDERS hoặc "*"), glob (đường dẫn tương đối, "/" làm
+# dấu phân cách, "**" khớp nhiều cấp thư mục), và tùy chọn min_size (byte), older_than_days.
+DEFAULT_RULES = [
+    {"folder": "ZaloPC", "glob": ["Cache/**", "Code Cache/**", "GPUCache/**", "DawnCache/**",
+                                  "ShaderCache/**", "GrShaderCache/**",
+                                  "Service Worker/CacheStorage/**", "Service Worker/ScriptCache/**"]},
+    {"folder": "*", "glob": ["**/Crashpad/**", "**/*.dmp"]},
+    {"folder": "*", "glob": ["**/logs/**", "**/*.log"], "older_than_days": 7},
+    {"folder": "ZaloUpdate", "glob": ["**/*.exe", "**/*.zip", "**/*.7z", "**/*.nupkg"],
+     "older_than_days": 30},
+]
+
+
+def rules_path():
+    """%LOCALAPPDATA%\\ZaloMover\\rules.json, created with DEFAULT_RULES on first use"""
+    return os.path.join(state_dir(), "rules.json")
+
+
+def glob_to_regex(pattern):
+    """Translate a "/"-separated glob with "**" into a regex over relative paths"""
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+class Rule:
+    """One glob/size/age rule; a file matches if any glob matches and every limit holds"""
+
+    def __init__(self, glob, min_size=None, older_than_days=None):
+        globs = [glob] if isinstance(glob, str) else list(glob)
+        flags = re.IGNORECASE if os.name == "nt" else 0
+        self.regex = re.compile("|".join(f"(?:{glob_to_regex(g)})" for g in globs) + r"\Z", flags)
+        self.min_size = min_size
+        self.max_mtime = None if older_than_days is None else time.time() - older_than_days * 86400
+
+    def matches(self, rel, st):
+        if self.min_size is not None and st.st_size < self.min_size:
+            return False
+        if self.max_mtime is not None and st.st_mtime > self.max_mtime:
+            return False
+        return self.regex.match(rel) is not None
+
+
+class FolderRules:
+    """The rules that apply to one Zalo folder"""
+
+    def __init__(self, root, rules):
+        self.root = root
+        self.rules = rules
+
+    def matches(self, path, st):
+        """True if the file at path (under root) is regenerable and can be left behind"""
+        rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+        return any(rule.matches(rel, st) for rule in self.rules)
+
+
+class RuleSet:
+    """Rules loaded from the config file, grouped by folder name"""
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def for_folder(self, name, root):
+        """FolderRules for one folder, or None if no rule applies to it"""
+        rules = [Rule(e["glob"], e.get("min_size"), e.get("older_than_days"))
+                 for e in self.entries if e.get("folder", "*") in ("*", name)]
+        return FolderRules(root, rules) if rules else None
+
+
+def load_rules(path=None):
+    """RuleSet from the JSON config; DEFAULT_RULES if it is missing or unreadable"""
+    path = path or rules_path()
+    try:
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)["rules"]
+    except FileNotFoundError:
+        entries = DEFAULT_RULES
+        try:
+            # Ghi mẫu ra để người dùng sửa
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"rules": DEFAULT_RULES}, f, ensure_ascii=False, indent=2)
+        except OSError:
+            pass
+    except (OSError, ValueError, KeyError, TypeError):
+        entries = DEFAULT_RULES
+    return RuleSet(entries)
+
+
+def scan_with_rules(path, rules, cancel=None):
+    """Return (bytes, files, prunable bytes, prunable files) under path in one walk"""
+    total = files = pruned = pruned_files = 0
+    stack = [path]
+    while stack:
+        check_cancel(cancel)
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                total += st.st_size
+                files += 1
+                if rules.matches(entry.path, st):
+                    pruned += st.st_size
+                    pruned_files += 1
+    return total, files, pruned, pruned_files
+
+
+def scan_prunable(folders, ruleset, cancel=None, progress=None, status=None):
+    """{name: (prunable bytes, prunable files)} for each existing {name: path} folder.
+
+    Names may be "<owner>/<folder>" (every profile); rules match on the folder."""
+    results = {}
+    roots = {name: path for name, path in folders.items() if os.path.isdir(path)}
+    for i, (name, path) in enumerate(roots.items(), start=1):
+        rules = ruleset.for_folder(name.rpartition("/")[2], path)
+        if rules is not None:
+            if status:
+                status(f"Đang tìm cache/log trong {name}...")
+            results[name] = scan_with_rules(path, rules, cancel)[2:]
+        if progress:
+            progress(i, len(roots))
+    return results
@@ -0,0 +1,282 @@
+import os
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from core.copier import MoveCancelled, check_cancel
+from core.progress import format_size
+from core.sizeindex import MAX_ROW_AGE
+from core.trace import phase
+
+
+TOP_N = 10                  # số mục mặc định trong bảng chi tiết dung lượng
+NO_EXT = "(không đuôi)"
+
+
+class DirTree:
+    """Per-directory totals of one scanned root, stored in flat arrays.
+
+    Node i is a directory: parent[i] is the index of its parent (-1 for the
+    root, node 0), and its name is the UTF-8 slice names[name_at[i]:name_at[i + 1]].
+    A parent is always added before its children, so one backwards pass in
+    finish() rolls own bytes/files up into subtree totals. That is about
+    40 bytes per directory plus its name, against several hundred for a dict per node.
+    File types are summed per root as {extension: [bytes, files]}."""
+
+    def __init__(self, root):
+        self.root = root
+        self.parent = array("i", [-1])
+        self.name_at = array("I", [0, 0])
+        self.names = bytearray()
+        self.own_bytes = array("q", [0])
+        self.own_files = array("I", [0])
+        self.total_bytes = None
+        self.total_files = None
+        self.types = {}
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add_dir(self, parent, name):
+        """Append a subdirectory of node parent and return its index"""
+        self.parent.append(parent)
+        self.names += name.encode("utf-8", "surrogatepass")
+        self.name_at.append(len(self.names))
+        self.own_bytes.append(0)
+        self.own_files.append(0)
+        return len(self.parent) - 1
+
+    def name(self, node):
+        return self.names[self.name_at[node]:self.name_at[node + 1]].decode("utf-8", "surrogatepass")
+
+    def rel_path(self, node):
+        """Path of node relative to the root ("" for the root itself)"""
+        parts = []
+        while node > 0:
+            parts.append(self.name(node))
+            node = self.parent[node]
+        return os.path.join(*reversed(parts)) if parts else ""
+
+    def depth(self):
+        """Depth of every node (root = 0); parents come first, so one forward pass"""
+        depth = array("H", bytes(2 * len(self)))
+        for i in range(1, len(self)):
+            depth[i] = depth[self.parent[i]] + 1
+        return depth
+
+    def finish(self):
+        """Roll own totals up into total_bytes/total_files"""
+        self.total_bytes = array("q", self.own_bytes)
+        self.total_files = array("Q", self.own_files)
+        for i in range(len(self) - 1, 0, -1):
+            p = self.parent[i]
+            self.total_bytes[p] += self.total_bytes[i]
+            self.total_files[p] += self.total_files[i]
+
+    def nbytes(self):
+        """Memory held by the arrays"""
+        arrays = [self.parent, self.name_at, self.own_bytes, self.own_files,
+                  self.total_bytes or array("q"), self.total_files or array("Q")]
+        return len(self.names) + sum(a.itemsize * len(a) for a in arrays)
+
+    def top_dirs(self, n=TOP_N, depth=1):
+        """[(rel path, bytes, files)] of the n heaviest directories exactly depth levels down"""
+        depths = self.depth()
+        nodes = [i for i in range(1, len(self)) if depths[i] == depth]
+        nodes.sort(key=lambda i: self.total_bytes[i], reverse=True)
+        return [(self.rel_path(i), self.total_bytes[i], self.total_files[i]) for i in nodes[:n]]
+
+    def top_own(self, n=TOP_N):
+        """[(rel path, bytes, files)] of the n directories holding the most bytes directly.
+
+        Unlike subtree totals these never overlap, so they point at where the
+        data actually sits (a media folder, a database folder...)."""
+        nodes = sorted(range(len(self)), key=lambda i: self.own_bytes[i], reverse=True)
+        return [(self.rel_path(i), self.own_bytes[i], self.own_files[i])
+                for i in nodes[:n] if self.own_bytes[i]]
+
+    def top_types(self, n=TOP_N):
+        """[(extension, bytes, files)] of the n file types taking the most space"""
+        types = sorted(self.types.items(), key=lambda item: item[1][0], reverse=True)
+        return [(ext or NO_EXT, size, files) for ext, (size, files) in types[:n]]
+
+
+def scan_tree(path, cancel=None, tree=None):
+    """Return (bytes, files) under path.
+
+    Uses os.scandir and DirEntry.stat, which on Windows come from the
+    directory listing itself, so there is no extra system call per file.
+    With a DirTree for path, the same walk also records every directory
+    and the file types into it."""
+    total = 0
+    files = 0
+    types = tree.types if tree is not None else None
+    stack = [(path, 0)]
+    while stack:
+        check_cancel(cancel)
+        dir_path, node = stack.pop()
+        try:
+            it = os.scandir(dir_path)
+        except OSError:
+            continue
+        own_bytes = 0
+        own_files = 0
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        child = tree.add_dir(node, entry.name) if tree is not None else 0
+                        stack.append((entry.path, child))
+                        continue
+                    size = entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+                own_bytes += size
+                own_files += 1
+                if types is not None:
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    counts = types.get(ext)
+                    if counts is None:
+                        types[ext] = [size, 1]
+                    else:
+                        counts[0] += size
+                        counts[1] += 1
+        total += own_bytes
+        files += own_files
+        if tree is not None:
+            tree.own_bytes[node] += own_bytes
+            tree.own_files[node] += own_files
+    if tree is not None:
+        tree.finish()
+    return total, files
+
+
+def _list_dir(path):
+    """Own files/bytes and subfolder names of one directory"""
+    files = 0
+    size = 0
+    children = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    children.append(entry.name)
+                else:
+                    size += entry.stat(follow_symlinks=False).st_size
+                    files += 1
+            except OSError:
+                pass
+    return files, size, children
+
+
+def scan_tree_indexed(path, index, cancel=None):
+    """Like scan_tree, but only lists directories whose mtime changed since the last scan.
+
+    Unchanged directories cost one stat call instead of a listing."""
+    cached = index.load_root(path)
+    rows = {}
+    total = 0
+    files = 0
+    now = time.time()
+    stack = [""]
+    while stack:
+        check_cancel(cancel)
+        rel = stack.pop()
+        full = os.path.join(path, rel) if rel else path
+        try:
+            mtime_ns = os.stat(full).st_mtime_ns
+            row = cached.get(rel)
+            if row is not None and row[0] == mtime_ns and now - row[1] < MAX_ROW_AGE:
+                scanned, own_files, own_bytes, children = row[1:]
+            else:
+                scanned = now
+                own_files, own_bytes, children = _list_dir(full)
+        except OSError:
+            continue
+        rows[rel] = (mtime_ns, scanned, own_files, own_bytes, children)
+        total += own_bytes
+        files += own_files
+        stack.extend(os.path.join(rel, name) for name in children)
+
+    index.save_root(path, rows)
+    return total, files
+
+
+def _traced_scan(name, how, fn, *args):
+    """Run one root's scan inside a "scan" trace phase"""
+    with phase("scan", folder=name, how=how) as span:
+        total, files = fn(*args)
+        span.count(total, files)
+    return total, files
+
+
+def scan_folders(folders, cancel=None, progress=None, status=None, on_result=None, index=None,
+                 trees=None):
+    """Scan every {name: path} root at the same time.
+
+    on_result(name, bytes, files) is called as each root finishes. With a
+    SizeIndex, unchanged directories are taken from the index. With a trees
+    dict, every directory has to be listed, so the index is not used and
+    trees[name] is filled with the DirTree of each root.
+    Returns {name: (bytes, files)}; missing roots are skipped."""
+    roots = {name: path for name, path in folders.items() if os.path.exists(path)}
+    results = {}
+    if not roots:
+        return results
+
+    with ThreadPoolExecutor(max_workers=len(roots), thread_name_prefix="scan") as pool:
+        if trees is not None:
+            for name, path in roots.items():
+                trees[name] = DirTree(path)
+            futures = {pool.submit(_traced_scan, name, "tree", scan_tree, path, cancel, trees[name]): name
+                       for name, path in roots.items()}
+        elif index is not None:
+            futures = {pool.submit(_traced_scan, name, "index", scan_tree_indexed, path, index, cancel): name
+                       for name, path in roots.items()}
+        else:
+            futures = {pool.submit(_traced_scan, name, "full", scan_tree, path, cancel): name
+                       for name, path in roots.items()}
+        for i, future in enumerate(as_completed(futures), start=1):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except MoveCancelled:
+                continue
+            if on_result:
+                on_result(name, *results[name])
+            if progress:
+                progress(i, len(roots))
+
+    check_cancel(cancel)
+    return results
+
+
+def format_breakdown(trees, top=TOP_N):
+    """Human-readable breakdown of where the space is in each scanned root"""
+    lines = []
+    for name, tree in trees.items():
+        if tree.total_bytes is None:
+            continue    # quét bị hủy giữa chừng
+        lines.append(f"{name}: {format_size(tree.total_bytes[0])}, {tree.total_files[0]} tệp")
+        sections = [("Thư mục con lớn nhất", tree.top_dirs(top)),
+                    ("Nơi chứa nhiều dữ liệu nhất", tree.top_own(top)),
+                    ("Loại tệp", tree.top_types(top))]
+        for title, rows in sections:
+            if not rows:
+                continue
+            lines.append(f"  {title}:")
+            for label, size, files in rows:
+                lines.append(f"    {format_size(size):>10}  {files:>7} tệp  {label or '.'}")
+    return "\n".join(lines)
+
+
+def breakdown_to_dict(trees, top=TOP_N):
+    """The breakdown as plain data, for --json"""
+    def rows(items, key):
+        return [{key: label, "bytes": size, "files": files} for label, size, files in items]
+
+    return {name: {"bytes": tree.total_bytes[0], "files": tree.total_files[0],
+                   "dirs": len(tree), "top_dirs": rows(tree.top_dirs(top), "path"),
+                   "top_own": rows(tree.top_own(top), "path"),
+                   "top_types": rows(tree.top_types(top), "ext")}
+            for name, tree in trees.items() if tree.total_bytes is not None}
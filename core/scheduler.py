@@ -0,0 +1,136 @@
+import os
+import threading
+from collections import Counter
+
+from core.mover import run_moves
+from core.planner import existing_parent
+from core.progress import BAR_SCALE
+
+
+PER_DISK = 1        # số việc di chuyển cùng lúc trên một ổ cứng vật lý
+
+IOCTL_VOLUME_GET_VOLUME_DISK_EXTENTS = 0x560000
+DISK_EXTENT_SIZE = 24   # DWORD DiskNumber (+4 padding), LARGE_INTEGER StartingOffset, ExtentLength
+
+
+def _volume_disks(drive):
+    """Physical disk numbers behind a drive letter ("C:"), or None if Windows won't say"""
+    import ctypes
+    from ctypes import wintypes
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.CreateFileW.restype = wintypes.HANDLE
+    handle = kernel32.CreateFileW(f"\\\\.\\{drive}", 0, 3, None, 3, 0, None)   # share r/w, OPEN_EXISTING
+    if handle in (None, wintypes.HANDLE(-1).value):
+        return None
+    try:
+        buf = ctypes.create_string_buffer(8 + DISK_EXTENT_SIZE * 16)
+        returned = wintypes.DWORD()
+        if not kernel32.DeviceIoControl(handle, IOCTL_VOLUME_GET_VOLUME_DISK_EXTENTS, None, 0,
+                                        buf, len(buf), ctypes.byref(returned), None):
+            return None
+        count = int.from_bytes(buf.raw[:4], "little")
+        return {int.from_bytes(buf.raw[8 + DISK_EXTENT_SIZE * i:12 + DISK_EXTENT_SIZE * i], "little")
+                for i in range(min(count, 16))}
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def disks_of(path):
+    """Keys of the physical disks holding path: partitions of one disk share a key.
+
+    Falls back to the volume (st_dev) where the disk can't be determined."""
+    path = existing_parent(path)
+    drive = os.path.splitdrive(path)[0]
+    if os.name == "nt" and drive and not drive.startswith("\\\\"):
+        try:
+            disks = _volume_disks(drive)
+        except OSError:
+            disks = None
+        if disks:
+            return frozenset(("disk", n) for n in disks)
+    return frozenset([("volume", os.stat(path).st_dev)])
+
+
+def run_batch(jobs, cancel=None, progress=None, status=None, per_disk=PER_DISK):
+    """Run MoveJobs concurrently, at most per_disk of them touching any one physical disk.
+
+    A job occupies the disks of its source, its destination and (with a
+    backup) the backup store, so moves between different disks run in
+    parallel while two moves on the same disk queue up instead of seeking
+    against each other. Jobs start in the given order whenever their disks
+    are free. Returns the run_moves result merged over all jobs, plus
+    "results": {job name: run_moves result} and "not_run" (cancelled before starting)."""
+    result = {"moved": [], "errors": [], "cancelled": False, "saved": [0, 0],
+              "results": {}, "not_run": []}
+    if not jobs:
+        return result
+
+    keys = {job.name: disks_of(job.old_path) | disks_of(job.new_path)
+            | (disks_of(job.store.root) if job.backup else frozenset()) for job in jobs}
+    # Trọng số cho progress tổng: số byte phải ghi (x2 nếu có sao lưu)
+    weights = {job.name: max((job.size or (1, 0))[0] * (2 if job.backup else 1), 1) for job in jobs}
+    fractions = {job.name: 0.0 for job in jobs}
+    texts = {}
+    busy = Counter()
+    cond = threading.Condition()
+    pending = list(jobs)
+    running = {}
+
+    def report():
+        with cond:
+            done = sum(weights[n] * f for n, f in fractions.items()) / sum(weights.values())
+            line = " | ".join(texts[n] for n in running if n in texts)
+        if progress:
+            progress(int(BAR_SCALE * done), BAR_SCALE)
+        if status and line:
+            status(line)
+
+    def run(job):
+        def job_progress(done, total):
+            fractions[job.name] = done / total if total else 0.0
+            report()
+
+        def job_status(text):
+            texts[job.name] = text
+            report()
+
+        try:
+            outcome = run_moves([job], cancel, job_progress, job_status)
+        except Exception as e:
+            outcome = {"moved": [], "errors": [f"Lỗi khi xử lý {job.name}: {e}"],
+                       "cancelled": False, "saved": [0, 0]}
+        with cond:
+            fractions[job.name] = 1.0
+            result["results"][job.name] = outcome
+            for key in keys[job.name]:
+                busy[key] -= 1
+            del running[job.name]
+            texts.pop(job.name, None)
+            cond.notify_all()
+
+    with cond:
+        while pending or running:
+            if cancel is not None and cancel.is_set() and pending:
+                result["not_run"] += [job.name for job in pending]
+                pending.clear()
+            job = next((j for j in pending if all(busy[k] < per_disk for k in keys[j.name])), None)
+            if job is None:
+                cond.wait()
+                continue
+            pending.remove(job)
+            for key in keys[job.name]:
+                busy[key] += 1
+            running[job.name] = threading.Thread(target=run, args=(job,), name=f"batch-{job.name}")
+            running[job.name].start()
+
+    for job in jobs:
+        outcome = result["results"].get(job.name)
+        if outcome is None:
+            continue
+        result["moved"] += outcome["moved"]
+        result["errors"] += outcome["errors"]
+        result["cancelled"] |= outcome["cancelled"]
+        result["saved"][0] += outcome["saved"][0]
+        result["saved"][1] += outcome["saved"][1]
+    result["cancelled"] |= bool(result["not_run"])
+    return result
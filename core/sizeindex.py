@@ -0,0 +1,139 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from core.state import state_dir
+
+
+SCHEMA_VERSION = 1
+MAX_ROWS = 400000              # giới hạn số thư mục lưu trong index (vài chục MB)
+STALE_ROOT_DAYS = 90           # root không được quét lại sau chừng này ngày thì bỏ
+MAX_ROW_AGE = 24 * 3600        # quét lại thư mục sau 1 ngày dù mtime không đổi
+SEP = "/"                      # "/" không thể nằm trong tên tệp trên Windows lẫn POSIX
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    root TEXT NOT NULL,
+    rel TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    scanned REAL NOT NULL,
+    files INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    children TEXT NOT NULL,
+    PRIMARY KEY (root, rel)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS roots (
+    root TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL
+);
+"""
+
+
+class SizeIndex:
+    """On-disk index of per-directory file totals keyed by directory mtime.
+
+    A directory's mtime changes when entries are added, removed or renamed,
+    so an unchanged mtime means its own files and subfolders can be taken
+    from the index without listing it. Files growing in place don't touch
+    the directory mtime, which is why rows also expire after MAX_ROW_AGE."""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(state_dir(), "sizes.db")
+        self._write_lock = threading.Lock()
+        self._open()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _open(self):
+        """Check the database and rebuild it if it is corrupted or from another version"""
+        try:
+            with closing(self._connect()) as conn:
+                ok = conn.execute("PRAGMA quick_check").fetchone()[0] == "ok"
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if ok and version == SCHEMA_VERSION:
+                    return
+                if ok and version == 0:
+                    self._create(conn)
+                    return
+        except sqlite3.DatabaseError:
+            pass
+        self.rebuild()
+
+    def _create(self, conn):
+        conn.executescript(SCHEMA)
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        conn.commit()
+
+    def rebuild(self):
+        """Throw the index away and start empty"""
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.path + suffix)
+            except FileNotFoundError:
+                pass
+        with closing(self._connect()) as conn:
+            self._create(conn)
+
+    def load_root(self, root):
+        """Return {rel: (mtime_ns, scanned, files, bytes, children)} for one root"""
+        try:
+            with closing(self._connect()) as conn:
+                rows = conn.execute(
+                    "SELECT rel, mtime_ns, scanned, files, bytes, children FROM dirs WHERE root = ?",
+                    (root,))
+                return {rel: (mtime_ns, scanned, files, size, children.split(SEP) if children else [])
+                        for rel, mtime_ns, scanned, files, size, children in rows}
+        except sqlite3.DatabaseError:
+            self.rebuild()
+            return {}
+
+    def save_root(self, root, rows):
+        """Replace the stored rows of one root and evict stale roots"""
+        now = time.time()
+        with self._write_lock:
+            try:
+                with closing(self._connect()) as conn, conn:
+                    conn.execute("DELETE FROM dirs WHERE root = ?", (root,))
+                    conn.executemany(
+                        "INSERT INTO dirs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        ((root, rel, mtime_ns, scanned, files, size, SEP.join(children))
+                         for rel, (mtime_ns, scanned, files, size, children) in rows.items()))
+                    conn.execute("INSERT OR REPLACE INTO roots VALUES (?, ?)", (root, now))
+                    self._evict(conn, root, now)
+            except sqlite3.DatabaseError:
+                self.rebuild()
+
+    def _evict(self, conn, current_root, now):
+        stale = now - STALE_ROOT_DAYS * 24 * 3600
+        for (root,) in conn.execute("SELECT root FROM roots WHERE last_seen < ?", (stale,)).fetchall():
+            self._drop_root(conn, root)
+
+        # Quá giới hạn → bỏ các root lâu không quét nhất
+        count = conn.execute("SELECT COUNT(*) FROM dirs").fetchone()[0]
+        if count <= MAX_ROWS:
+            return
+        oldest = conn.execute("SELECT root FROM roots WHERE root != ? ORDER BY last_seen",
+                              (current_root,)).fetchall()
+        for (root,) in oldest:
+            count -= conn.execute("SELECT COUNT(*) FROM dirs WHERE root = ?", (root,)).fetchone()[0]
+            self._drop_root(conn, root)
+            if count <= MAX_ROWS:
+                break
+
+    def _drop_root(self, conn, root):
+        conn.execute("DELETE FROM dirs WHERE root = ?", (root,))
+        conn.execute("DELETE FROM roots WHERE root = ?", (root,))
+
+
+def open_size_index():
+    """SizeIndex, or None if it can't be opened (sizes then come from a full scan)"""
+    try:
+        return SizeIndex()
+    except (OSError, sqlite3.Error):
+        return None
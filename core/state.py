@@ -0,0 +1,9 @@
+import os
+
+
+def state_dir(*parts):
+    """Folder for ZaloMover's own state (journals, indexes, logs), created on demand"""
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    path = os.path.join(base, "ZaloMover", *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,159 @@
+import json
+import os
+import shutil
+import stat
+import threading
+
+from core.copier import check_cancel, copy_tree
+from core.manifest import MTIME_TOLERANCE_NS
+from core.scanner import scan_tree
+from core.state import state_dir
+from core.verify import file_crc32
+
+
+SYNC_BACKUP_SUFFIX = ".sync"   # snapshot "<tên>.sync": các tệp ở đích bị xóa khi đồng bộ
+MOST_FILES = 0.5               # đồng bộ xóa quá nửa số tệp ở đích → Zalo vừa tạo thư mục gần như trống
+
+_links_lock = threading.Lock()
+
+
+def links_path():
+    """%LOCALAPPDATA%\\ZaloMover\\links.json: {name: destination} of every finished move"""
+    return os.path.join(state_dir(), "links.json")
+
+
+def load_links():
+    try:
+        with open(links_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def record_link(name, dst):
+    """Remember where a folder was moved, so a folder Zalo recreates can be synced back.
+
+    Batch moves call this from several threads: the read-modify-write runs
+    under a lock, through a tmp file of its own."""
+    with _links_lock:
+        links = load_links()
+        links[name] = dst
+        tmp = f"{links_path()}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(links, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, links_path())
+
+
+def linked_destination(name):
+    """Where name was last moved to, if that copy still exists"""
+    dst = load_links().get(name)
+    return dst if dst and os.path.isdir(dst) else None
+
+
+class SyncDiff:
+    """What it takes to make dst identical to src"""
+
+    def __init__(self):
+        self.copy = set()         # đường dẫn tương đối cần copy (mới hoặc đã đổi)
+        self.copy_bytes = 0
+        self.same = []            # (src path, stat) không đổi → chỉ ghi vào manifest
+        self.delete = []          # đường dẫn ở dst không còn ở src (tệp hoặc cả thư mục)
+        self.delete_bytes = 0
+        self.delete_files = 0
+        self.kept_files = 0       # tệp ở dst vẫn còn ở src (giống hoặc sẽ được copy đè)
+
+    @property
+    def copy_files(self):
+        return len(self.copy)
+
+    @property
+    def loses_most(self):
+        """True if syncing would delete most of the files at dst (src is a fresh, nearly empty folder)"""
+        total = self.delete_files + self.kept_files
+        return bool(total) and self.delete_files > total * MOST_FILES
+
+
+def _same_file(st, dst_st):
+    return (dst_st.st_size == st.st_size
+            and abs(dst_st.st_mtime_ns - st.st_mtime_ns) <= MTIME_TOLERANCE_NS)
+
+
+def compare_trees(src, dst, cancel=None, compare_hash=False):
+    """Diff src against an earlier copy at dst by size and mtime (and CRC32 with compare_hash)"""
+    diff = SyncDiff()
+    buf = bytearray(1024 * 1024) if compare_hash else None
+    stack = [""]
+    while stack:
+        check_cancel(cancel)
+        rel_dir = stack.pop()
+        src_dir = os.path.join(src, rel_dir)
+        dst_dir = os.path.join(dst, rel_dir)
+        with os.scandir(src_dir) as it:
+            entries = {entry.name: entry for entry in it}
+
+        # Có ở dst nhưng không còn ở src (hoặc đổi từ thư mục thành tệp và ngược lại) → xóa
+        try:
+            with os.scandir(dst_dir) as it:
+                for entry in it:
+                    other = entries.get(entry.name)
+                    if (other is None
+                            or other.is_dir(follow_symlinks=False) != entry.is_dir(follow_symlinks=False)):
+                        diff.delete.append(entry.path)
+                        if entry.is_dir(follow_symlinks=False):
+                            size, files = scan_tree(entry.path, cancel)
+                        else:
+                            size, files = entry.stat(follow_symlinks=False).st_size, 1
+                        diff.delete_bytes += size
+                        diff.delete_files += files
+        except (FileNotFoundError, NotADirectoryError):
+            # Thư mục mới, hoặc ở dst là tệp (đã nằm trong diff.delete) → không có gì để so
+            pass
+
+        for name, entry in entries.items():
+            rel = os.path.join(rel_dir, name)
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(rel)
+                continue
+            st = entry.stat(follow_symlinks=False)
+            try:
+                dst_st = os.stat(os.path.join(dst, rel))
+                if stat.S_ISREG(dst_st.st_mode):
+                    diff.kept_files += 1
+                same = stat.S_ISREG(dst_st.st_mode) and _same_file(st, dst_st)
+                if same and compare_hash:
+                    same = file_crc32(entry.path, buf) == file_crc32(os.path.join(dst, rel), buf)
+            except OSError:
+                same = False
+            if same:
+                diff.same.append((entry.path, st))
+            else:
+                diff.copy.add(rel)
+                diff.copy_bytes += st.st_size
+    return diff
+
+
+def deleted_filter(diff):
+    """include() for backing up dst: only the files sync_tree is about to delete"""
+    exact = set(diff.delete)
+    prefixes = tuple(os.path.join(path, "") for path in diff.delete)
+
+    def include(path, st):
+        return path in exact or path.startswith(prefixes)
+    return include
+
+
+def sync_tree(src, dst, diff, cancel=None, on_file=None, on_bytes=None, verify=False, throttle=None,
+              span=None):
+    """Apply a SyncDiff: delete what is gone from src, then copy new and changed files"""
+    for path in diff.delete:
+        check_cancel(cancel)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.unlink(path)
+
+    def include(path, st):
+        return os.path.relpath(path, src) in diff.copy
+
+    copy_tree(src, dst, cancel, on_file, dirs_exist_ok=True, include=include,
+              on_bytes=on_bytes, verify=verify, throttle=throttle, span=span)
@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from core.copier import MoveCancelled
+
+
+DEFAULT_RATE_MB = 20        # MB/s mặc định của chế độ chạy nền
+MIN_RATE = 1024 * 1024      # lùi tốc độ tối đa xuống còn 1 MB/s
+BURST_SECONDS = 0.5         # bucket chứa tối đa nửa giây dữ liệu
+SAMPLE_INTERVAL = 1.0       # giây giữa 2 lần đo độ trễ ổ đĩa
+HIGH_LATENCY_MS = 40        # trung bình mỗi I/O chậm hơn mức này → máy đang bận, giảm tốc
+LOW_LATENCY_MS = 15         # nhanh hơn mức này → tăng dần lại đến giới hạn
+BACKOFF = 0.5
+RECOVER = 1.25
+CONTENTION = 2.0            # chậm gấp đôi lúc ổ chỉ phục vụ bản copy → có chương trình khác đang chờ ổ
+SETTLED = 1.25              # về gần mức đó → ổ lại rảnh, tăng tốc dần
+MIN_SAMPLE_IOS = 10         # ít I/O hơn trong một lần đo → số đo không đáng tin, bỏ qua
+
+
+def _disk_keys(psutil, paths, counters):
+    """Keys of the per-disk counters for the disks holding paths (empty if they can't be told)"""
+    keys = set()
+    if os.name == "nt":
+        from core.scheduler import disks_of    # scheduler → mover → throttle: import lúc gọi
+        for path in paths:
+            keys.update(f"PhysicalDrive{n}" for kind, n in disks_of(path) if kind == "disk")
+        return keys & set(counters)
+    try:
+        partitions = sorted(psutil.disk_partitions(), key=lambda p: len(p.mountpoint), reverse=True)
+    except OSError:
+        return keys
+    for path in paths:
+        path = os.path.realpath(path)
+        while not os.path.exists(path) and os.path.dirname(path) != path:
+            path = os.path.dirname(path)
+        for part in partitions:
+            if path == part.mountpoint or path.startswith(os.path.join(part.mountpoint, "")):
+                # /dev/sda1 → "sda1", /dev/mapper/vg-root → "dm-0"
+                name = os.path.basename(os.path.realpath(part.device))
+                if name in counters:
+                    keys.add(name)
+                break
+    return keys
+
+
+def disk_latency_probe(paths=()):
+    """A callable returning the average ms per I/O on the disks of paths since its last call.
+
+    Only the disks holding paths are sampled (every disk if they can't be
+    told apart). With fewer than MIN_SAMPLE_IOS I/Os it returns None.
+    None instead of a probe if psutil or the disk counters aren't available."""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    try:
+        keys = _disk_keys(psutil, paths, psutil.disk_io_counters(perdisk=True) or {}) if paths else set()
+    except (OSError, RuntimeError, psutil.Error):
+        return None
+
+    def sample():
+        if keys:
+            per_disk = psutil.disk_io_counters(perdisk=True)
+            disks = [per_disk[key] for key in keys if key in per_disk]
+        else:
+            disks = [psutil.disk_io_counters()]
+        if not disks or disks[0] is None:
+            return None
+        return (sum(d.read_count + d.write_count for d in disks),
+                sum(d.read_time + d.write_time for d in disks))
+
+    try:
+        last = [sample()]
+    except (OSError, RuntimeError, psutil.Error):
+        return None
+    if last[0] is None:
+        return None
+
+    def probe():
+        try:
+            now = sample()
+        except (OSError, RuntimeError, psutil.Error):
+            return None
+        if now is None:
+            return None
+        prev, last[0] = last[0], now
+        ios, ms = (a - b for a, b in zip(now, prev))
+        if ios < MIN_SAMPLE_IOS:
+            return None
+        return ms / ios
+
+    return probe
+
+
+class Throttle:
+    """Token bucket shared by every copy worker, capping total throughput at rate bytes/s.
+
+    Workers take tokens after each chunk and sleep off any debt, so the cap
+    holds across threads and across jobs sharing the throttle. Once a second
+    the latency of the disks passed to watch() is sampled and compared with
+    the move's own service time, the lowest latency seen while copying.
+    Above HIGH_LATENCY_MS and CONTENTION times that, other programs are
+    queueing behind the copy and the rate is halved (down to MIN_RATE).
+    Below LOW_LATENCY_MS, or back near the copy's own latency, it climbs
+    back towards the cap. A slow disk the copy keeps busy on its own is
+    left alone; a few small reads from an app launch still count."""
+
+    def __init__(self, rate, adaptive=True):
+        self.max_rate = rate
+        self.rate = rate
+        self.tokens = rate * BURST_SECONDS
+        self.lock = threading.Lock()
+        self.last = time.monotonic()
+        self.adaptive = adaptive
+        self.paths = set()
+        self.probe = disk_latency_probe() if adaptive else None
+        self.own_latency = None
+        self.next_sample = self.last + SAMPLE_INTERVAL
+
+    def watch(self, *paths):
+        """Sample only the disks holding paths (sources, targets, backup store) from now on"""
+        if not self.adaptive:
+            return
+        with self.lock:
+            paths = self.paths | {path for path in paths if path}
+            if paths != self.paths:
+                self.paths = paths
+                self.probe = disk_latency_probe(sorted(paths))
+                self.own_latency = None
+
+    def _adapt(self, now):
+        self.next_sample = now + SAMPLE_INTERVAL
+        latency = self.probe()
+        if latency is None:
+            return
+        # Độ trễ thấp nhất từng đo được = ổ chỉ phục vụ bản copy; chậm hơn hẳn mức đó mới là do chương trình khác
+        if self.own_latency is None or latency < self.own_latency:
+            self.own_latency = latency
+        if latency > max(HIGH_LATENCY_MS, self.own_latency * CONTENTION):
+            self.rate = max(self.rate * BACKOFF, min(MIN_RATE, self.max_rate))
+        elif latency < max(LOW_LATENCY_MS, self.own_latency * SETTLED):
+            self.rate = min(self.rate * RECOVER, self.max_rate)
+
+    def consume(self, nbytes, cancel=None):
+        """Account for nbytes written; block until the rate allows it (raises MoveCancelled)"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.tokens + (now - self.last) * self.rate, self.rate * BURST_SECONDS)
+            self.last = now
+            if self.probe is not None and now >= self.next_sample:
+                self._adapt(now)
+            self.tokens -= nbytes
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+        deadline = time.monotonic() + wait
+        while wait > 0:
+            # Ngủ từng đoạn ngắn để nút hủy vẫn phản hồi ngay
+            if cancel is not None:
+                if cancel.wait(min(wait, 0.2)):
+                    raise MoveCancelled()
+            else:
+                time.sleep(min(wait, 0.2))
+            wait = deadline - time.monotonic()
+
+
+_priority_lock = threading.Lock()
+_priority_users = 0
+_priority_restore = []
+
+
+def _lower_priority():
+    """Drop this process to below-normal CPU and very-low/idle I/O priority; returns undo callables"""
+    try:
+        import psutil
+    except ImportError:
+        return []
+    proc = psutil.Process()
+    restore = []
+    try:
+        old_nice = proc.nice()
+        proc.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS if os.name == "nt" else max(old_nice, 10))
+        restore.append(lambda: proc.nice(old_nice))
+    except (psutil.Error, OSError, AttributeError):
+        pass
+    try:
+        old_io = proc.ionice()
+        if os.name == "nt":
+            proc.ionice(psutil.IOPRIO_VERYLOW)
+            restore.append(lambda: proc.ionice(old_io))
+        else:
+            proc.ionice(psutil.IOPRIO_CLASS_IDLE)
+            restore.append(lambda: proc.ionice(old_io.ioclass, old_io.value))
+    except (psutil.Error, OSError, AttributeError, ValueError):
+        pass    # macOS không có ionice
+    return restore
+
+
+@contextmanager
+def low_priority(enabled=True):
+    """Lower the process's CPU and I/O priority while any caller is inside.
+
+    Reference-counted, so concurrent moves (the batch scheduler) lower it once
+    and the last one to finish restores it. Without psutil it does nothing.
+    On Linux, raising nice back needs root, so the process may stay niced."""
+    global _priority_users, _priority_restore
+    if not enabled:
+        yield
+        return
+    with _priority_lock:
+        if _priority_users == 0:
+            _priority_restore = _lower_priority()
+        _priority_users += 1
+    try:
+        yield
+    finally:
+        with _priority_lock:
+            _priority_users -= 1
+            if _priority_users == 0:
+                for undo in reversed(_priority_restore):
+                    try:
+                        undo()
+                    except Exception:
+                        pass
+                _priority_restore = []
@@ -0,0 +1,185 @@
+import cProfile
+import heapq
+import io
+import json
+import logging
+import logging.handlers
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+
+from core.copier import MoveCancelled
+from core.state import state_dir
+
+
+TRACE_FILE = "trace.jsonl"
+TRACE_MAX_BYTES = 5 * 1024 * 1024   # mỗi tệp log tối đa 5 MB
+TRACE_BACKUPS = 3                   # giữ trace.jsonl.1 .. .3
+SLOWEST_FILES = 10                  # số tệp chậm nhất ghi lại cho mỗi phase
+PROFILE_TOP = 40                    # số dòng trong bản tóm tắt .txt của cProfile
+
+# Mỗi lần chạy app một id → gom các dòng trace của cùng một phiên
+SESSION = uuid.uuid4().hex[:12]
+
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def log_dir():
+    """%LOCALAPPDATA%\\ZaloMover\\logs: trace.jsonl (+ rotated copies) and cProfile dumps"""
+    return state_dir("logs")
+
+
+class _QuietHandler(logging.handlers.RotatingFileHandler):
+    """Rotating JSON-lines file; a log that can't be written never breaks a move"""
+
+    def handleError(self, record):
+        pass
+
+
+def _trace_logger():
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            logger = logging.getLogger("zalomover.trace")
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            try:
+                handler = _QuietHandler(os.path.join(log_dir(), TRACE_FILE), maxBytes=TRACE_MAX_BYTES,
+                                        backupCount=TRACE_BACKUPS, encoding="utf-8", delay=True)
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+            except OSError:
+                logger.addHandler(logging.NullHandler())
+            _logger = logger
+    return _logger
+
+
+def event(kind, **fields):
+    """Write one trace record: {"ts", "session", "event": kind, ...fields}"""
+    record = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "session": SESSION, "pid": os.getpid(),
+              "event": kind}
+    record.update(fields)
+    _trace_logger().info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+class Phase:
+    """Timing and counters of one phase (scan, kill, backup, move, link, delete...).
+
+    Used as a context manager: the record is written when the block exits,
+    with the outcome ("ok", "cancelled" or "error"). file() is thread-safe
+    and keeps the SLOWEST_FILES slowest files seen by the copy workers."""
+
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = fields
+        self.bytes = 0
+        self.files = 0
+        self.errors = 0
+        self._slowest = []
+        self._lock = threading.Lock()
+        self._start = None
+
+    def count(self, nbytes=0, files=0):
+        with self._lock:
+            self.bytes += nbytes
+            self.files += files
+
+    def file(self, path, nbytes, seconds):
+        """One file handled in seconds; counts it and keeps it if it is among the slowest"""
+        item = (seconds, nbytes, path)
+        with self._lock:
+            self.bytes += nbytes
+            self.files += 1
+            if len(self._slowest) < SLOWEST_FILES:
+                heapq.heappush(self._slowest, item)
+            elif seconds > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def error(self, count=1):
+        with self._lock:
+            self.errors += count
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        record = {"phase": self.name, **self.fields, "seconds": round(seconds, 3),
+                  "bytes": self.bytes, "files": self.files, "errors": self.errors}
+        if self.bytes and seconds > 0:
+            record["mb_per_s"] = round(self.bytes / seconds / (1024 * 1024), 2)
+        if self._slowest:
+            record["slowest"] = [{"path": path, "bytes": nbytes, "seconds": round(s, 3)}
+                                 for s, nbytes, path in sorted(self._slowest, reverse=True)]
+        if exc_type is None:
+            record["outcome"] = "ok"
+        elif issubclass(exc_type, MoveCancelled):
+            record["outcome"] = "cancelled"
+        else:
+            record["outcome"] = "error"
+            record["error"] = f"{exc_type.__name__}: {exc}"
+            record["errors"] = max(record["errors"], 1)
+        try:
+            event("phase", **record)
+        except Exception:
+            pass
+        return False
+
+
+def phase(name, **fields):
+    """with phase("backup", job=...) as p: ... → one JSON-lines record with timing and counters"""
+    return Phase(name, **fields)
+
+
+class Profiler:
+    """cProfile over every thread of one run, for attaching to a ticket.
+
+    Python 3.12+ profiles all threads from one Profile. Before that each
+    thread needs its own, so threads started during the run (copy workers,
+    scan and purge pools) get one through threading.setprofile and the
+    stats are merged at the end. The window's QThreads are not covered."""
+
+    def __init__(self):
+        self.profiles = []
+        self._lock = threading.Lock()
+        self._per_thread = sys.version_info < (3, 12)
+
+    def _thread_hook(self, *args):
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(profile)
+        profile.enable()
+
+    def start(self):
+        if self._per_thread:
+            threading.setprofile(self._thread_hook)
+        self.main = cProfile.Profile()
+        self.main.enable()
+
+    def stop(self, path=None):
+        """Stop and write <path>.prof (for snakeviz/pstats) and a <path>.txt summary; returns the .prof path"""
+        self.main.disable()
+        if self._per_thread:
+            threading.setprofile(None)
+        path = path or os.path.join(log_dir(), time.strftime("profile-%Y%m%d-%H%M%S"))
+        if path.endswith(".prof"):
+            path = path[:-5]
+        stats = pstats.Stats(self.main)
+        with self._lock:
+            for profile in self.profiles:
+                stats.add(profile)
+        stats.dump_stats(path + ".prof")
+        text = io.StringIO()
+        pstats.Stats(path + ".prof", stream=text).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        with open(path + ".txt", "w", encoding="utf-8") as f:
+            f.write(text.getvalue())
+        return path + ".prof"
@@ -0,0 +1,87 @@
+import os
+import zlib
+
+from core.manifest import load_manifest, manifest_path, file_matches, VERIFIED
+
+
+HASH_NAME = "crc32"            # nhanh, không cần mã hóa — chỉ để phát hiện tệp hỏng/bị cắt
+READ_BUFFER = 1024 * 1024
+
+
+def file_crc32(path, buf=None):
+    """CRC32 of a file, read in chunks into buf (a reusable bytearray)"""
+    if buf is None:
+        buf = bytearray(READ_BUFFER)
+    view = memoryview(buf)
+    crc = 0
+    with open(path, "rb") as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            crc = zlib.crc32(view[:n], crc)
+    return crc
+
+
+def quick_verify(new_path):
+    """Compare the moved folder with its manifest by size and mtime only (no reading).
+
+    Returns the relative paths that are missing or differ."""
+    return [rel for rel, record in load_manifest(manifest_path(new_path)).items()
+            if not file_matches(record, _RecordStat(record), os.path.join(new_path, rel))]
+
+
+def full_verify(new_path, cancel=None, progress=None):
+    """Re-hash every file that has a stored checksum; returns the relative paths that differ.
+
+    Files recorded without one (same-volume rename, copy without verify) get
+    the quick size and mtime check instead."""
+    bad = []
+    buf = bytearray(READ_BUFFER)
+    records = list(load_manifest(manifest_path(new_path)).items())
+    for i, (rel, record) in enumerate(records, start=1):
+        if cancel is not None and cancel.is_set():
+            break
+        path = os.path.join(new_path, rel)
+        try:
+            if record.get("state") == VERIFIED:
+                if file_crc32(path, buf) != record.get(HASH_NAME):
+                    bad.append(rel)
+            elif not file_matches(record, _RecordStat(record), path):
+                bad.append(rel)
+        except OSError:
+            bad.append(rel)
+        if progress:
+            progress(i, len(records))
+    return bad
+
+
+class _RecordStat:
+    """Make a manifest record look like a stat result for file_matches"""
+
+    def __init__(self, record):
+        self.st_size = record.get("size")
+        self.st_mtime_ns = record.get("mtime_ns")
+
+
+def verify_folders(folders, full=False, cancel=None, progress=None, status=None):
+    """Check moved folders against their manifests, without the source (a worker task).
+
+    folders maps a name to the folder's destination. Quick compares size and
+    mtime, full re-reads every file that has a stored checksum. Returns
+    {"bad": {name: [relative paths]}, "unchecked": [names without a manifest]}."""
+    from core.copier import check_cancel    # core.copier import module này khi khởi tạo
+    result = {"bad": {}, "unchecked": []}
+    for name, new_path in folders.items():
+        check_cancel(cancel)
+        if not os.path.exists(manifest_path(new_path)):
+            # Di chuyển bằng bản cũ (chưa có manifest) → không có gì để so
+            result["unchecked"].append(name)
+            continue
+        if status:
+            status(f"Đang kiểm tra {name}...")
+        bad = full_verify(new_path, cancel, progress) if full else quick_verify(new_path)
+        check_cancel(cancel)
+        if bad:
+            result["bad"][name] = bad
+    return result
@@ -0,0 +1,52 @@
+import os
+
+from core import fs
+from core.scanner import scan_tree
+
+
+# ✅ Lấy đúng thư mục user hiện tại
+HOME = os.path.expanduser("~")
+
+
+def zalo_folders(home):
+    """Zalo-related folders of the profile at home"""
+    return {
+        "Zalo":    os.path.join(home, "AppData", "Local", "Programs", "Zalo"),
+        "ZaloPC":  os.path.join(home, "AppData", "Local", "ZaloPC"),
+        "ZaloData": os.path.join(home, "AppData", "Roaming", "ZaloData"),
+        "ZaloUpdate":  os.path.join(home, "AppData", "Local", "zalo-updater"),   # ✅ mới thêm
+    }
+
+
+# Default Zalo-related folders
+FOLDERS = zalo_folders(HOME)
+
+MOVE_DIR = "ZaloMove"      # luôn tạo thư mục này bên trong thư mục đích người dùng chọn
+
+
+def to_mb(size):
+    return round(size / (1024 * 1024), 2)
+
+
+def get_folder_size(path):
+    """Return folder size in MB"""
+    if not os.path.exists(path):
+        return 0
+    return to_mb(scan_tree(path)[0])
+
+
+def is_junction(path):
+    """Check if a folder is a junction/symlink whose target still exists"""
+    return os.path.exists(path) and fs.backend().is_link(path)
+
+
+def movable(name, folders=FOLDERS):
+    """True if the folder exists and has not been moved (linked) yet"""
+    path = folders[name]
+    return os.path.exists(path) and not is_junction(path)
+
+
+def find_backups():
+    """[(name, backup path)] for every <folder>.old backup left by earlier versions"""
+    return [(name, f"{path}.old") for name, path in FOLDERS.items()
+            if os.path.exists(f"{path}.old")]
@@ -0,0 +1,627 @@
+import os
+import threading
+import traceback
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+from ui.mainwindow import Ui_MainWindow   # file UI export từ Qt Designer
+from core.backupstore import default_store, format_snapshot
+from core.copier import MoveCancelled
+from core.journal import pending_journals
+from core.mover import prepare_jobs, run_moves, recover_moves, can_roll_forward
+from core.planner import plan_moves, format_plan
+from core.procs import release_folders, move_roots
+from core.progress import format_size
+from core.purge import stage_backups, stage_snapshots, pending_purges, purge
+from core.rules import load_rules
+from core.scanner import scan_folders, format_breakdown
+from core.sync import linked_destination
+from core.throttle import DEFAULT_RATE_MB, Throttle
+from core.trace import event
+from core.verify import verify_folders
+from core.sizeindex import open_size_index
+from core.zalo import (FOLDERS, MOVE_DIR, to_mb, is_junction, find_backups)
+
+
+class TaskWorker(QtCore.QThread):
+    """Run a long task off the GUI thread and report back through signals"""
+    progress = QtCore.pyqtSignal(int, int)
+    status = QtCore.pyqtSignal(str)
+    result = QtCore.pyqtSignal(object)
+
+    def __init__(self, fn, *args, parent=None, **kwargs):
+        super().__init__(parent)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Ask the task to stop at the next file"""
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, cancel=self.cancel_event,
+                             progress=self.progress.emit, status=self.status.emit, **self.kwargs)
+        except Exception as e:
+            if not isinstance(e, MoveCancelled):
+                event("error", front="gui", task=getattr(self.fn, "__name__", str(self.fn)),
+                      error=str(e), traceback=traceback.format_exc())
+            result = e
+        self.result.emit(result)
+
+
+class ScanWorker(TaskWorker):
+    """Scan folder sizes in the background, reporting each folder as soon as it is done"""
+    folder_scanned = QtCore.pyqtSignal(str, object, object)
+
+    def __init__(self, folders, index=None, trees=None, parent=None):
+        super().__init__(scan_folders, folders, parent=parent, index=index, trees=trees)
+        self.kwargs["on_result"] = self.folder_scanned.emit
+
+
+class ZaloMover(QtWidgets.QMainWindow, Ui_MainWindow):
+    def __init__(self):
+        super().__init__()
+        self.setupUi(self)
+
+        # Connect buttons
+        self.browseButton.clicked.connect(self.choose_folder)
+        self.moveButton.clicked.connect(self.move_selected)
+        self.deleteButton.clicked.connect(self.delete_old_backups)
+
+        # ✅ Xem dung lượng nằm ở thư mục con / loại tệp nào
+        self.breakdownButton = QtWidgets.QPushButton("Chi tiết dung lượng...", self.centralwidget)
+        self.breakdownButton.clicked.connect(self.show_breakdown)
+
+        # ✅ Kiểm tra lại dữ liệu đã di chuyển theo manifest (không cần bản gốc)
+        self.verifyButton = QtWidgets.QPushButton("Kiểm tra dữ liệu đã di chuyển...", self.centralwidget)
+        self.verifyButton.clicked.connect(self.verify_moved)
+
+        # Reset progress bar
+        self.progressBar.setValue(0)
+
+        # Worker đang chạy (nếu có)
+        self.worker = None
+        self.scan_worker = None
+        self.purge_worker = None
+
+        # Index kích thước thư mục → mở lại app chỉ quét phần đã thay đổi
+        self.size_index = open_size_index()
+
+        # Checkbox tương ứng với từng folder
+        self.folder_checks = {
+            "Zalo": self.checkZalo,
+            "ZaloPC": self.checkZaloPC,
+            "ZaloData": self.checkZaloData,
+            "ZaloUpdate": self.checkZaloUpdate,   # ✅ checkbox mới
+        }
+
+        # ✅ Tùy chọn sao lưu (nén, khử trùng lặp) — mọi lần di chuyển đều có journal nên có thể tắt để đỡ tốn ổ C:
+        self.checkBackup = QtWidgets.QCheckBox("Sao lưu (nén) trước khi di chuyển", self.centralwidget)
+        self.checkBackup.setChecked(True)
+        self.gridLayout.addWidget(self.checkBackup, 7, 0, 1, 3)
+
+        # ✅ Kiểm tra checksum ngay trong lúc copy, tệp hỏng được copy lại trước khi tạo liên kết
+        self.checkVerify = QtWidgets.QCheckBox("Kiểm tra dữ liệu sau khi copy", self.centralwidget)
+        self.checkVerify.setChecked(True)
+        self.gridLayout.addWidget(self.checkVerify, 8, 0, 1, 3)
+
+        # ✅ Bỏ qua cache, log, crash dump, bộ cài cũ (quy tắc trong rules.json) — tự chọn bật
+        self.checkPrune = QtWidgets.QCheckBox("Bỏ qua cache, log và bộ cài cũ (có thể tạo lại)", self.centralwidget)
+        self.checkPrune.setChecked(False)
+        self.gridLayout.addWidget(self.checkPrune, 9, 0, 1, 3)
+
+        # ✅ Chạy nền: giới hạn MB/s, ưu tiên thấp → vẫn dùng máy được trong lúc di chuyển
+        self.checkBackground = QtWidgets.QCheckBox("Chạy nền (không làm chậm máy), tối đa:", self.centralwidget)
+        self.checkBackground.setChecked(False)
+        self.gridLayout.addWidget(self.checkBackground, 10, 0, 1, 2)
+        self.spinRate = QtWidgets.QSpinBox(self.centralwidget)
+        self.spinRate.setRange(1, 1000)
+        self.spinRate.setValue(DEFAULT_RATE_MB)
+        self.spinRate.setSuffix(" MB/s")
+        self.spinRate.setEnabled(False)
+        self.checkBackground.toggled.connect(self.spinRate.setEnabled)
+        self.gridLayout.addWidget(self.spinRate, 10, 2, 1, 1)
+
+        # Progress bar luôn nằm dưới cùng
+        self.gridLayout.removeWidget(self.progressBar)
+        self.gridLayout.addWidget(self.breakdownButton, 6, 0, 1, 1)
+        self.gridLayout.addWidget(self.verifyButton, 6, 1, 1, 2)
+        self.gridLayout.addWidget(self.progressBar, 11, 0, 1, 3)
+
+        # Set app title
+        self.setWindowTitle("ZaloMove - Phát triển bởi Shun")
+
+        # ✅ Việt hóa label nút
+        self.browseButton.setText("Chọn thư mục...")
+        self.moveButton.setText("Di chuyển thư mục Zalo")
+        self.deleteButton.setText("Xóa bản sao lưu")
+
+        # ✅ Disable checkbox nếu folder không tồn tại và show size nếu có
+        self.check_folders()
+
+        # Lần di chuyển trước bị gián đoạn? Hỏi sau khi cửa sổ hiện lên
+        QtCore.QTimer.singleShot(0, self.recover_pending_moves)
+
+        # Backup đã xóa dở ở lần chạy trước → xóa tiếp trong nền
+        QtCore.QTimer.singleShot(0, self.start_purge)
+
+    def check_folders(self):
+        """Disable checkboxes if folder không tồn tại hoặc đã là symbolic link; sizes fill in from a background scan"""
+        for name, path in FOLDERS.items():
+            check = self.folder_checks[name]
+            exists = os.path.exists(path)
+            disabled = (not exists) or is_junction(path)
+
+            check.setText(f"{name} (đang tính…)" if exists else f"{name} (Not Found)")
+            check.setEnabled(not disabled)
+
+            # Zalo cập nhật đã tạo lại thư mục đã di chuyển → gợi ý luôn thư mục đích cũ
+            linked = linked_destination(name) if not disabled else None
+            if linked and not self.newPath.text().strip():
+                self.newPath.setText(os.path.dirname(os.path.dirname(linked)))
+
+        # Quét lại → bỏ kết quả của lần quét cũ (nếu còn chạy)
+        if self.scan_worker is not None:
+            self.scan_worker.cancel()
+        self.scan_worker = ScanWorker(FOLDERS, self.size_index, parent=self)
+        self.scan_worker.folder_scanned.connect(self.on_folder_scanned)
+        self.scan_worker.result.connect(self.on_scan_finished)
+        self.scan_worker.finished.connect(self.scan_worker.deleteLater)
+        self.scan_worker.start()
+
+    def on_folder_scanned(self, name, size, files):
+        """Fill in one checkbox label when its folder size is known"""
+        if self.sender() is not self.scan_worker:
+            return
+        size = to_mb(size)
+        label = f"{name} ({size} MB)" if size > 0 else f"{name} (Not Found)"
+        # Quét đi theo liên kết → chỉ thư mục thật (Zalo tạo lại sau khi cập nhật) mới cần liên kết lại
+        if size > 0 and not is_junction(FOLDERS[name]) and linked_destination(name):
+            label = f"{name} ({size} MB, cần liên kết lại)"
+        self.folder_checks[name].setText(label)
+
+    def on_scan_finished(self, _):
+        if self.sender() is self.scan_worker:
+            self.scan_worker = None
+
+    def show_breakdown(self):
+        """Rescan every folder listing all directories, then show the heaviest subfolders and file types"""
+        if self.scan_worker is not None:
+            self.scan_worker.cancel()
+        # Cùng một lượt quét cập nhật luôn dung lượng trên checkbox
+        trees = {}
+        self.breakdownButton.setEnabled(False)
+        self.scan_worker = ScanWorker(FOLDERS, trees=trees, parent=self)
+        self.scan_worker.folder_scanned.connect(self.on_folder_scanned)
+        self.scan_worker.result.connect(lambda result: self.on_breakdown_ready(result, trees))
+        self.scan_worker.result.connect(self.on_scan_finished)
+        self.scan_worker.finished.connect(self.scan_worker.deleteLater)
+        self.statusbar.showMessage("Đang quét chi tiết dung lượng...")
+        self.scan_worker.start()
+
+    def on_breakdown_ready(self, result, trees):
+        """Show the breakdown in a read-only, fixed-width text window"""
+        self.breakdownButton.setEnabled(True)
+        if self.worker is None:
+            self.statusbar.clearMessage()
+        if isinstance(result, MoveCancelled):
+            return
+        if isinstance(result, Exception):
+            QtWidgets.QMessageBox.critical(self, "Lỗi", f"Không quét được dung lượng: {result}")
+            return
+
+        dialog = QtWidgets.QDialog(self)
+        dialog.setWindowTitle("Chi tiết dung lượng")
+        text = QtWidgets.QPlainTextEdit(format_breakdown(trees) or "Không có thư mục Zalo nào.", dialog)
+        text.setReadOnly(True)
+        text.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        layout = QtWidgets.QVBoxLayout(dialog)
+        layout.addWidget(text)
+        dialog.resize(640, 480)
+        dialog.exec_()
+
+    def verify_moved(self):
+        """Check the moved folders against their manifests: quick (size, mtime) or full (checksums)"""
+        if self.worker is not None:
+            return
+        folders = {name: linked_destination(name) or os.path.realpath(path)
+                   for name, path in FOLDERS.items() if is_junction(path)}
+        if not folders:
+            QtWidgets.QMessageBox.information(self, "Thông báo", "Chưa có thư mục nào được di chuyển.")
+            return
+
+        box = QtWidgets.QMessageBox(self)
+        box.setIcon(QtWidgets.QMessageBox.Question)
+        box.setWindowTitle("Kiểm tra dữ liệu")
+        box.setText(f"Kiểm tra {', '.join(folders)} ở thư mục đích.")
+        box.setInformativeText("Nhanh: so kích thước và thời gian sửa của từng tệp.\n"
+                               "Đầy đủ: đọc lại mọi tệp và so checksum (chậm hơn).")
+        quick = box.addButton("Nhanh", QtWidgets.QMessageBox.AcceptRole)
+        full = box.addButton("Đầy đủ", QtWidgets.QMessageBox.AcceptRole)
+        box.addButton("Hủy", QtWidgets.QMessageBox.RejectRole)
+        box.setDefaultButton(quick)
+        box.exec_()
+        if box.clickedButton() not in (quick, full):
+            return
+
+        self.moveButton.setEnabled(False)
+        self.deleteButton.setEnabled(False)
+        self.verifyButton.setEnabled(False)
+        self.progressBar.setValue(0)
+
+        self.worker = TaskWorker(verify_folders, folders, parent=self, full=box.clickedButton() is full)
+        self.worker.progress.connect(self.on_move_progress)
+        self.worker.status.connect(self.statusbar.showMessage)
+        self.worker.result.connect(self.on_verify_finished)
+        self.worker.start()
+
+    def on_verify_finished(self, result):
+        """Show which moved files are missing or differ from what was copied"""
+        self.worker = None
+        self.statusbar.clearMessage()
+        self.progressBar.setValue(0)
+        self.moveButton.setEnabled(True)
+        self.deleteButton.setEnabled(True)
+        self.verifyButton.setEnabled(True)
+
+        if isinstance(result, MoveCancelled):
+            return
+        if isinstance(result, Exception):
+            QtWidgets.QMessageBox.critical(self, "Lỗi", f"Không kiểm tra được: {result}")
+            return
+        lines = []
+        for name, bad in result["bad"].items():
+            lines.append(f"{name}: {len(bad)} tệp thiếu hoặc khác bản đã copy")
+            lines += [f"    {rel}" for rel in bad[:10]]
+        for name in result["unchecked"]:
+            lines.append(f"{name}: không có manifest (di chuyển bằng bản cũ), bỏ qua")
+        if result["bad"]:
+            QtWidgets.QMessageBox.critical(self, "Kết quả kiểm tra", "\n".join(lines))
+        else:
+            QtWidgets.QMessageBox.information(self, "Kết quả kiểm tra",
+                                              "\n".join(["Dữ liệu đã di chuyển khớp với bản đã copy."] + lines))
+
+    def choose_folder(self):
+        """Open folder chooser dialog"""
+        folder = QtWidgets.QFileDialog.getExistingDirectory(self, "Chọn thư mục đích mới")
+        if folder:
+            self.newPath.setText(folder)
+
+    def move_selected(self):
+        """Move selected folder(s) on a background worker"""
+        # Đang chạy → nút move đóng vai trò nút hủy
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.cancel()
+            self.moveButton.setEnabled(False)
+            self.moveButton.setText("Đang hủy...")
+            return
+
+        user_base = self.newPath.text().strip()
+
+        if not user_base:
+            QtWidgets.QMessageBox.warning(self, "Cảnh báo", "Vui lòng chọn thư mục đích trước.")
+            return
+
+        # ✅ Always create 'ZaloMove' inside the chosen folder
+        new_base = os.path.join(user_base, MOVE_DIR)
+        os.makedirs(new_base, exist_ok=True)
+
+        # Determine which folders are checked
+        selected = {name: FOLDERS[name] for name, check in self.folder_checks.items()
+                    if check.isChecked() and check.isEnabled()}
+
+        if not selected:
+            QtWidgets.QMessageBox.warning(self, "Cảnh báo", "Vui lòng chọn ít nhất một thư mục hợp lệ.")
+            return
+
+        # Hỏi hết các câu xác nhận trước, worker chỉ làm phần nặng
+        jobs, errors = prepare_jobs(selected, new_base, self.ask_move_question,
+                                    backup=self.checkBackup.isChecked(),
+                                    verify=self.checkVerify.isChecked(),
+                                    rules=load_rules() if self.checkPrune.isChecked() else None,
+                                    # Xóa khi đồng bộ được hỏi lại trong hộp thoại kế hoạch (mặc định: Không)
+                                    allow_deletes=True,
+                                    throttle=Throttle(self.spinRate.value() * 1024 * 1024)
+                                    if self.checkBackground.isChecked() else None)
+
+        if not jobs:
+            if errors:
+                QtWidgets.QMessageBox.critical(self, "Kết quả", "\n".join(errors))
+            return
+
+        self.progressBar.setValue(0)
+
+        # 🔒 Nút move thành nút hủy, khóa nút xóa backup trong lúc chạy
+        self.moveButton.setText("Hủy di chuyển")
+        self.deleteButton.setEnabled(False)
+
+        # Lập kế hoạch trước (dung lượng, chỗ trống, thời gian) — chưa đụng vào dữ liệu
+        self.worker = TaskWorker(plan_moves, jobs, parent=self)
+        self.worker.progress.connect(self.on_move_progress)
+        self.worker.status.connect(self.statusbar.showMessage)
+        self.worker.result.connect(lambda plan: self.on_plan_ready(plan, jobs, errors))
+        self.worker.start()
+
+    def ask_move_question(self, kind, path):
+        """prepare_jobs callback: sync or resume the copy at path, or overwrite what is there"""
+        if kind == "sync":
+            title = "Liên kết lại"
+            text = (f"Zalo đã tạo lại thư mục đã được di chuyển sang {path}.\n"
+                    f"Đồng bộ (chỉ copy tệp mới/thay đổi) rồi tạo lại liên kết?\n"
+                    f"Số tệp sẽ bị xóa ở đích được hiện trong kế hoạch trước khi bắt đầu.")
+            default = QtWidgets.QMessageBox.Yes
+        elif kind == "resume":
+            title = "Tiếp tục di chuyển"
+            text = (f"{path} chứa dữ liệu của lần di chuyển trước bị gián đoạn.\n"
+                    f"Tiếp tục từ chỗ đã dừng (chỉ copy phần còn thiếu)?")
+            default = QtWidgets.QMessageBox.Yes
+        else:
+            title = "Thư mục đã tồn tại"
+            text = f"{path} đã tồn tại. Bạn có muốn ghi đè không?"
+            default = QtWidgets.QMessageBox.No
+        reply = QtWidgets.QMessageBox.question(
+            self, title, text, QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No, default)
+        return reply == QtWidgets.QMessageBox.Yes
+
+    def on_plan_ready(self, plan, jobs, errors):
+        """Show the move plan and start the move once the user confirms it"""
+        self.worker = None
+        self.statusbar.clearMessage()
+
+        if isinstance(plan, Exception) or not plan.ok:
+            self.moveButton.setEnabled(True)
+            self.moveButton.setText("Di chuyển thư mục Zalo")
+            self.deleteButton.setEnabled(True)
+            self.progressBar.setValue(0)
+            if isinstance(plan, MoveCancelled):
+                return
+            if isinstance(plan, Exception):
+                QtWidgets.QMessageBox.critical(self, "Lỗi", f"Không lập được kế hoạch di chuyển: {plan}")
+            else:
+                QtWidgets.QMessageBox.critical(self, "Không thể di chuyển", format_plan(plan))
+            return
+
+        # Đồng bộ sẽ xóa tệp ở bản đã di chuyển → hỏi rõ, mặc định Không
+        question = "Bắt đầu di chuyển?"
+        default = QtWidgets.QMessageBox.Yes
+        if plan.sync_deletes:
+            backed_up = all(f.job.backup for f in plan.folders if f.job.sync)
+            question = (f"Đồng bộ sẽ XÓA {plan.sync_deletes} tệp ở thư mục đích "
+                        f"({'có sao lưu nén trước' if backed_up else 'KHÔNG có sao lưu'}). Tiếp tục?")
+            default = QtWidgets.QMessageBox.No
+        reply = QtWidgets.QMessageBox.question(
+            self,
+            "Xác nhận di chuyển",
+            f"{format_plan(plan)}\n\n{question}",
+            QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
+            default
+        )
+        if reply == QtWidgets.QMessageBox.No:
+            self.on_move_finished({"moved": [], "errors": [], "cancelled": True, "saved": [0, 0]}, errors)
+            return
+
+        # Đóng Zalo (và mọi tiến trình đang giữ tệp trong các thư mục này), chờ nhả handle rồi mới copy
+        self.worker = TaskWorker(release_folders, move_roots(jobs), parent=self)
+        self.worker.status.connect(self.statusbar.showMessage)
+        self.worker.result.connect(lambda released: self.on_folders_released(released, jobs, errors))
+        self.worker.start()
+
+    def on_folders_released(self, released, jobs, errors):
+        """Start the move once no process holds a file in the folders, otherwise say which one does"""
+        self.worker = None
+        self.statusbar.clearMessage()
+
+        if isinstance(released, MoveCancelled):
+            self.on_move_finished({"moved": [], "errors": [], "cancelled": True, "saved": [0, 0]}, errors)
+            return
+        if isinstance(released, Exception):
+            self.on_move_finished(released, errors)
+            return
+        if released["locked"]:
+            errors.append("Không thể đóng các tiến trình đang giữ tệp, hãy tự đóng rồi thử lại:")
+            errors.extend(released["locked"])
+            self.on_move_finished({"moved": [], "errors": [], "cancelled": False, "saved": [0, 0]}, errors)
+            return
+        stopped = released["closed"] + released["killed"]
+        if stopped:
+            self.statusbar.showMessage(f"Đã đóng {len(stopped)} tiến trình để di chuyển.", 5000)
+
+        self.progressBar.setValue(0)
+        self.worker = TaskWorker(run_moves, jobs, parent=self)
+        self.worker.progress.connect(self.on_move_progress)
+        self.worker.status.connect(self.statusbar.showMessage)
+        self.worker.result.connect(lambda result: self.on_move_finished(result, errors))
+        self.worker.start()
+
+    def on_move_progress(self, done, total):
+        """Update progress bar from the move worker"""
+        self.progressBar.setMaximum(max(total, 1))
+        self.progressBar.setValue(done)
+
+    def on_move_finished(self, result, errors):
+        """Show the move result and restore the buttons"""
+        self.worker = None
+        self.statusbar.clearMessage()
+
+        # 🔓 Enable lại nút move khi xong
+        self.moveButton.setEnabled(True)
+        self.moveButton.setText("Di chuyển thư mục Zalo")
+        self.deleteButton.setEnabled(True)
+
+        if isinstance(result, Exception):
+            errors.append(f"Lỗi: {result}")
+            result = {"moved": [], "errors": [], "cancelled": False, "saved": [0, 0]}
+        errors.extend(result["errors"])
+
+        if result["cancelled"]:
+            moved = ", ".join(result["moved"]) or "không có"
+            text = f"Đã hủy di chuyển. Đã xong: {moved}"
+            if pending_journals():
+                text += "\nPhần đã copy được giữ lại: lần di chuyển sau sẽ chạy tiếp từ chỗ đã dừng (hoặc hoàn tác)."
+            QtWidgets.QMessageBox.warning(self, "Đã hủy", text)
+        elif errors:
+            QtWidgets.QMessageBox.critical(self, "Kết quả", "\n".join(errors))
+        else:
+            text = f"Đã di chuyển: {', '.join(result['moved'])}"
+            saved, saved_files = result["saved"]
+            if saved_files:
+                text += f"\nĐã bỏ qua {format_size(saved)} ({saved_files} tệp) cache/log có thể tạo lại."
+            QtWidgets.QMessageBox.information(self, "Thành công", text)
+
+        self.check_folders()
+
+        # Lỗi giữa chừng để lại journal → hỏi hoàn tất/hoàn tác luôn
+        if result["errors"]:
+            self.recover_pending_moves()
+
+    def recover_pending_moves(self):
+        """Offer to finish or undo moves left unfinished by a crash or an error"""
+        actions = []
+        for state in pending_journals():
+            box = QtWidgets.QMessageBox(self)
+            box.setIcon(QtWidgets.QMessageBox.Warning)
+            box.setWindowTitle("Di chuyển chưa hoàn tất")
+            box.setText(f"Lần di chuyển {state['name']} trước đó chưa hoàn tất:\n"
+                        f"{state['src']} → {state['dst']}")
+            forward = None
+            if can_roll_forward(state):
+                box.setInformativeText("Dữ liệu đã nằm đủ ở thư mục đích. "
+                                       "Hoàn tất để tạo liên kết, hoặc hoàn tác để đưa về chỗ cũ.")
+                forward = box.addButton("Hoàn tất", QtWidgets.QMessageBox.AcceptRole)
+            else:
+                box.setInformativeText("Dữ liệu ở thư mục đích chưa đầy đủ. Hoàn tác để đưa về như cũ, "
+                                       "hoặc để sau rồi di chuyển lại để tiếp tục từ chỗ đã dừng.")
+            back = box.addButton("Hoàn tác", QtWidgets.QMessageBox.DestructiveRole)
+            box.addButton("Để sau", QtWidgets.QMessageBox.RejectRole)
+            box.exec_()
+
+            if forward is not None and box.clickedButton() is forward:
+                actions.append(("forward", state))
+            elif box.clickedButton() is back:
+                actions.append(("back", state))
+
+        if not actions:
+            return
+
+        self.moveButton.setEnabled(False)
+        self.deleteButton.setEnabled(False)
+        self.progressBar.setValue(0)
+
+        self.worker = TaskWorker(recover_moves, actions, parent=self)
+        self.worker.progress.connect(self.on_move_progress)
+        self.worker.status.connect(self.statusbar.showMessage)
+        self.worker.result.connect(self.on_recover_finished)
+        self.worker.start()
+
+    def on_recover_finished(self, errors):
+        """Show the recovery result and restore the buttons"""
+        self.worker = None
+        self.statusbar.clearMessage()
+        self.moveButton.setEnabled(True)
+        self.deleteButton.setEnabled(True)
+
+        if isinstance(errors, Exception):
+            errors = [f"Lỗi: {errors}"]
+        if errors:
+            QtWidgets.QMessageBox.critical(self, "Kết quả", "\n".join(errors))
+        else:
+            QtWidgets.QMessageBox.information(self, "Thành công", "Đã khôi phục xong.")
+
+        self.check_folders()
+
+    def closeEvent(self, event):
+        """Cancel a running move, scan or purge before closing the window"""
+        for worker in (self.worker, self.scan_worker, self.purge_worker):
+            if worker is not None and worker.isRunning():
+                worker.cancel()
+                worker.wait()
+        super().closeEvent(event)
+
+    def delete_old_backups(self):
+        """Xóa các bản sao lưu trong kho nén và thư mục backup (*.old) của bản cũ nếu tồn tại"""
+        # Tìm tất cả backup tồn tại
+        backups = find_backups()
+        store = default_store()
+        snapshots = store.snapshots()
+
+        if not backups and not snapshots:
+            QtWidgets.QMessageBox.information(self, "Thông báo", "Không tìm thấy bản sao lưu nào để xóa.")
+            return
+
+        # Hỏi xác nhận
+        backup_list_text = "\n".join([bp for _, bp in backups] + [format_snapshot(s) for s in snapshots])
+        reply = QtWidgets.QMessageBox.question(
+            self,
+            "Xác nhận xóa backup",
+            f"Bạn có chắc chắn muốn xóa các bản sao lưu sau?\n\n{backup_list_text}",
+            QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
+            QtWidgets.QMessageBox.No
+        )
+        if reply == QtWidgets.QMessageBox.No:
+            return
+
+        # Đổi tên vào khu vực purge / bỏ snapshot ngay lập tức, việc xóa thật chạy trong nền
+        records, errors = stage_backups(backups)
+        store_records, store_errors = stage_snapshots(store, snapshots)
+        records += store_records
+        errors += store_errors
+        if records:
+            self.start_purge()
+
+        if errors:
+            QtWidgets.QMessageBox.critical(self, "Kết quả", "\n".join(errors))
+        else:
+            deleted = ", ".join(record["name"] for record in records)
+            QtWidgets.QMessageBox.information(self, "Thành công", f"Đã xóa backup: {deleted}\n"
+                                              f"Dung lượng sẽ được giải phóng dần trong nền.")
+
+    def start_purge(self):
+        """Delete staged backups on a background worker (also picks up leftovers from last run)"""
+        if self.purge_worker is not None and self.purge_worker.isRunning():
+            return    # worker đang chạy sẽ tự lấy phần mới khi xong
+        records = pending_purges()
+        if not records:
+            return
+        ids = {record["id"] for record in records}
+        self.purge_worker = TaskWorker(purge, records, parent=self)
+        self.purge_worker.progress.connect(self.on_purge_progress)
+        self.purge_worker.status.connect(self.on_purge_status)
+        self.purge_worker.result.connect(lambda result: self.on_purge_finished(result, ids))
+        self.purge_worker.start()
+
+    def on_purge_progress(self, done, total):
+        # Di chuyển đang chạy thì progress bar thuộc về nó
+        if self.worker is None:
+            self.on_move_progress(done, total)
+
+    def on_purge_status(self, text):
+        if self.worker is None:
+            self.statusbar.showMessage(text)
+
+    def on_purge_finished(self, result, ids):
+        """Report freed space; start again if more backups were staged meanwhile"""
+        self.purge_worker = None
+        if self.worker is None:
+            self.progressBar.setValue(0)
+            self.statusbar.clearMessage()
+
+        if isinstance(result, Exception):
+            QtWidgets.QMessageBox.critical(self, "Lỗi", f"Lỗi khi xóa backup: {result}")
+            return
+        if result["errors"]:
+            QtWidgets.QMessageBox.critical(self, "Kết quả", "\n".join(result["errors"]))
+        if result["freed"] and self.worker is None:
+            self.statusbar.showMessage(f"Đã giải phóng {format_size(result['freed'])}", 10000)
+
+        if not result["cancelled"] and any(record["id"] not in ids for record in pending_purges()):
+            self.start_purge()
+
+
+def main(argv):
+    event("start", front="gui")
+    app = QtWidgets.QApplication(argv)
+    window = ZaloMover()
+    window.show()
+    return app.exec_()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from core import fs
+from core.fs import FAKE_LINK_MARKER, FakeBackend
+
+
+class Crash(BaseException):
+    """Stands in for the process dying: nothing in the move code catches it"""
+
+
+def read_tree(root):
+    """{relative path: content} of every file under root (a fake link's marker left out)"""
+    tree = {}
+    for folder, _, files in os.walk(root):
+        for name in files:
+            if name == FAKE_LINK_MARKER:
+                continue
+            path = os.path.join(folder, name)
+            with open(path, "rb") as f:
+                tree[os.path.relpath(path, root)] = f.read()
+    return tree
+
+
+def write_tree(root, tree):
+    for rel, data in tree.items():
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+def sample_tree():
+    """A small ZaloData: nested folders, many small files and one multi-chunk file"""
+    tree = {os.path.join("msgs", f"chat{i}.db"): os.urandom(4096 + i) for i in range(20)}
+    tree[os.path.join("media", "2024", "video.mp4")] = os.urandom(2 * 1024 * 1024 + 17)
+    tree["config.json"] = b'{"lang": "vi"}'
+    tree[os.path.join("msgs", "bad.db")] = os.urandom(1000)
+    return tree
+
+
+class FakeDriveTestCase(unittest.TestCase):
+    """Every test gets its own temp dir as %LOCALAPPDATA% and FakeBackend(cross_device=True) links,
+    so moves copy then delete like a move to another drive, on any OS."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="zalomover-test-")
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        env = mock.patch.dict(os.environ, {"LOCALAPPDATA": os.path.join(self.tmp, "state")})
+        env.start()
+        self.addCleanup(env.stop)
+        old = fs.use_backend(FakeBackend(cross_device=True))
+        self.addCleanup(fs.use_backend, old)
+
+        self.home = os.path.join(self.tmp, "home")
+        self.new_base = os.path.join(self.tmp, "dest", "ZaloMove")
+        os.makedirs(self.new_base)
+        self.src = os.path.join(self.home, "ZaloData")
+        self.dst = os.path.join(self.new_base, "ZaloData")
+        self.original = sample_tree()
+        write_tree(self.src, self.original)
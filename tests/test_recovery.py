@@ -0,0 +1,280 @@
+import errno
+import os
+import shutil
+import threading
+import time
+import unittest
+from unittest import mock
+
+from core import journal as jn
+from core import purge as pg
+from core.backupstore import BackupStore, default_store
+from core.copier import TreeCopier
+from core.manifest import CheckpointManifest
+from core.mover import (prepare_jobs, run_moves, roll_back, roll_forward, can_roll_forward, is_link)
+from core.sync import linked_destination
+from tests.helpers import Crash, FakeDriveTestCase, read_tree, write_tree, sample_tree
+
+
+# Các mốc journal của một lần di chuyển khác ổ đĩa có sao lưu, theo thứ tự
+PHASES = [jn.BACKED_UP, jn.COPIED, jn.REMOVING_SOURCE, jn.SOURCE_REMOVED, jn.LINKED]
+
+
+def always(kind, path):
+    return True
+
+
+class RecoveryTest(FakeDriveTestCase):
+
+    def jobs(self, ask=always, backup=True):
+        jobs, errors = prepare_jobs({"ZaloData": self.src}, self.new_base, ask, backup=backup, verify=True)
+        self.assertEqual(errors, [])
+        return jobs
+
+    def crash_after(self, phase):
+        """Run the move, dying right after phase is journaled; returns the journal state left behind"""
+        original = jn.MoveJournal.phase
+
+        def journaled(journal, name):
+            original(journal, name)
+            if name == phase:
+                journal.close()
+                raise Crash(name)
+
+        with mock.patch.object(jn.MoveJournal, "phase", journaled):
+            with self.assertRaises(Crash):
+                run_moves(self.jobs())
+        (state,) = jn.pending_journals()
+        return state
+
+    def assert_back_at_source(self):
+        self.assertFalse(is_link(self.src))
+        self.assertEqual(read_tree(self.src), self.original)
+        self.assertFalse(os.path.exists(self.dst))
+        self.assertEqual(jn.pending_journals(), [])
+
+    def assert_moved(self):
+        self.assertTrue(is_link(self.src))
+        self.assertEqual(read_tree(self.dst), self.original)
+        self.assertEqual(jn.pending_journals(), [])
+        self.assertEqual(linked_destination("ZaloData"), self.dst)
+
+    def test_roll_back_after_each_phase(self):
+        for phase in PHASES:
+            with self.subTest(phase=phase):
+                state = self.crash_after(phase)
+                if phase == jn.REMOVING_SOURCE:
+                    # Chết giữa lúc xóa nguồn: một phần nguồn đã mất
+                    shutil.rmtree(os.path.join(self.src, "msgs"))
+                roll_back(state)
+                self.assert_back_at_source()
+
+    def test_roll_forward_once_data_is_at_destination(self):
+        for phase in PHASES:
+            with self.subTest(phase=phase):
+                state = self.crash_after(phase)
+                if not can_roll_forward(state):
+                    self.assertEqual(phase, jn.BACKED_UP)
+                    roll_back(state)
+                    continue
+                roll_forward(state)
+                self.assert_moved()
+                # Trả lại như cũ cho phase tiếp theo
+                os.remove(os.path.join(self.src, ".zalomover-link"))
+                os.rmdir(self.src)
+                shutil.move(self.dst, self.src)
+
+    def test_roll_back_restores_backup_when_destination_is_gone(self):
+        state = self.crash_after(jn.SOURCE_REMOVED)
+        shutil.rmtree(self.dst)     # ổ đích hỏng / bị rút ra
+        roll_back(state)
+        self.assert_back_at_source()
+
+    def test_resume_after_copy_failure(self):
+        original = TreeCopier._copy_chunked
+        copied = []
+
+        def failing(copier, src, dst, *args, **kwargs):
+            if os.path.basename(src) == "bad.db":
+                raise OSError(errno.EIO, "Lỗi đọc giả lập", src)
+            return original(copier, src, dst, *args, **kwargs)
+
+        def counting(copier, src, dst, *args, **kwargs):
+            copied.append(os.path.relpath(src, self.src))
+            return original(copier, src, dst, *args, **kwargs)
+
+        with mock.patch.object(TreeCopier, "_copy_chunked", failing):
+            result = run_moves(self.jobs())
+        self.assertEqual(result["moved"], [])
+        self.assertEqual(len(result["errors"]), 1)
+        self.assertEqual(read_tree(self.src), self.original)
+        (state,) = jn.pending_journals()
+        self.assertFalse(can_roll_forward(state))
+
+        # Chạy lại: tiếp tục từ manifest, không sao lưu lại, chỉ copy tệp bị lỗi
+        (job,) = self.jobs(ask=lambda kind, path: kind == "resume")
+        self.assertTrue(job.resume)
+        self.assertTrue(job.backup_done)
+        with mock.patch.object(TreeCopier, "_copy_chunked", counting):
+            result = run_moves([job])
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(result["moved"], ["ZaloData"])
+        self.assertEqual(copied, [os.path.join("msgs", "bad.db")])
+        self.assert_moved()
+
+    def test_cancel_keeps_partial_copy_for_resume(self):
+        original = TreeCopier._copy_chunked
+        copied = []
+
+        def cancelling_after(count):
+            cancel = threading.Event()
+
+            def copy(copier, src, dst, *args, **kwargs):
+                result = original(copier, src, dst, *args, **kwargs)
+                copied.append(os.path.relpath(src, self.src))
+                if len(copied) >= count:
+                    cancel.set()
+                return result
+            return cancel, copy
+
+        # Hủy lần đầu, rồi hủy tiếp cả lần chạy tiếp → phần đã copy vẫn phải còn
+        for count in (5, 10):
+            cancel, copy = cancelling_after(count)
+            jobs = self.jobs(ask=lambda kind, path: kind == "resume")
+            with mock.patch.object(TreeCopier, "_copy_chunked", copy):
+                result = run_moves(jobs, cancel)
+            self.assertTrue(result["cancelled"])
+            self.assertEqual(read_tree(self.src), self.original)
+            self.assertTrue(os.path.isdir(self.dst))
+            (state,) = jn.pending_journals()
+            self.assertFalse(can_roll_forward(state))
+
+        done = set(copied)
+        copied.clear()
+        (job,) = self.jobs(ask=lambda kind, path: kind == "resume")
+        self.assertTrue(job.resume)
+        _, copy = cancelling_after(len(self.original) + 1)
+        with mock.patch.object(TreeCopier, "_copy_chunked", copy):
+            result = run_moves([job])
+        self.assertEqual(result["errors"], [])
+        self.assert_moved()
+        # Chỉ copy phần còn lại
+        self.assertGreaterEqual(len(done), 10)
+        self.assertEqual(done & set(copied), set())
+        self.assertEqual(done | set(copied), set(self.original))
+
+    def test_manifest_write_failure_keeps_source(self):
+        original = CheckpointManifest.add
+        failed = []
+
+        def full_disk(manifest, *args, **kwargs):
+            if not failed:
+                failed.append(True)
+                raise OSError(errno.ENOSPC, "Hết dung lượng giả lập")
+            return original(manifest, *args, **kwargs)
+
+        with mock.patch.object(CheckpointManifest, "add", full_disk):
+            result = run_moves(self.jobs())
+        self.assertEqual(result["moved"], [])
+        self.assertEqual(len(result["errors"]), 1)
+        self.assertFalse(is_link(self.src))
+        self.assertEqual(read_tree(self.src), self.original)
+
+    def test_escaped_worker_error_is_not_dropped(self):
+        def broken(path, st, digest):
+            raise RuntimeError("lỗi trong callback")
+
+        store = default_store()
+        with self.assertRaises(RuntimeError):
+            store.backup(self.src, "ZaloData", on_file=broken)
+        self.assertEqual(store.snapshots(), [])
+        with self.assertRaises(RuntimeError):
+            TreeCopier().copy(self.src, self.dst, on_file=broken)
+
+
+class RestoreAfterPurgeTest(FakeDriveTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Thư mục khác có một phần dữ liệu trùng → khối dùng chung giữa hai snapshot
+        self.other = os.path.join(self.home, "ZaloPC")
+        write_tree(self.other, {**sample_tree(), "config.json": self.original["config.json"]})
+
+    def restored(self, store, snapshot_id):
+        out = os.path.join(self.tmp, f"restore-{snapshot_id}")
+        store.restore(snapshot_id, out)
+        return read_tree(out)
+
+    def test_restore_after_purging_other_snapshots(self):
+        store = default_store()
+        kept = store.backup(self.src, "ZaloData")
+        store.backup(self.other, "ZaloPC")
+        pg.stage_snapshots(store, store.snapshots("ZaloPC"))
+        result = pg.purge(pg.pending_purges())
+        self.assertEqual(result["errors"], [])
+        self.assertGreater(result["freed"], 0)
+        self.assertEqual(self.restored(store, kept), self.original)
+
+    def test_backup_started_during_purge_survives_it(self):
+        store = default_store()
+        store.backup(self.src, "ZaloData")
+        pg.stage_snapshots(store, store.snapshots())
+        purge_files = pg._purge_files
+        started = {}
+
+        def racing(files, *args):
+            # Bản sao lưu mới bắt đầu sau khi đã liệt kê khối rác, trước khi xóa
+            def backup():
+                started["id"] = BackupStore(store.root).backup(self.src, "ZaloData")
+            thread = threading.Thread(target=backup)
+            thread.start()
+            time.sleep(0.5)
+            started["waited"] = thread.is_alive()
+            purge_files(files, *args)
+            started["thread"] = thread
+
+        with mock.patch.object(pg, "_purge_files", racing):
+            result = pg.purge(pg.pending_purges())
+        started["thread"].join()
+        self.assertEqual(result["errors"], [])
+        self.assertTrue(started["waited"])
+        self.assertEqual(self.restored(store, started["id"]), self.original)
+
+    def test_stale_partial_marker_does_not_block_purge(self):
+        store = default_store()
+        store.backup(self.src, "ZaloData")
+        with open(os.path.join(store.root, "snapshots", "crashed.partial"), "w", encoding="utf-8") as f:
+            f.write(self.src)
+        self.assertFalse(store.busy())
+        pg.stage_snapshots(store, store.snapshots())
+        result = pg.purge(pg.pending_purges())
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(result["purged"], ["ZaloData"])
+
+    def test_roll_back_from_backup_after_purge(self):
+        store = default_store()
+        store.backup(self.other, "ZaloPC")
+        original = jn.MoveJournal.phase
+
+        def journaled(journal, name):
+            original(journal, name)
+            if name == jn.SOURCE_REMOVED:
+                journal.close()
+                raise Crash(name)
+
+        jobs, _ = prepare_jobs({"ZaloData": self.src}, self.new_base, always, verify=True)
+        with mock.patch.object(jn.MoveJournal, "phase", journaled):
+            with self.assertRaises(Crash):
+                run_moves(jobs)
+        shutil.rmtree(self.dst)
+        pg.stage_snapshots(store, store.snapshots("ZaloPC"))
+        pg.purge(pg.pending_purges())
+
+        (state,) = jn.pending_journals()
+        roll_back(state)
+        self.assertEqual(read_tree(self.src), self.original)
+        self.assertEqual(jn.pending_journals(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
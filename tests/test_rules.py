@@ -0,0 +1,19 @@
+import os
+import unittest
+
+from core.rules import DEFAULT_RULES, RuleSet, scan_prunable
+from tests.helpers import FakeDriveTestCase, write_tree
+
+
+class ScanPrunableTest(FakeDriveTestCase):
+
+    def test_folder_rules_apply_to_every_profile(self):
+        pc = os.path.join(self.home, "ZaloPC")
+        write_tree(pc, {os.path.join("Cache", "data_1"): b"x" * 1000, "config.json": b"{}"})
+        prunable = scan_prunable({"ZaloPC": pc, "alice/ZaloPC": pc}, RuleSet(DEFAULT_RULES))
+        self.assertEqual(prunable["ZaloPC"], (1000, 1))
+        self.assertEqual(prunable["alice/ZaloPC"], (1000, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import shutil
+import threading
+import unittest
+
+from core import journal as jn
+from core.backupstore import default_store
+from core.mover import prepare_jobs, run_moves, is_link
+from core.planner import plan_moves
+from core.sync import SYNC_BACKUP_SUFFIX, compare_trees, load_links, record_link, sync_tree
+from tests.helpers import FakeDriveTestCase, read_tree, write_tree
+
+
+def always(kind, path):
+    return True
+
+
+class ResyncTest(FakeDriveTestCase):
+
+    def setUp(self):
+        super().setUp()
+        jobs, _ = prepare_jobs({"ZaloData": self.src}, self.new_base, always, backup=False, verify=True)
+        self.assertEqual(run_moves(jobs)["moved"], ["ZaloData"])
+        # Zalo cập nhật thay liên kết bằng thư mục mới gần như trống
+        shutil.rmtree(self.src)
+        self.fresh = {"config.json": b'{"lang": "en", "theme": "dark"}'}
+        write_tree(self.src, self.fresh)
+
+    def sync_jobs(self, backup=True, allow_deletes=False):
+        jobs, errors = prepare_jobs({"ZaloData": self.src}, self.new_base, always, backup=backup,
+                                    verify=True, allow_deletes=allow_deletes)
+        self.assertEqual(errors, [])
+        self.assertTrue(jobs[0].sync)
+        return jobs
+
+    def test_deletes_need_confirmation(self):
+        jobs = self.sync_jobs()
+        plan = plan_moves(jobs, probe=False)
+        self.assertFalse(plan.ok)
+        self.assertEqual(plan.sync_deletes, len(self.original) - 1)
+        # Bỏ qua kế hoạch vẫn không xóa được gì
+        result = run_moves(jobs)
+        self.assertEqual(result["moved"], [])
+        self.assertEqual(read_tree(self.dst), self.original)
+
+    def test_losing_most_files_without_backup_is_refused(self):
+        plan = plan_moves(self.sync_jobs(backup=False, allow_deletes=True), probe=False)
+        self.assertFalse(plan.ok)
+
+    def test_confirmed_sync_backs_up_what_it_deletes(self):
+        jobs = self.sync_jobs(allow_deletes=True)
+        self.assertTrue(plan_moves(jobs, probe=False).ok)
+        result = run_moves(jobs)
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(result["moved"], ["ZaloData"])
+        self.assertTrue(is_link(self.src))
+        self.assertEqual(read_tree(self.dst), self.fresh)
+        self.assertEqual(jn.pending_journals(), [])
+
+        store = default_store()
+        (snapshot,) = store.snapshots("ZaloData" + SYNC_BACKUP_SUFFIX)
+        out = os.path.join(self.tmp, "restored")
+        store.restore(snapshot["id"], out)
+        deleted = {rel: data for rel, data in self.original.items() if rel not in self.fresh}
+        self.assertEqual(read_tree(out), deleted)
+
+    def test_files_written_after_the_plan_are_synced(self):
+        jobs = self.sync_jobs(allow_deletes=True)
+        self.assertTrue(plan_moves(jobs, probe=False).ok)
+        # Zalo còn ghi tiếp cho tới khi bị đóng
+        late = {os.path.join("msgs", "new-chat.db"): b"new", "b.db-wal": b"wal"}
+        write_tree(self.src, late)
+        result = run_moves(jobs)
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(read_tree(self.dst), {**self.fresh, **late})
+
+    def test_deletes_grown_since_the_plan_are_refused(self):
+        write_tree(self.src, {"msgs/chat1.db": self.original[os.path.join("msgs", "chat1.db")]})
+        jobs = self.sync_jobs(allow_deletes=True)
+        self.assertTrue(plan_moves(jobs, probe=False).ok)
+        os.remove(os.path.join(self.src, "msgs", "chat1.db"))
+        result = run_moves(jobs)
+        self.assertEqual(result["moved"], [])
+        self.assertEqual(len(result["errors"]), 1)
+        self.assertEqual(read_tree(self.dst), self.original)
+
+
+class CompareTreesTest(FakeDriveTestCase):
+
+    def test_files_replaced_by_folders(self):
+        write_tree(self.dst, {"config.json": b"{}", "media": b"not a folder yet"})
+        os.remove(os.path.join(self.src, "config.json"))
+        write_tree(self.src, {os.path.join("config.json", "main.json"): b"{}"})
+        diff = compare_trees(self.src, self.dst)
+        self.assertEqual(sorted(os.path.basename(path) for path in diff.delete), ["config.json", "media"])
+        sync_tree(self.src, self.dst, diff)
+        self.assertEqual(read_tree(self.dst), read_tree(self.src))
+
+
+class LinksTest(FakeDriveTestCase):
+
+    def test_record_link_from_many_threads(self):
+        errors = []
+
+        def record(i):
+            try:
+                record_link(f"user{i}/ZaloData", os.path.join(self.new_base, f"user{i}", "ZaloData"))
+            except OSError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=record, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(load_links()), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+from core.throttle import Throttle
+
+
+class AdaptTest(unittest.TestCase):
+
+    def run_samples(self, latencies):
+        throttle = Throttle(20 * 1024 * 1024, adaptive=False)
+        samples = iter(latencies)
+        throttle.probe = lambda: next(samples)
+        rates = []
+        for _ in latencies:
+            throttle._adapt(0)
+            rates.append(throttle.rate)
+        return throttle, rates
+
+    def test_slow_disk_busy_with_the_copy_alone_is_left_alone(self):
+        throttle, rates = self.run_samples([60, 65, 58, 70, 62])
+        self.assertEqual(set(rates), {throttle.max_rate})
+
+    def test_foreground_io_backs_off_then_recovers(self):
+        # Chỉ có bản copy: 8 ms; mở ứng dụng (I/O nhỏ, ít byte) đẩy lên 90 ms
+        throttle, rates = self.run_samples([8, 9, 90, 70, 25] + [9] * 8)
+        self.assertLess(rates[2], throttle.max_rate)
+        self.assertLess(rates[3], rates[2])
+        self.assertEqual(rates[4], rates[3])     # 25 ms: chưa hẳn rảnh, giữ nguyên
+        self.assertEqual(rates[-1], throttle.max_rate)
+
+    def test_no_reading_changes_nothing(self):
+        throttle, rates = self.run_samples([None, None])
+        self.assertEqual(set(rates), {throttle.max_rate})
+        self.assertIsNone(throttle.own_latency)
+
+
+if __name__ == "__main__":
+    unittest.main()